@@ -0,0 +1,77 @@
+"""
+app/addresses.py
+----------------
+Normalized route keys for orders: city and area parsed from the free-text
+address, and the scheduled day taken from the booking's date slot.
+
+Addresses are typed by customers ("Street 96, City", "Flat 4, 12 MG Rd.,
+Koramangala, Bengaluru - 560034"), so grouping orders by place needs a key
+that ignores leading house numbers, PIN codes, case, punctuation and common
+abbreviations:
+    city  the last comma-separated part
+    area  the part before it when there are three or more parts (the locality),
+          otherwise the street itself
+Both are stored on every order next to scheduled_date (migration 3), under
+the index app.route_batches reads.
+"""
+
+import re
+from datetime import date, datetime
+
+# Longest a key is stored as (the columns are VARCHAR(50))
+KEY_LENGTH = 50
+DATE_SLOT_FORMAT = "%Y-%m-%d"
+
+# Words that only number or label a building, dropped with any token holding a digit
+_FILLER_WORDS = {"flat", "house", "no", "plot", "apt", "apartment", "door", "unit", "floor"}
+_ABBREVIATIONS = {
+    "rd": "road",
+    "st": "street",
+    "ave": "avenue",
+    "ln": "lane",
+    "blvd": "boulevard",
+    "nr": "near",
+    "opp": "opposite",
+    "sec": "sector",
+    "sect": "sector",
+    "ngr": "nagar",
+    "blr": "bengaluru",
+    "bangalore": "bengaluru",
+    "bombay": "mumbai",
+}
+_NON_WORD = re.compile(r"[^\w\s]+")
+_PIN_CODE = re.compile(r"\d{5,6}")
+
+def normalize_part(part: str) -> str | None:
+    """
+    One address part as a key: lower case, no punctuation, house numbers, PIN codes
+    or filler, abbreviations spelled out. Numbers after a name stay ("sector 15").
+    """
+    words = []
+    for token in _NON_WORD.sub(" ", part.lower()).split():
+        has_digit = any(char.isdigit() for char in token)
+        if token in _FILLER_WORDS or (has_digit and not words) or _PIN_CODE.fullmatch(token):
+            continue
+        words.append(_ABBREVIATIONS.get(token, token))
+    return " ".join(words)[:KEY_LENGTH] or None
+
+def parse_address(address: str) -> tuple[str | None, str | None]:
+    """(area, city) keys of a free-text address; either is None when nothing is left of that part."""
+    parts = [key for key in (normalize_part(part) for part in (address or "").split(",")) if key]
+    if not parts:
+        return None, None
+    if len(parts) == 1:
+        return None, parts[0]
+    return parts[-2], parts[-1]
+
+def parse_date_slot(date_slot: str) -> date | None:
+    """The day of a booking slot such as "2026-03-12 10:00 AM - 11:00 AM"."""
+    try:
+        return datetime.strptime((date_slot or "")[:10], DATE_SLOT_FORMAT).date()
+    except ValueError:
+        return None
+
+def route_keys(address: str, date_slot: str) -> dict:
+    """The route columns for an order: city, area and scheduled_date."""
+    area, city = parse_address(address)
+    return {"city": city, "area": area, "scheduled_date": parse_date_slot(date_slot)}
@@ -1,4 +1,4 @@
-from sqlmodel import Session, select, delete, col
+from sqlmodel import Session, select, delete, col, func
 from sqlalchemy.exc import IntegrityError
 
 from rich.console import Console
@@ -7,18 +7,35 @@ from rich.panel import Panel
 
 import questionary
 
-from app.database import engine
-from app.models import User, ServiceRequest
+from app.database import engine, engine_for_customer, engine_for_order, is_sharded
+from app.group_commit import writer_for
+from app.models import User, ServiceRequest, ServiceRequestArchive
 from app.utils import paginate_results
+from app.read_models import OrderListRow, UserRow, select_rows, select_order_list, as_rows
+from app.sharding import ShardedSession, remove_from_directory, release_order_ids
+from app.backup import backup_ui
+from app.archive import archive_orders_ui
+from app.maintenance import maintenance_ui, note_deleted_rows
+from app.events import record_status_changed, record_bulk_events
+from app.summary import apply_order_changed, delete_summary
+from app.dispatch import dispatch_ui
+from app.route_batches import route_batches_ui
+from app.analytics import analytics_ui
+from app.user_import import import_users_ui
+from app.order_board import order_board_ui
+from app.search_index import user_index, UserFieldCompleter
+from app.username_filter import username_filter
+from app.metrics import status_transitions, user_removals, screen_render_seconds
 
 console = Console()
 
 # 1. The Renderer (Pure UI Logic)
-def render_orders_table(results):
+@screen_render_seconds.labels("order_list").time()
+def render_orders_table(results) -> Table:
     table = Table(show_lines=True)
 
     table.add_column("Order ID", justify="center", style="cyan", no_wrap=True)
-    table.add_column("Cust ID", justify="center", style="magenta")
+    table.add_column("Customer", justify="left", style="magenta", no_wrap=True)
     table.add_column("Service", justify="left", style="bold white")
     table.add_column("Vendor", justify="left")
     table.add_column("Amount", justify="right", style="green")
@@ -29,33 +46,148 @@ def render_orders_table(results):
         status_style = "yellow" if req.status == "Pending" else "green"
         status_text = f"[{status_style}]{req.status}[/{status_style}]"
         booking_date = req.created_at.strftime("%Y-%m-%d") if req.created_at else "N/A"
+        # Name and contact come from the joined User row; no per-order lookups
+        customer = f"{req.user_name or 'N/A'}\n{req.contact_number or 'N/A'}\n[dim]ID {req.customer_id}[/dim]"
 
         table.add_row(
             str(req.id),
-            str(req.customer_id),
+            customer,
             req.service_name,
             req.vendor_name,
             f"${req.amount}",
             status_text,
             booking_date
         )
-    console.print(table)
+    return table
 
 def view_all_orders():
     """
     Fetches every service request using the generic pagination engine.
+    Archived orders are only loaded if the admin pages past the live ones.
+    Every shard is queried in parallel and the pages are merge-sorted by Order ID, then customer ID.
+    Each page is one query per shard: orders joined to their customer's name and contact.
     """
-    with Session(engine) as session:
+    with ShardedSession(sort_key=lambda req: (req.id, req.customer_id)) as session:
         # We just define the query. The engine handles the fetching loop.
-        statement = select(ServiceRequest)
+        # Only the rendered columns are selected (see app.read_models)
+        statement = select_order_list(ServiceRequest).order_by(ServiceRequest.id, ServiceRequest.customer_id)
 
         paginate_results(
             session=session,
             statement=statement,
             render_func=render_orders_table,
-            title="All Service Orders (Admin View)"
+            title="All Service Orders (Admin View)",
+            archive_statement=select_order_list(ServiceRequestArchive).order_by(ServiceRequestArchive.id, ServiceRequestArchive.customer_id),
+            row_type=OrderListRow,
+            # Counting doesn't need the customer columns, so it skips the join
+            count_statement=select(ServiceRequest.id),
+            archive_count_statement=select(ServiceRequestArchive.id),
+            # Pages seek by Order ID (primary key), so page 500 is as fast as page 1. Order IDs
+            # written before the order directory (app.sharding) can repeat across shards, so
+            # the customer ID breaks ties and no row is skipped at a page boundary
+            keyset=("id", "customer_id")
         )
 
+# --- ORDER & USER OPERATIONS (no UI; also driven by benchmarks/load_test.py) ---
+def apply_order_status(session: Session, order: ServiceRequest, new_status: str) -> str:
+    """
+    Changes the status of a loaded order on `session`, without committing. The
+    status-change event and the customer's summary are staged on the same session,
+    so once the caller commits, the event feed always matches the table.
+    Returns the old status.
+    """
+    # We modify the Python object directly
+    old_status = order.status
+    order.status = new_status
+
+    record_status_changed(session, order, old_status)
+    apply_order_changed(session, order, old_status)
+
+    # session.add tells SQLModel this object is 'dirty' and needs saving
+    session.add(order)
+    return old_status
+
+def change_order_status(order_id: int, new_status: str, order_engine=None) -> ServiceRequest:
+    """
+    Changes an order's status through its shard's group-commit writer (app.group_commit),
+    finding the shard first unless `order_engine` is given.
+    Raises LookupError if the order does not exist, ValueError if it is already 'Completed'.
+    """
+    if order_engine is None:
+        # Orders live on their customer's shard; the order directory knows whose order this is
+        order_engine = engine_for_order(order_id)
+        if order_engine is None:
+            raise LookupError(f"Order ID {order_id} not found.")
+
+    def update(session: Session) -> tuple[ServiceRequest, str]:
+        # Checked again inside the write transaction, so a concurrent change cannot slip past the lock
+        order = session.get(ServiceRequest, order_id)
+        if not order:
+            raise LookupError(f"Order ID {order_id} not found.")
+        if order.status == "Completed":
+            raise ValueError(f"Order ID {order_id} is already 'Completed' and cannot be modified.")
+        return order, apply_order_status(session, order, new_status)
+
+    order, old_status = writer_for(order_engine).execute(update)
+    status_transitions.labels(old_status, new_status).inc()
+    return order
+
+def count_user_orders(session: Session, user_id: int) -> int:
+    """Live plus archived orders of one customer, counted in SQL."""
+    live = session.exec(select(func.count()).select_from(ServiceRequest).where(ServiceRequest.customer_id == user_id)).one()
+    archived = session.exec(select(func.count()).select_from(ServiceRequestArchive).where(ServiceRequestArchive.customer_id == user_id)).one()
+    return live + archived
+
+def delete_user_with_history(session: Session, user: User, order_count: int):
+    """
+    Deletes a customer and all of their orders (live and archived) in one
+    transaction, then frees the username and order IDs. Rolls back and re-raises on error.
+    """
+    user_id = user.id
+    try:
+        # Step A: Delete Child Records (ServiceRequests)
+        # Deletions are logged first (one INSERT ... SELECT each), then removed in bulk
+        record_bulk_events(session, ServiceRequest, ServiceRequest.customer_id == user_id, "deleted")
+        record_bulk_events(session, ServiceRequestArchive, ServiceRequestArchive.customer_id == user_id, "deleted")
+
+        # We use the delete() statement for efficiency
+        session.exec(delete(ServiceRequest).where(ServiceRequest.customer_id == user_id))
+        session.exec(delete(ServiceRequestArchive).where(ServiceRequestArchive.customer_id == user_id))
+        delete_summary(session, user_id)
+
+        # Step B: Delete Parent Record (User)
+        deleted_user_name = user.user_name
+        deleted_fields = (user.email, user.contact_number)
+        session.delete(user)
+
+        # Step C: Commit (The Point of No Return)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    # Step D: Free the username for re-registration, and the order IDs
+    remove_from_directory(deleted_user_name)
+    if is_sharded():
+        writer_for(engine).execute(lambda catalog: release_order_ids(catalog, customer_id=user_id))
+    username_filter.remove(deleted_user_name, user_id)
+    user_index.remove_user(user_id, deleted_user_name, *deleted_fields)
+
+    user_removals.inc()
+    # Freed pages are handed back by the maintenance scheduler
+    note_deleted_rows(order_count + 1)
+
+def remove_user(user_id: int) -> int | None:
+    """Deletes a customer and their history. Returns the number of orders removed, or None if the user does not exist."""
+    # User IDs route straight to their shard
+    with Session(engine_for_customer(user_id)) as session:
+        user = session.get(User, user_id)
+        if not user:
+            return None
+        count = count_user_orders(session, user_id)
+        delete_user_with_history(session, user, count)
+    return count
+
 def change_order_status_ui():
     """
     Allows the Admin to update the lifecycle status of a specific Service Request.
@@ -75,7 +207,15 @@ def change_order_status_ui():
 
     order_id = int(order_id_input)
 
-    with Session(engine) as session:
+    # Orders live on their customer's shard; the order directory knows whose order this is
+    order_engine = engine_for_order(order_id)
+
+    if order_engine is None:
+        console.print(Panel(f"[bold red]Error:[/bold red] Order ID {order_id} not found."))
+        questionary.press_any_key_to_continue().ask()
+        return
+
+    with Session(order_engine) as session:
         # 2. Find Record (Efficient Retrieval)
         # Explainability: session.get(Model, PK) is the most optimized way to fetch a row.
         # It skips the overhead of constructing a WHERE clause because it looks directly up the Primary Key index.
@@ -121,35 +261,30 @@ def change_order_status_ui():
         if new_status == "Back" or new_status is None:
             return
 
-        # 5. Database Update
+        # 5. Database Update (grouped with other writers' commits, see app.group_commit)
         try:
-            # We modify the Python object directly
-            order.status = new_status
-
-            # session.add tells SQLModel this object is 'dirty' and needs saving
-            session.add(order)
-            session.commit()
-            session.refresh(order)
+            order = change_order_status(order.id, new_status, order_engine)
 
             console.print(Panel(
                 f"[bold green]Success:[/bold green] Order #{order.id} status updated to '{order.status}'.",
                 style="green"
             ))
 
+        except (LookupError, ValueError) as e:
+            console.print(Panel(f"[bold red]Error:[/bold red] {e}", style="red"))
         except Exception as e:
-            session.rollback()
             console.print(f"[bold red]Database Error:[/bold red] {e}")
 
     questionary.press_any_key_to_continue().ask()
 
-def display_users(results: list[User]):
+@screen_render_seconds.labels("user_search").time()
+def display_users(results: list[UserRow]) -> Table | Panel:
     """
-    Helper function to render a list of Users in a Rich Table.
+    Helper function to build the Rich Table for a list of Users.
     Keeps the main logic clean.
     """
     if not results:
-        console.print(Panel("[yellow]No users found matching that criteria.[/yellow]", title="Search Results"))
-        return
+        return Panel("[yellow]No users found matching that criteria.[/yellow]", title="Search Results")
 
     table = Table(title=f"Search Results ({len(results)} found)", show_lines=True)
 
@@ -169,7 +304,24 @@ def display_users(results: list[User]):
             user.contact_number
         )
 
-    console.print(table)
+    return table
+
+# Search menu label -> indexed User field
+INDEXED_SEARCH_FIELDS = {
+    "Username": "user_name",
+    "Email": "email",
+    "Contact Number": "contact_number",
+}
+
+def _users_by_id(user_ids: list[int]) -> list[UserRow]:
+    # User IDs route straight to their shard
+    users = []
+    for user_id in sorted(user_ids):
+        with Session(engine_for_customer(user_id)) as session:
+            row = session.exec(select_rows(User, UserRow).where(User.id == user_id)).first()
+            if row:
+                users.append(UserRow._make(row))
+    return users
 
 def search_user_ui():
     """
@@ -193,13 +345,26 @@ def search_user_ui():
     if search_by == "Back to Dashboard" or search_by is None:
         return
 
-    # 2. Get Input
-    search_term = questionary.text(f"Enter {search_by}:").ask()
+    # 2. Get Input (text fields get live suggestions from the in-memory index)
+    field_name = INDEXED_SEARCH_FIELDS.get(search_by)
+    if field_name and user_index.loaded:
+        search_term = questionary.autocomplete(
+            f"Enter {search_by}:",
+            choices=[],
+            completer=UserFieldCompleter(user_index, field_name)
+        ).ask()
+    else:
+        search_term = questionary.text(f"Enter {search_by}:").ask()
     if not search_term: return
 
-    # 3. Database Logic
-    with Session(engine) as session:
-        statement = select(User)
+    # 3a. Users whose value is exactly the term (e.g. a picked suggestion), from the in-memory
+    # index and without the suggestion limit. They are added to the substring search below,
+    # never a substitute for it: "David" must still find "Davidson"
+    exact_ids = user_index.exact_ids(field_name, search_term) if field_name and user_index.loaded else []
+
+    # 3b. Database Logic (every shard is searched in parallel)
+    with ShardedSession(sort_key=lambda user: user.id) as session:
+        statement = select_rows(User, UserRow)
 
         # We build the query based on the selection
         if search_by == "User ID":
@@ -225,10 +390,16 @@ def search_user_ui():
             statement = statement.where(col(User.contact_number).op("GLOB")(f"*{search_term}*"))
 
         # Execute
-        results = session.exec(statement).all()
+        results = as_rows(session.all(statement), UserRow)
+
+    # The substring search finds the exact matches too, unless the term holds GLOB wildcards
+    found = {user.id for user in results}
+    missing = [user_id for user_id in exact_ids if user_id not in found]
+    if missing:
+        results = sorted(results + _users_by_id(missing), key=lambda user: user.id)
 
-        # 4. Display
-        display_users(results)
+    # 4. Display
+    console.print(display_users(results))
 
     questionary.press_any_key_to_continue().ask()
 
@@ -253,7 +424,8 @@ def remove_user_ui():
 
     target_id = int(target_id_input)
 
-    with Session(engine) as session:
+    # User IDs route straight to their shard
+    with Session(engine_for_customer(target_id)) as session:
         # 2. Safety Check: Does User Exist?
         user_to_delete = session.get(User, target_id)
 
@@ -263,10 +435,7 @@ def remove_user_ui():
             return
 
         # 3. Impact Analysis: Count associated records
-        # We search for requests where customer_id matches our target
-        statement = select(ServiceRequest).where(ServiceRequest.customer_id == target_id)
-        linked_requests = session.exec(statement).all()
-        count = len(linked_requests)
+        count = count_user_orders(session, target_id)
 
         # 4. Final Warning / Confirmation
         console.print(Panel(
@@ -289,16 +458,7 @@ def remove_user_ui():
 
         # 5. The Atomic Transaction
         try:
-            # Step A: Delete Child Records (ServiceRequests)
-            # We use the delete() statement for efficiency
-            delete_statement = delete(ServiceRequest).where(ServiceRequest.customer_id == target_id)
-            session.exec(delete_statement)
-
-            # Step B: Delete Parent Record (User)
-            session.delete(user_to_delete)
-
-            # Step C: Commit (The Point of No Return)
-            session.commit()
+            delete_user_with_history(session, user_to_delete, count)
 
             console.print(Panel(
                 f"[bold green]Success:[/bold green] User {target_id} and {count} linked orders have been removed.",
@@ -315,11 +475,45 @@ def remove_user_ui():
 
     questionary.press_any_key_to_continue().ask()
 
+def show_system_tools_menu():
+    """
+    Submenu for database housekeeping tasks (backups and friends).
+    """
+    while True:
+        console.clear()
+        console.print(Panel("System Tools", style="bold magenta"))
+
+        choice = questionary.select(
+            "System Tools:",
+            choices=[
+                "Backup & Restore",
+                "Archive Finished Orders",
+                "Database Maintenance",
+                "Back"
+            ]
+        ).ask()
+
+        if choice == "Backup & Restore":
+            backup_ui()
+
+        elif choice == "Archive Finished Orders":
+            archive_orders_ui()
+
+        elif choice == "Database Maintenance":
+            maintenance_ui()
+
+        elif choice == "Back" or choice is None:
+            return
+
 def show_admin_dashboard():
     """
     The main loop for the Admin Interface.
     Control stays here until 'Logout' is selected.
     """
+    # Build the customer search index once per process (kept current afterwards)
+    with console.status("Loading customer search index..."):
+        user_index.ensure_loaded()
+
     while True:
         console.clear()
 
@@ -335,9 +529,15 @@ def show_admin_dashboard():
             "Admin Menu:",
             choices=[
                 "View All Orders",
+                "Live Order Board",
                 "Change Order Status",
+                "Dispatch Pending Orders",
+                "Route Batches",
+                "Order Analytics",
                 "Search a User",
+                "Import Users",
                 "Remove User",
+                "System Tools",
                 "Logout"
             ]
         ).ask()
@@ -346,15 +546,33 @@ def show_admin_dashboard():
         if choice == "View All Orders":
             view_all_orders()
 
+        elif choice == "Live Order Board":
+            order_board_ui()
+
         elif choice == "Change Order Status":
             change_order_status_ui()
 
+        elif choice == "Dispatch Pending Orders":
+            dispatch_ui()
+
+        elif choice == "Route Batches":
+            route_batches_ui()
+
+        elif choice == "Order Analytics":
+            analytics_ui()
+
         elif choice == "Search a User":
             search_user_ui()
 
+        elif choice == "Import Users":
+            import_users_ui()
+
         elif choice == "Remove User":
             remove_user_ui()
 
+        elif choice == "System Tools":
+            show_system_tools_menu()
+
         elif choice == "Logout" or choice is None:
             # Breaking this loop returns control to main.py
             console.print("[yellow]Logging out...[/yellow]")
@@ -0,0 +1,457 @@
+"""
+app/analytics.py
+----------------
+Vectorized order analytics for the admin dashboard.
+
+load_order_columns() streams five columns of every order (live and archived, on
+every shard) in CHUNK_SIZE batches straight from the SQLite cursor into
+preallocated typed NumPy arrays. Status, vendor and service are already stored
+as lookup codes (app.lookups), so each row reaches Python as five ints and is
+copied with np.fromiter:
+
+    amount      int32   order amount
+    created_at  int64   booking time, seconds since the epoch
+    status      int8    code into labels["status"]
+    vendor      int16   code into labels["vendor"]
+    service     int16   code into labels["service"]
+
+That is 17 bytes per order (~170 MB for 10M orders), plus one chunk of rows in
+flight. No ORM objects are built. Every report below is then a handful of
+whole-array operations (bincount over combined group keys, masked percentiles),
+with no per-order Python loop.
+
+Above PARALLEL_MIN_ORDERS orders the columns are loaded by app.scan's worker
+processes, one key range at a time, and the partial arrays joined in key order.
+
+When the database has a column snapshot (app.column_snapshot), the screen and
+the command line read it instead: the snapshot is brought up to date from the
+order event log and the five columns are mapped from its files, so nothing is
+decoded row by row.
+
+Command line:
+    python -m app.analytics [--source snapshot|tables] [--workers N]
+"""
+
+import argparse
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import questionary
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+from app.database import shard_engines
+from app.models import ServiceRequest, ServiceRequestArchive
+from app.lookups import status_dictionary, vendor_dictionary, service_dictionary, load_dictionaries
+from app.scan import parallel_scan, SCAN_WORKERS
+from app.column_snapshot import SNAPSHOT_DIR, refresh_snapshots, read_columns
+
+console = Console()
+
+CHUNK_SIZE = 50_000
+PARALLEL_MIN_ORDERS = 500_000
+SECONDS_PER_DAY = 86_400
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+# 1970-01-01 was a Thursday; shifting by 3 days makes weeks start on Monday
+WEEK_SHIFT_DAYS = 3
+
+REVENUE_WEEKS = 6
+FUNNEL_DAYS = 14
+PERCENTILES = (50, 90, 99)
+UNBILLED_STATUSES = ("Cancelled",)
+FUNNEL_STATUSES = ("Pending", "In Progress", "Completed", "Cancelled")
+
+@dataclass
+class OrderColumns:
+    amount: np.ndarray
+    created_at: np.ndarray
+    status: np.ndarray
+    vendor: np.ndarray
+    service: np.ndarray
+    labels: dict[str, list[str]] = field(default_factory=dict)
+    load_seconds: float = 0.0
+    source: str = "tables"
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.amount, self.created_at, self.status, self.vendor, self.service))
+
+    def codes_for(self, column: str, values) -> list[int]:
+        return [self.labels[column].index(value) for value in values if value in self.labels[column]]
+
+ARRAY_NAMES = ("amount", "created_at", "status", "vendor", "service")
+
+# (array name, SQL column, lookup dictionary) for the encoded columns
+CODED_COLUMNS = (
+    ("status", "status", status_dictionary),
+    ("vendor", "vendor_name", vendor_dictionary),
+    ("service", "service_name", service_dictionary),
+)
+
+# amount, created_at (epoch seconds) and the coded columns, in _CHUNK_DTYPE order
+SCAN_COLUMNS = ["amount", "coalesce(unixepoch(created_at), 0)", *(sql_column for _, sql_column, _ in CODED_COLUMNS)]
+
+_CHUNK_DTYPE = np.dtype([
+    ("amount", np.int32),
+    ("created_at", np.int64),
+    ("status", np.int8),
+    ("vendor", np.int16),
+    ("service", np.int16),
+])
+
+# --- LOADING ---
+
+def _tables(include_archive: bool) -> list[str]:
+    models = [ServiceRequest, ServiceRequestArchive] if include_archive else [ServiceRequest]
+    return [model.__tablename__ for model in models]
+
+def _count_orders(tables: list[str]) -> int:
+    total = 0
+    for shard_engine in shard_engines:
+        conn = shard_engine.raw_connection()
+        try:
+            for table in tables:
+                total += conn.cursor().execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+        finally:
+            conn.close()
+    return total
+
+def _load_serial(tables: list[str], total: int, chunk_size: int, progress) -> np.ndarray:
+    # The array is sized up front, so chunks are copied in place (no list of all rows).
+    # Each table is streamed in chunks; SQLite converts the timestamp to epoch seconds.
+    data = np.empty(total, dtype=_CHUNK_DTYPE)
+    position = 0
+    for shard_engine in shard_engines:
+        conn = shard_engine.raw_connection()
+        try:
+            for table in tables:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT {', '.join(SCAN_COLUMNS)} FROM {table}")
+                while position < total:
+                    # Rows inserted since the count are left for the next load
+                    rows = cursor.fetchmany(min(chunk_size, total - position))
+                    if not rows:
+                        break
+                    end = position + len(rows)
+                    data[position:end] = np.fromiter(rows, dtype=_CHUNK_DTYPE, count=len(rows))
+                    position = end
+                    if progress:
+                        progress(position, total)
+        finally:
+            conn.close()
+
+    # Rows deleted since the count leave a tail we never filled
+    return data[:position]
+
+def _chunks_to_array(chunks) -> np.ndarray:
+    """Scan function for app.scan: one partition's rows as a typed array."""
+    parts = [np.fromiter(rows, dtype=_CHUNK_DTYPE, count=len(rows)) for rows in chunks]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=_CHUNK_DTYPE)
+
+def _append_array(arrays: list, array: np.ndarray) -> list:
+    arrays.append(array)
+    return arrays
+
+def _load_parallel(tables: list[str], total: int, workers: int, progress) -> np.ndarray:
+    # Each worker builds its partitions' arrays; they are joined here in key order
+    arrays = []
+    loaded = 0
+    for table in tables:
+        def on_partition(stats, done, partitions):
+            nonlocal loaded
+            loaded += stats.rows
+            if progress:
+                progress(loaded, max(total, loaded))
+
+        result = parallel_scan(table, SCAN_COLUMNS, _chunks_to_array, _append_array, initial=[], workers=workers, progress=on_partition)
+        arrays += result.value
+    return np.concatenate(arrays) if arrays else np.empty(0, dtype=_CHUNK_DTYPE)
+
+def load_order_columns(include_archive: bool = True, chunk_size: int = CHUNK_SIZE, workers: int = 1, progress=None) -> OrderColumns:
+    """
+    Streams the analytics columns of every order into typed arrays.
+    With workers > 1 and at least PARALLEL_MIN_ORDERS orders, the tables are read in
+    key ranges by app.scan's process pool (starting the workers costs more than it
+    saves on small tables). progress(loaded, total) is called after each chunk or partition.
+    """
+    started = time.perf_counter()
+    tables = _tables(include_archive)
+    labels = _load_labels()
+    total = _count_orders(tables)
+    if workers > 1 and total >= PARALLEL_MIN_ORDERS:
+        data = _load_parallel(tables, total, workers, progress)
+    else:
+        data = _load_serial(tables, total, chunk_size, progress)
+    return _order_columns(data, labels, started, "tables")
+
+def load_snapshot_columns(progress=None) -> OrderColumns | None:
+    """
+    The same columns (live and archived orders) from the column snapshot: refreshed from
+    the event log first, a drifted shard rebuilt, then mapped rather than loaded.
+    Returns None when the database has no snapshot (in-memory).
+    progress(loaded, total) follows a shard being (re)built.
+    """
+    if SNAPSHOT_DIR is None:
+        return None
+    started = time.perf_counter()
+    labels = _load_labels()
+    refresh_snapshots(rebuild_drifted=True, progress=progress)
+    data = read_columns(ARRAY_NAMES)
+    if data is None:
+        return None
+    return _order_columns(data, labels, started, "snapshot")
+
+def _load_labels() -> dict[str, list[str]]:
+    # The labels are the lookup values, indexed by code
+    load_dictionaries(shard_engines[0])
+    return {name: list(dictionary.names) for name, _, dictionary in CODED_COLUMNS}
+
+def _order_columns(data, labels: dict[str, list[str]], started: float, source: str) -> OrderColumns:
+    # `data` is the row-shaped buffer or the snapshot's arrays; each column is made contiguous
+    # for the reports (a copy out of the buffer, the mapped array itself from the snapshot).
+    # A code appended by a migration after the labels were read waits for the next load
+    coded = np.ones(len(data["amount"]), dtype=bool)
+    for name, _, _ in CODED_COLUMNS:
+        coded &= data[name] < len(labels[name])
+    arrays = {name: data[name] if coded.all() else data[name][coded] for name in ARRAY_NAMES}
+    return OrderColumns(
+        **{name: np.ascontiguousarray(array) for name, array in arrays.items()},
+        labels=labels,
+        load_seconds=time.perf_counter() - started,
+        source=source
+    )
+
+# --- AGGREGATES ---
+
+def _week_index(created_at: np.ndarray) -> np.ndarray:
+    return (created_at // SECONDS_PER_DAY + WEEK_SHIFT_DAYS) // 7
+
+def _week_start(week: int) -> np.datetime64:
+    return np.datetime64((week * 7 - WEEK_SHIFT_DAYS), "D")
+
+def _billed(columns: OrderColumns) -> np.ndarray:
+    return ~np.isin(columns.status, columns.codes_for("status", UNBILLED_STATUSES))
+
+def vendor_revenue_by_week(columns: OrderColumns, weeks: int = REVENUE_WEEKS):
+    """
+    Returns (week start dates, vendor labels, revenue matrix [vendor, week]) for the
+    last `weeks` weeks that have orders. Cancelled orders are not revenue.
+    """
+    if len(columns) == 0:
+        return [], [], np.zeros((0, 0), dtype=np.int64)
+
+    week = _week_index(columns.created_at)
+    last_week = int(week.max())
+    first_week = last_week - weeks + 1
+
+    mask = _billed(columns) & (week >= first_week)
+    vendor_count = len(columns.labels["vendor"])
+    # One bucket per (vendor, week): key = vendor * weeks + week offset
+    key = columns.vendor[mask].astype(np.int64) * weeks + (week[mask] - first_week)
+    revenue = np.bincount(key, weights=columns.amount[mask], minlength=vendor_count * weeks)
+
+    starts = [_week_start(w) for w in range(first_week, last_week + 1)]
+    return starts, columns.labels["vendor"], revenue.reshape(vendor_count, weeks).astype(np.int64)
+
+def amount_percentiles_by_service(columns: OrderColumns, percentiles=PERCENTILES):
+    """
+    Returns rows of (service, orders, mean amount, {percentile: amount}).
+    Counts and sums come from one bincount each; percentiles use np.percentile's
+    linear-time partition on one service's amounts at a time, so the extra memory
+    is bounded by the largest service rather than a sort of every order.
+    """
+    if len(columns) == 0:
+        return []
+
+    service_count = len(columns.labels["service"])
+    counts = np.bincount(columns.service, minlength=service_count)
+    sums = np.bincount(columns.service, weights=columns.amount, minlength=service_count)
+
+    rows = []
+    for code in np.flatnonzero(counts):
+        values = np.percentile(columns.amount[columns.service == code], percentiles)
+        rows.append((
+            columns.labels["service"][code],
+            int(counts[code]),
+            float(sums[code] / counts[code]),
+            dict(zip(percentiles, values.tolist()))
+        ))
+    return sorted(rows, key=lambda row: -row[1])
+
+def status_funnel_by_day(columns: OrderColumns, days: int = FUNNEL_DAYS):
+    """
+    Returns (booking dates, status labels, counts matrix [day, status]) for the last
+    `days` booking days: how many orders booked on each day are now in each status.
+    """
+    if len(columns) == 0:
+        return [], list(FUNNEL_STATUSES), np.zeros((0, len(FUNNEL_STATUSES)), dtype=np.int64)
+
+    day = columns.created_at // SECONDS_PER_DAY
+    last_day = int(day.max())
+    first_day = last_day - days + 1
+
+    mask = day >= first_day
+    status_count = len(columns.labels["status"])
+    key = (day[mask] - first_day) * status_count + columns.status[mask]
+    counts = np.bincount(key, minlength=days * status_count).reshape(days, status_count)
+
+    # Fixed funnel order, then any other statuses that appear in the data
+    labels = [label for label in FUNNEL_STATUSES if label in columns.labels["status"]]
+    labels += [label for label in columns.labels["status"] if label not in labels]
+    counts = counts[:, [columns.labels["status"].index(label) for label in labels]]
+
+    dates = [np.datetime64(first_day + offset, "D") for offset in range(days)]
+    return dates, labels, counts
+
+def order_volume_histogram(columns: OrderColumns, bucket_seconds: int = SECONDS_PER_WEEK):
+    """Returns (bucket start dates, order counts) over the whole history."""
+    if len(columns) == 0:
+        return [], np.zeros(0, dtype=np.int64)
+
+    if bucket_seconds == SECONDS_PER_WEEK:
+        bucket = _week_index(columns.created_at)
+        to_date = _week_start
+    else:
+        bucket = columns.created_at // bucket_seconds
+        to_date = lambda b: np.datetime64(int(b) * bucket_seconds, "s").astype("datetime64[D]")
+
+    first = int(bucket.min())
+    counts = np.bincount(bucket - first)
+    return [to_date(first + offset) for offset in range(len(counts))], counts
+
+# --- RENDERING ---
+
+def _money(value) -> str:
+    # Compact enough for a week-per-column table on an 80 column terminal
+    return f"${value / 1000:,.1f}k" if value >= 10_000 else f"${value:,.0f}"
+
+def render_vendor_revenue(columns: OrderColumns):
+    starts, vendors, revenue = vendor_revenue_by_week(columns)
+    table = Table(title=f"Vendor Revenue per Week (last {len(starts)} weeks)")
+    table.add_column("Vendor", style="bold", no_wrap=True)
+    for start in starts:
+        table.add_column(str(start)[5:], justify="right")
+    table.add_column("Total", justify="right", style="bold green")
+
+    for row_index in np.argsort(-revenue.sum(axis=1)):
+        row = revenue[row_index]
+        table.add_row(vendors[row_index], *(_money(value) for value in row), _money(row.sum()))
+    console.print(table)
+
+def render_amount_percentiles(columns: OrderColumns):
+    table = Table(title="Order Amount per Service", show_lines=True)
+    table.add_column("Service", style="bold")
+    table.add_column("Orders", justify="right")
+    table.add_column("Mean", justify="right")
+    for percentile in PERCENTILES:
+        table.add_column(f"p{percentile}", justify="right", style="green")
+
+    for service, count, mean, values in amount_percentiles_by_service(columns):
+        table.add_row(service, f"{count:,}", f"${mean:,.0f}", *(f"${values[p]:,.0f}" for p in PERCENTILES))
+    console.print(table)
+
+def render_status_funnel(columns: OrderColumns):
+    dates, labels, counts = status_funnel_by_day(columns)
+    table = Table(title=f"Status Funnel by Booking Day (last {len(dates)} days)", show_lines=False)
+    table.add_column("Booked On", style="bold")
+    for label in labels:
+        table.add_column(label, justify="right")
+    table.add_column("Done %", justify="right", style="green")
+
+    done_column = labels.index("Completed") if "Completed" in labels else None
+    for date, row in zip(dates, counts):
+        total = int(row.sum())
+        done = f"{100 * row[done_column] / total:.0f}%" if total and done_column is not None else "-"
+        table.add_row(str(date), *(f"{value:,}" for value in row), done)
+    console.print(table)
+
+def render_volume_histogram(columns: OrderColumns, width: int = 40):
+    starts, counts = order_volume_histogram(columns)
+    table = Table(title="Orders per Week", show_lines=False, box=None)
+    table.add_column("Week of", style="bold")
+    table.add_column("Orders", justify="right")
+    table.add_column("")
+
+    peak = counts.max() if len(counts) else 0
+    bars = np.ceil(counts * width / peak).astype(int) if peak else counts
+    for start, count, bar in zip(starts, counts, bars):
+        table.add_row(str(start), f"{count:,}", "[cyan]" + "█" * bar + "[/cyan]")
+    console.print(table)
+
+REPORTS = {
+    "Vendor Revenue per Week": render_vendor_revenue,
+    "Order Amount Percentiles per Service": render_amount_percentiles,
+    "Status Funnel by Booking Day": render_status_funnel,
+    "Order Volume Histogram": render_volume_histogram,
+}
+
+def _load_with_status(workers: int = SCAN_WORKERS, source: str = "snapshot") -> OrderColumns:
+    with console.status("Loading order columns...") as status:
+        columns = None
+        if source == "snapshot":
+            status.update("Refreshing column snapshot...")
+            columns = load_snapshot_columns(
+                progress=lambda loaded, total: status.update(f"Building column snapshot... {loaded:,}/{total:,}")
+            )
+        if columns is None:
+            columns = load_order_columns(
+                workers=workers,
+                progress=lambda loaded, total: status.update(f"Loading order columns... {loaded:,}/{total:,}")
+            )
+    return columns
+
+def _loaded_note(columns: OrderColumns) -> str:
+    verb = "mapped from the column snapshot" if columns.source == "snapshot" else "loaded"
+    return (
+        f"[dim]{len(columns):,} orders {verb} in {columns.load_seconds:.2f} s "
+        f"({columns.nbytes / 1024 / 1024:.1f} MiB of arrays)[/dim]"
+    )
+
+def analytics_ui():
+    """
+    Admin screen: loads the order columns once, then renders any report from memory.
+    """
+    console.clear()
+    console.print(Panel("Order Analytics", style="bold blue"))
+    columns = _load_with_status()
+
+    while True:
+        console.clear()
+        console.print(Panel(f"Order Analytics\n{_loaded_note(columns)}", style="bold blue"))
+
+        choice = questionary.select(
+            "Report:",
+            choices=list(REPORTS) + ["Reload Data", "Back"]
+        ).ask()
+
+        if choice == "Back" or choice is None:
+            return
+
+        if choice == "Reload Data":
+            columns = _load_with_status()
+            continue
+
+        started = time.perf_counter()
+        REPORTS[choice](columns)
+        console.print(f"[dim]Computed in {(time.perf_counter() - started) * 1000:.1f} ms[/dim]")
+        questionary.press_any_key_to_continue().ask()
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Order analytics reports.")
+    parser.add_argument("--source", choices=("snapshot", "tables"), default="snapshot", help="Read the column snapshot or the tables.")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS, help="Processes loading large tables (app.scan).")
+    args = parser.parse_args()
+    columns = _load_with_status(args.workers, args.source)
+    console.print(_loaded_note(columns))
+    for render in REPORTS.values():
+        render(columns)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+app/archive.py
+--------------
+Hot/cold split for finished orders.
+
+'Completed' and 'Cancelled' orders never change again, so once they are old
+enough they are moved out of the hot ServiceRequest table into
+ServiceRequestArchive. Counts, pages and indexes on the hot table then only
+cover live work; the pagers reach archived rows only when asked to.
+"""
+
+from datetime import datetime, timedelta
+
+import questionary
+from rich.console import Console
+from rich.panel import Panel
+from sqlalchemy import insert, literal
+from sqlmodel import Session, select, delete, col
+
+from app.database import shard_engines
+from app.models import ServiceRequest, ServiceRequestArchive
+from app.maintenance import note_deleted_rows
+from app.events import record_bulk_events
+
+console = Console()
+
+TERMINAL_STATUSES = ("Completed", "Cancelled")
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 500
+
+# Columns copied from the hot table; archived_at is filled in by the archive table default.
+_COPIED_COLUMNS = [column.name for column in ServiceRequest.__table__.columns]
+
+def archive_finished_orders(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE, progress=None) -> int:
+    """
+    Moves terminal-state orders created more than `older_than_days` ago into the archive.
+
+    Work is done in batches of `batch_size` rows, each in its own short transaction
+    (copy + delete), so the write lock is never held for long. Batches walk the primary
+    key forward, so no extra index is needed on the hot table and a stopped job can
+    simply be run again.
+
+    Returns the number of orders archived.
+    """
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    archived_total = 0
+
+    for shard_engine in shard_engines:
+        archived_total += _archive_shard(shard_engine, cutoff, batch_size, archived_total, progress)
+
+    return archived_total
+
+def _archive_shard(shard_engine, cutoff: datetime, batch_size: int, archived_so_far: int, progress) -> int:
+    archived_total = 0
+    last_id = 0
+
+    while True:
+        with Session(shard_engine) as session:
+            # 1. Pick the next batch of candidates (PK range scan)
+            ids = session.exec(
+                select(ServiceRequest.id)
+                .where(ServiceRequest.id > last_id)
+                .where(col(ServiceRequest.status).in_(TERMINAL_STATUSES))
+                .where(ServiceRequest.created_at < cutoff)
+                .order_by(ServiceRequest.id)
+                .limit(batch_size)
+            ).all()
+
+            if not ids:
+                break
+
+            # 2. Copy + delete in one transaction; either both happen or neither does
+            archived_at = datetime.now()
+            copy_statement = insert(ServiceRequestArchive).from_select(
+                _COPIED_COLUMNS + ["archived_at"],
+                select(*[ServiceRequest.__table__.c[name] for name in _COPIED_COLUMNS], literal(archived_at))
+                .where(col(ServiceRequest.id).in_(ids))
+            )
+            session.exec(copy_statement)
+            record_bulk_events(session, ServiceRequest, col(ServiceRequest.id).in_(ids), "archived")
+            session.exec(delete(ServiceRequest).where(col(ServiceRequest.id).in_(ids)))
+            session.commit()
+
+        note_deleted_rows(len(ids))
+        archived_total += len(ids)
+        last_id = ids[-1]
+        if progress:
+            progress(archived_so_far + archived_total)
+
+    return archived_total
+
+# --- UI FUNCTIONS ---
+
+def archive_orders_ui():
+    """
+    Admin screen to run the archival job.
+    """
+    console.clear()
+    console.print(Panel("Archive Finished Orders", style="bold blue"))
+
+    days_input = questionary.text(
+        "Archive 'Completed'/'Cancelled' orders older than how many days?",
+        default=str(ARCHIVE_AFTER_DAYS),
+        validate=lambda text: True if text.isdigit() else "Please enter a whole number of days."
+    ).ask()
+    if days_input is None: return
+
+    try:
+        with console.status("Archiving orders...") as status:
+            moved = archive_finished_orders(
+                older_than_days=int(days_input),
+                progress=lambda n: status.update(f"Archiving orders... {n} moved")
+            )
+
+        console.print(Panel(
+            f"[bold green]Archived {moved} order(s).[/bold green]",
+            style="green"
+        ))
+
+    except Exception as e:
+        console.print(f"[bold red]Archive Error:[/bold red] {e}")
+
+    questionary.press_any_key_to_continue().ask()
@@ -1,11 +1,17 @@
 import questionary
 import re
-from sqlmodel import Session, select
+from sqlmodel import Session, select, update
+from sqlalchemy.exc import OperationalError
 from rich.console import Console
 from rich.panel import Panel
-from app.database import engine
+from app.database import engine_for_customer, engine_for_user_name
 from app.models import User
-from app.utils import validate_email, validate_contact, validate_password_complexity
+from app.validators import validate_user_name, validate_email, validate_contact, validate_password_complexity, validate_address
+from app.sharding import user_name_taken, add_to_directory, remove_from_directory
+from app.search_index import user_index
+from app.username_filter import username_filter
+from app.metrics import registrations, logins, password_rehashes
+from app.passwords import password_pool, needs_rehash, dummy_hash, PasswordPoolBusy
 
 # --- HARDCODED ADMIN CREDENTIALS ---
 ADMIN_USERNAME = "admin"
@@ -13,86 +19,164 @@ ADMIN_PASSWORD = "admin123"
 
 console = Console()
 
+def validate_new_user_name(text: str):
+    """
+    Runs on every keystroke. A Bloom filter miss means the name is free without
+    touching the database; only a probable hit is confirmed with a lookup.
+    """
+    length_check = validate_user_name(text)
+    if length_check is not True:
+        return length_check
+    if username_filter.might_contain(text) and user_name_taken(text):
+        return "Username already taken!"
+    return True
+
+# --- ACCOUNT FUNCTIONS (no UI; also driven by benchmarks/load_test.py) ---
+def create_user(user_name: str, email: str, password: str, address: str, contact_number: str) -> User:
+    """
+    Registers a customer: reserves the username, saves the User (with a hashed
+    password) on its shard and updates the in-process username filter and search index.
+    Raises IntegrityError if the username is taken (including by a racing sign-up),
+    PasswordPoolBusy if the hashing pool is full.
+    """
+    # Create User Object (ID generated automatically in models.py)
+    # Only the scrypt hash is stored (app.passwords); hashing runs on the password pool
+    new_user = User(
+        user_name=user_name,
+        email=email,
+        password=password_pool.hash(password),
+        address=address,
+        contact_number=contact_number
+    )
+
+    # Reserve the username first; the directory's primary key catches a racing sign-up
+    add_to_directory(new_user.user_name, new_user.id)
+
+    # The new ID decides which shard the customer lives on
+    try:
+        with Session(engine_for_customer(new_user.id)) as session:
+            session.add(new_user)
+            session.commit()
+            session.refresh(new_user)
+    except Exception:
+        remove_from_directory(new_user.user_name)
+        raise
+
+    username_filter.add(new_user.user_name, new_user.id)
+    user_index.add_user(new_user)
+    registrations.inc()
+    return new_user
+
+def rehash_password(user: User, password: str):
+    """
+    Re-stores a just-verified password with the current scrypt cost (plaintext
+    or older hashes). Skipped if the password changed meanwhile, and left for the
+    next login if the password pool or the database is busy.
+    """
+    try:
+        new_hash = password_pool.hash(password)
+    except PasswordPoolBusy:
+        return
+    try:
+        with Session(engine_for_customer(user.id)) as session:
+            changed = session.exec(
+                update(User).where(User.id == user.id, User.password == user.password).values(password=new_hash)
+            ).rowcount
+            session.commit()
+    except OperationalError:
+        return
+    if changed:
+        user.password = new_hash
+        password_rehashes.inc()
+
+def authenticate(user_name: str, password: str) -> User | None:
+    """
+    Returns the customer with these credentials, or None (admin credentials are not checked here).
+    The check runs on the bounded password pool; raises PasswordPoolBusy if it is full
+    for the check itself (a busy pool only postpones the rehash-on-login).
+    """
+    # Look on the shard that holds this username
+    user = None
+    user_engine = engine_for_user_name(user_name)
+    if user_engine is not None:
+        with Session(user_engine) as session:
+            statement = select(User).where(User.user_name == user_name)
+            user = session.exec(statement).first()
+
+    # An unknown username still costs one hash, so it answers no faster than a wrong password
+    verified = password_pool.verify(password, user.password if user else dummy_hash())
+    if not (user and verified):
+        logins.labels("failure").inc()
+        return None
+
+    logins.labels("success").inc()
+    # Plaintext and older-cost hashes are upgraded transparently (rehash-on-login)
+    if needs_rehash(user.password):
+        rehash_password(user, password)
+    return user
+
 def register_user():
     console.clear()
     console.print(Panel("Register New Customer", style="bold blue"))
 
-    # 1. Username (Max 50 chars)
+    # 1. Username (Max 50 chars, availability checked as you type)
     username = questionary.text(
         "Enter User Name:",
-        validate=lambda text: True if len(text) > 0 and len(text) <= 50 else "Username must be 1-50 characters."
+        validate=validate_new_user_name
     ).ask()
 
     if not username: return  # Handle cancellation
 
-    with Session(engine) as session:
-        # Real-time DB check for duplicate username
-        existing_user = session.exec(select(User).where(User.user_name == username)).first()
-        if existing_user:
-            console.print("[bold red]Error:[/bold red] Username already taken!")
-            questionary.press_any_key_to_continue().ask()
-            return
-
-        # 2. Email (Format & Length check)
-        email = questionary.text(
-            "Enter Email:",
-            validate=validate_email
-        ).ask()
-        if email is None: return
-
-        # 3. Password (Complexity Requirements)
-        password = questionary.password(
-            "Enter Password:",
-            validate=validate_password_complexity
-        ).ask()
-        if password is None: return
-
-        confirm_password = questionary.password(
-            "Confirm Password:",
-            validate=lambda text: True if text == password else "Passwords do not match!"
-        ).ask()
-        if confirm_password is None: return
-
-        # 4. Address (Max 100 chars)
-        address = questionary.text(
-            "Enter Address (Street, City):",
-            validate=lambda text: True if len(text) <= 100 else "Address is too long (max 100 chars)."
-        ).ask()
-        if address is None: return
-
-        # 5. Contact Number (Exactly 10 digits)
-        contact = questionary.text(
-            "Enter Contact Number:",
-            validate=validate_contact
-        ).ask()
-        if contact is None: return
-
-        # Create User Object (ID generated automatically in models.py)
-        new_user = User(
-            user_name=username,
-            email=email,
-            password=password,
-            address=address,
-            contact_number=contact
-        )
-
-        try:
-            session.add(new_user)
-            session.commit()
-            session.refresh(new_user)
+    # 2. Email (Format & Length check)
+    email = questionary.text(
+        "Enter Email:",
+        validate=validate_email
+    ).ask()
+    if email is None: return
+
+    # 3. Password (Complexity Requirements)
+    password = questionary.password(
+        "Enter Password:",
+        validate=validate_password_complexity
+    ).ask()
+    if password is None: return
 
-            # Success Message
-            console.print(Panel(
-                f"[bold green]Customer Registration is successful[/bold green]\n"
-                f"User ID: {new_user.id}\n"
-                f"Name: {new_user.user_name}",
-                style="bold green"
-            ))
+    confirm_password = questionary.password(
+        "Confirm Password:",
+        validate=lambda text: True if text == password else "Passwords do not match!"
+    ).ask()
+    if confirm_password is None: return
 
-        except Exception as e:
-            console.print(f"[bold red]Database Error:[/bold red] {e}")
+    # 4. Address (Max 100 chars)
+    address = questionary.text(
+        "Enter Address (Street, City):",
+        validate=validate_address
+    ).ask()
+    if address is None: return
 
-        questionary.press_any_key_to_continue().ask()
+    # 5. Contact Number (Exactly 10 digits)
+    contact = questionary.text(
+        "Enter Contact Number:",
+        validate=validate_contact
+    ).ask()
+    if contact is None: return
+
+    try:
+        with console.status("Creating account..."):
+            new_user = create_user(username, email, password, address, contact)
+
+        # Success Message
+        console.print(Panel(
+            f"[bold green]Customer Registration is successful[/bold green]\n"
+            f"User ID: {new_user.id}\n"
+            f"Name: {new_user.user_name}",
+            style="bold green"
+        ))
+
+    except Exception as e:
+        console.print(f"[bold red]Database Error:[/bold red] {e}")
+
+    questionary.press_any_key_to_continue().ask()
 
 def login_user() -> User | str | None:
     """
@@ -112,18 +196,24 @@ def login_user() -> User | str | None:
 
     # 1. Check for Admin Match FIRST (Bypasses Database)
     if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+        logins.labels("admin").inc()
         console.print("[bold yellow]Admin Credentials Verified.[/bold yellow]")
         return "ADMIN"
 
     # 2. If not Admin, check Database for Customer
-    with Session(engine) as session:
-        statement = select(User).where(User.user_name == username)
-        user = session.exec(statement).first()
-
-        if user and user.password == password:
-            console.print(f"[green]Welcome back, {user.user_name}![/green]")
-            return user
-        else:
-            console.print("[bold red]Invalid username or password.[/bold red]")
-            questionary.press_any_key_to_continue().ask()
-            return None
\ No newline at end of file
+    # The scrypt check runs on the password pool, so the spinner keeps turning
+    try:
+        with console.status("Checking credentials..."):
+            user = authenticate(username, password)
+    except PasswordPoolBusy:
+        console.print("[bold yellow]The server is busy checking other logins. Please try again.[/bold yellow]")
+        questionary.press_any_key_to_continue().ask()
+        return None
+
+    if user:
+        console.print(f"[green]Welcome back, {user.user_name}![/green]")
+        return user
+
+    console.print("[bold red]Invalid username or password.[/bold red]")
+    questionary.press_any_key_to_continue().ask()
+    return None
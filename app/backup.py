@@ -0,0 +1,375 @@
+"""
+app/backup.py
+-------------
+Online backups of the live SQLite database.
+
+Snapshots are taken with SQLite's online backup API, a bounded number of pages
+per step with a short sleep in between, so a running app keeps accepting bookings
+while the copy is in progress. Every snapshot is verified with
+PRAGMA integrity_check before it is kept.
+
+Layout on disk (one file per shard, see app.database):
+    data/backups/<YYYYmmdd-HHMMSS>/<database file name>
+    data/backups/<YYYYmmdd-HHMMSS>/shard_<n>.db
+"""
+
+import argparse
+import shutil
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import questionary
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+from app.database import engine, shard_engines, shard_file_name, sqlite_file_name, is_memory_database, connect_sqlite, SHARD_COUNT
+from app.lookups import load_dictionaries
+from app.group_commit import close_writers
+from app.maintenance import scheduler as maintenance_scheduler
+from app.username_filter import username_filter
+from app.search_index import user_index
+from app.column_snapshot import shard_snapshots
+
+console = Console()
+
+BACKUP_DIR = Path("data/backups")
+TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+# Copy 256 pages (1 MiB with the default 4 KiB page size) per step, then yield.
+PAGES_PER_STEP = 256
+STEP_SLEEP_SECONDS = 0.05
+
+# Retention: the newest KEEP_LAST snapshots are always kept,
+# anything beyond that is removed once it is older than MAX_AGE_DAYS.
+KEEP_LAST = 10
+MAX_AGE_DAYS = 14
+
+@dataclass
+class Snapshot:
+    path: Path
+    taken_at: datetime
+
+    @property
+    def db_file(self) -> Path:
+        return self.path / Path(sqlite_file_name).name
+
+    def file_names(self) -> set[str]:
+        return {path.name for path in self.path.glob("*.db")}
+
+    def shard_files(self) -> list[tuple[Path, Path]]:
+        """(file in this snapshot, live file it belongs to) for every shard in the snapshot."""
+        pairs = []
+        for index in range(SHARD_COUNT):
+            live_path = Path(shard_file_name(index))
+            snapshot_path = self.path / live_path.name
+            if snapshot_path.exists():
+                pairs.append((snapshot_path, live_path))
+        return pairs
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(path.stat().st_size for path in self.path.glob("*.db"))
+
+# --- CORE OPERATIONS ---
+
+def verify_snapshot(db_path: Path) -> str:
+    """
+    Runs PRAGMA integrity_check against a database file.
+    Returns "ok" for a healthy file, otherwise the first problem SQLite reports.
+    """
+    conn = connect_sqlite(f"{Path(db_path).resolve().as_uri()}?mode=ro")
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+
+def _online_copy(source_path: str, target_path: Path, pages: int, sleep: float, progress=None):
+    """
+    Copies source_path into target_path with the backup API, `pages` per step and a
+    `sleep` second pause after each step. The source is only read-locked for the
+    duration of a single step.
+    """
+    def after_step(status, remaining, total):
+        if progress:
+            progress(status, remaining, total)
+        # The backup API only sleeps itself when a step hits a locked database;
+        # the pause between ordinary steps is what lets writers in
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    source = connect_sqlite(str(source_path), timeout=30)
+    target = connect_sqlite(str(target_path))
+    try:
+        source.backup(target, pages=pages, sleep=sleep, progress=after_step)
+    finally:
+        target.close()
+        source.close()
+
+def _require_file_database():
+    # An in-memory database lives only inside this process: nothing on disk to copy or replace
+    if is_memory_database(sqlite_file_name):
+        raise RuntimeError("Backups need a database file; the current database (SMS_DATABASE) is in memory.")
+
+def create_snapshot(pages_per_step: int = PAGES_PER_STEP, step_sleep: float = STEP_SLEEP_SECONDS, progress=None) -> Snapshot:
+    """
+    Takes a verified point-in-time snapshot of the live database (every shard file).
+    Shards are copied one after another; each shard is consistent on its own, and since
+    a customer never spans shards, so is every customer's data.
+    Raises RuntimeError (and discards the copy) if the integrity check fails, or
+    if the database is in memory.
+    """
+    _require_file_database()
+    taken_at = datetime.now()
+    snapshot = Snapshot(path=BACKUP_DIR / taken_at.strftime(TIMESTAMP_FORMAT), taken_at=taken_at)
+
+    # Two snapshots in the same second would share a folder; suffix the later one.
+    suffix = 1
+    while snapshot.path.exists():
+        snapshot.path = BACKUP_DIR / f"{taken_at.strftime(TIMESTAMP_FORMAT)}-{suffix}"
+        suffix += 1
+    snapshot.path.mkdir(parents=True)
+
+    for index in range(SHARD_COUNT):
+        live_path = shard_file_name(index)
+        target_path = snapshot.path / Path(live_path).name
+        _online_copy(live_path, target_path, pages_per_step, step_sleep, progress)
+
+        result = verify_snapshot(target_path)
+        if result != "ok":
+            shutil.rmtree(snapshot.path, ignore_errors=True)
+            raise RuntimeError(f"Snapshot of {live_path} failed integrity check: {result}")
+
+    return snapshot
+
+def list_snapshots() -> list[Snapshot]:
+    """Returns all snapshots on disk, newest first."""
+    if not BACKUP_DIR.exists():
+        return []
+
+    snapshots = []
+    for folder in BACKUP_DIR.iterdir():
+        if not folder.is_dir():
+            continue
+        try:
+            taken_at = datetime.strptime(folder.name[:15], TIMESTAMP_FORMAT)
+        except ValueError:
+            continue  # Not one of ours
+        snapshots.append(Snapshot(path=folder, taken_at=taken_at))
+
+    return sorted(snapshots, key=lambda s: s.path.name, reverse=True)
+
+def prune_snapshots(keep_last: int = KEEP_LAST, max_age_days: int = MAX_AGE_DAYS) -> list[Snapshot]:
+    """
+    Applies the retention rules and returns the snapshots that were removed.
+    """
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+    removed = []
+
+    for snapshot in list_snapshots()[keep_last:]:
+        if snapshot.taken_at < cutoff:
+            shutil.rmtree(snapshot.path, ignore_errors=True)
+            removed.append(snapshot)
+
+    return removed
+
+def _reload_caches():
+    """Refreshes the in-process state read from the database before a restore."""
+    load_dictionaries(engine)
+    if username_filter.bloom is not None:
+        # The saved filter no longer matches the database, so this rebuilds it
+        username_filter.load()
+    user_index.invalidate()
+    # Event IDs start over with the restored log, so built snapshots are rebuilt, not refreshed
+    for column_snapshot in shard_snapshots():
+        if column_snapshot.load_meta() is not None:
+            column_snapshot.rebuild()
+
+def restore_snapshot(snapshot: Snapshot) -> Snapshot:
+    """
+    Replaces the live database with the contents of a snapshot.
+
+    1. The snapshot is verified first; a damaged snapshot is never restored, nor
+       one taken with another shard layout (SMS_SHARD_COUNT).
+    2. The current database is snapshotted so the restore itself can be undone.
+    3. The group-commit writers commit what they have queued and stop, the
+       maintenance scheduler stops, pooled connections are dropped, and the pages
+       are copied INTO the live file through the backup API in a single step.
+       SQLite holds the write lock for that step, so other connections see either
+       the old or the new database, never a half-written file.
+    4. The in-process caches (lookup codes, username filter, search index) and the
+       column snapshots are reloaded from the restored data, and the scheduler is
+       started again if it was running. Writers restart on their next write.
+
+    Returns the safety snapshot taken in step 2.
+    """
+    _require_file_database()
+    expected = {Path(shard_file_name(index)).name for index in range(SHARD_COUNT)}
+    found = snapshot.file_names()
+    if found != expected:
+        raise RuntimeError(
+            f"Snapshot holds {', '.join(sorted(found)) or 'no database files'}, but the current shard layout "
+            f"(SMS_SHARD_COUNT={SHARD_COUNT}) needs {', '.join(sorted(expected))}. "
+            f"Restore it with the shard count it was taken with."
+        )
+    shard_files = snapshot.shard_files()
+
+    for snapshot_path, _ in shard_files:
+        result = verify_snapshot(snapshot_path)
+        if result != "ok":
+            raise RuntimeError(f"Refusing to restore a damaged snapshot ({snapshot_path.name}): {result}")
+
+    safety_snapshot = create_snapshot()
+
+    close_writers()
+    scheduler_was_running = maintenance_scheduler.stop()
+    try:
+        for shard_engine in shard_engines:
+            shard_engine.dispose()
+
+        for snapshot_path, live_path in shard_files:
+            _online_copy(str(snapshot_path), live_path, pages=-1, sleep=0)
+
+            result = verify_snapshot(live_path)
+            if result != "ok":
+                raise RuntimeError(f"Restored database {live_path} failed integrity check: {result}")
+
+        _reload_caches()
+    finally:
+        if scheduler_was_running:
+            maintenance_scheduler.start()
+
+    return safety_snapshot
+
+# --- UI FUNCTIONS ---
+
+def render_snapshots_table(snapshots: list[Snapshot]):
+    table = Table(title="Database Snapshots", show_lines=True)
+
+    table.add_column("#", justify="right", style="dim")
+    table.add_column("Snapshot", style="cyan")
+    table.add_column("Taken At", justify="center")
+    table.add_column("Size", justify="right", style="green")
+
+    for index, snapshot in enumerate(snapshots, start=1):
+        table.add_row(
+            str(index),
+            snapshot.path.name,
+            snapshot.taken_at.strftime("%Y-%m-%d %H:%M:%S"),
+            f"{snapshot.size_bytes / 1024:.1f} KiB"
+        )
+
+    console.print(table)
+
+def backup_ui():
+    """
+    Admin submenu for taking, listing and restoring snapshots.
+    """
+    while True:
+        console.clear()
+        console.print(Panel("Backup & Restore", style="bold blue"))
+
+        choice = questionary.select(
+            "Backup Menu:",
+            choices=[
+                "Take Snapshot Now",
+                "List Snapshots",
+                "Restore a Snapshot",
+                "Apply Retention Rules",
+                "Back"
+            ]
+        ).ask()
+
+        if choice == "Back" or choice is None:
+            return
+
+        try:
+            if choice == "Take Snapshot Now":
+                with console.status("Copying database pages..."):
+                    snapshot = create_snapshot()
+                console.print(Panel(
+                    f"[bold green]Snapshot verified and saved.[/bold green]\n"
+                    f"Location: {snapshot.db_file}\n"
+                    f"Size: {snapshot.size_bytes / 1024:.1f} KiB",
+                    style="green"
+                ))
+
+            elif choice == "List Snapshots":
+                snapshots = list_snapshots()
+                if snapshots:
+                    render_snapshots_table(snapshots)
+                else:
+                    console.print("[yellow]No snapshots found.[/yellow]")
+
+            elif choice == "Restore a Snapshot":
+                snapshots = list_snapshots()
+                if not snapshots:
+                    console.print("[yellow]No snapshots found.[/yellow]")
+                else:
+                    selected = questionary.select(
+                        "Choose a snapshot to restore:",
+                        choices=[questionary.Choice(title=s.path.name, value=s) for s in snapshots] + ["Cancel"]
+                    ).ask()
+
+                    if selected not in ("Cancel", None):
+                        confirm = questionary.confirm(
+                            f"WARNING: This replaces the live database with '{selected.path.name}'. Proceed?",
+                            default=False
+                        ).ask()
+                        if confirm:
+                            with console.status("Restoring snapshot..."):
+                                safety = restore_snapshot(selected)
+                            console.print(Panel(
+                                f"[bold green]Restored '{selected.path.name}'.[/bold green]\n"
+                                f"The previous state was saved as '{safety.path.name}'.",
+                                style="green"
+                            ))
+
+            elif choice == "Apply Retention Rules":
+                removed = prune_snapshots()
+                console.print(f"[green]Removed {len(removed)} expired snapshot(s).[/green]")
+
+        except Exception as e:
+            console.print(f"[bold red]Backup Error:[/bold red] {e}")
+
+        questionary.press_any_key_to_continue().ask()
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backup and restore for the SMS database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("snapshot", help="Take a verified snapshot now.")
+    subparsers.add_parser("list", help="List snapshots, newest first.")
+    subparsers.add_parser("prune", help="Apply the retention rules.")
+    restore_parser = subparsers.add_parser("restore", help="Restore a snapshot by folder name.")
+    restore_parser.add_argument("name")
+    args = parser.parse_args()
+
+    if args.command in ("snapshot", "restore") and is_memory_database(sqlite_file_name):
+        console.print("[bold red]Error:[/bold red] Backups need a database file; the current database (SMS_DATABASE) is in memory.")
+        return
+
+    if args.command == "snapshot":
+        snapshot = create_snapshot()
+        console.print(f"[green]Saved {snapshot.db_file}[/green]")
+
+    elif args.command == "list":
+        render_snapshots_table(list_snapshots())
+
+    elif args.command == "prune":
+        removed = prune_snapshots()
+        console.print(f"[green]Removed {len(removed)} expired snapshot(s).[/green]")
+
+    elif args.command == "restore":
+        matches = [s for s in list_snapshots() if s.path.name == args.name]
+        if not matches:
+            console.print(f"[bold red]Error:[/bold red] Snapshot '{args.name}' not found.")
+            return
+        safety = restore_snapshot(matches[0])
+        console.print(f"[green]Restored {args.name}. Previous state saved as {safety.path.name}.[/green]")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,520 @@
+"""
+app/column_snapshot.py
+----------------------
+Memory-mapped columnar snapshot of every order, for reporting reads.
+
+Reports read a few columns of every order. From the row-oriented tables that
+means SQLite decoding each whole row and Python handling each value; from the
+snapshot a column is a NumPy array mapped straight from the page cache, and a
+report only touches the column files it uses.
+
+Layout (one directory per shard under SNAPSHOT_DIR):
+    meta.json              rows, capacity, file generation, event watermark
+    <column>.<gen>.npy     one typed array per column (COLUMNS), `capacity`
+                           long: the first `rows` entries are orders (live and
+                           archived), the rest is room to append into
+
+Refresh is incremental and driven by the shard's OrderEvent log, which every
+order change writes in its own transaction. Order IDs are random and
+created_at is stamped before the commit, so neither can mark what has been
+seen; the watermark is the last event ID applied:
+
+    1. In one read transaction: the events after the watermark, the current
+       row (live or archived table) of every order they create or change, and
+       the shard's order count.
+    2. Orders already in the snapshot are patched in place (their status,
+       mostly), new ones are appended into the spare capacity and deleted ones
+       become tombstones (status TOMBSTONE) that readers skip.
+    3. meta.json is replaced last. A crash before that replays the same events
+       next time, which changes nothing twice.
+When the spare capacity runs out, or tombstones pass COMPACT_FRACTION, the
+live rows are rewritten into a new generation of files; a reader still
+mapping the old generation keeps its view until it lets go.
+
+Writes that bypass the event log (the seeder) make a shard drift: the refresh
+reports when its row count no longer matches the tables, `rebuild` recreates
+the snapshot from the tables and `verify` also compares the sum of order IDs.
+A backup restore (app.backup) rebuilds the snapshots itself.
+
+An in-memory database has no snapshot (SNAPSHOT_DIR is None); readers fall
+back to the tables.
+
+Command line:
+    python -m app.column_snapshot refresh|rebuild|verify|status
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): refreshes are only serialized within one process
+    fcntl = None
+
+from app.database import shard_engines, shard_file_name, sqlite_file_name, is_memory_database, connect_sqlite, DEFAULT_DATABASE
+from app.models import ServiceRequest, ServiceRequestArchive, OrderEvent
+from app.metrics import column_snapshot_seconds, column_snapshot_events, column_snapshot_rows
+
+console = Console()
+
+SNAPSHOT_VERSION = 1
+# (column, dtype, SQL expression). Lookup-coded columns keep their codes (app.lookups);
+# created_at is seconds since the epoch, as in app.analytics
+COLUMNS = (
+    ("id", np.int64, "id"),
+    ("customer_id", np.int64, "customer_id"),
+    ("amount", np.int32, "amount"),
+    ("created_at", np.int64, "coalesce(unixepoch(created_at), 0)"),
+    ("status", np.int8, "status"),
+    ("vendor", np.int16, "vendor_name"),
+    ("service", np.int16, "service_name"),
+)
+COLUMN_NAMES = [name for name, _, _ in COLUMNS]
+_ROW_DTYPE = np.dtype([(name, dtype) for name, dtype, _ in COLUMNS])
+_SELECT_LIST = ", ".join(expression for _, _, expression in COLUMNS)
+_TABLES = (ServiceRequest.__tablename__, ServiceRequestArchive.__tablename__)
+
+# Status of a deleted order's row until the next compaction
+TOMBSTONE = -1
+MIN_CAPACITY = 1024
+GROWTH_FACTOR = 1.5
+COMPACT_FRACTION = 0.25
+EVENT_BATCH_SIZE = 5000
+FETCH_SIZE = 50_000
+# Order IDs per "IN (...)" lookup, well under SQLite's bound-parameter limit
+ID_BATCH_SIZE = 500
+
+def _snapshot_dir() -> Path | None:
+    # Kept next to the database it describes; an in-memory database has none
+    if is_memory_database(sqlite_file_name):
+        return None
+    if sqlite_file_name == DEFAULT_DATABASE:
+        return Path("data/columns")
+    return Path(sqlite_file_name).with_suffix(".columns")
+
+SNAPSHOT_DIR = _snapshot_dir()
+
+@dataclass
+class SnapshotMeta:
+    database: str
+    rows: int = 0
+    capacity: int = 0
+    generation: int = 0
+    event_id: int = 0
+    built_at: str = ""
+    refreshed_at: str = ""
+    version: int = SNAPSHOT_VERSION
+
+@dataclass
+class RefreshResult:
+    shard: int
+    events: int = 0
+    appended: int = 0
+    patched: int = 0
+    deleted: int = 0
+    rebuilt: bool = False
+    compacted: bool = False
+    # Orders in the tables minus live rows in the snapshot (None when not checked)
+    drift: int | None = None
+    seconds: float = 0.0
+
+def _capacity_for(rows: int) -> int:
+    return max(MIN_CAPACITY, int(rows * GROWTH_FACTOR))
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+# In-process side of the refresh lock (flock is per open file, not per thread)
+_refresh_lock = threading.Lock()
+
+class ShardSnapshot:
+    """The snapshot files of one shard; see the module docstring."""
+
+    def __init__(self, shard: int, directory: Path | None = None):
+        self.shard = shard
+        self.path = (directory or SNAPSHOT_DIR) / f"shard_{shard}"
+        self.file_name = shard_file_name(shard)
+
+    # --- FILES ---
+
+    def load_meta(self) -> SnapshotMeta | None:
+        """The snapshot's metadata, or None if it is missing, unreadable or of another database."""
+        try:
+            meta = SnapshotMeta(**json.loads((self.path / "meta.json").read_text()))
+        except (OSError, ValueError, TypeError):
+            return None
+        if meta.version != SNAPSHOT_VERSION or meta.database != self.file_name:
+            return None
+        return meta
+
+    def _write_meta(self, meta: SnapshotMeta):
+        temp_path = self.path / "meta.json.tmp"
+        temp_path.write_text(json.dumps(asdict(meta), indent=2))
+        os.replace(temp_path, self.path / "meta.json")
+
+    def _column_path(self, name: str, generation: int) -> Path:
+        return self.path / f"{name}.{generation}.npy"
+
+    def open_columns(self, meta: SnapshotMeta, names=COLUMN_NAMES, mode: str = "r") -> dict[str, np.memmap]:
+        return {name: np.load(self._column_path(name, meta.generation), mmap_mode=mode) for name in names}
+
+    def _create_columns(self, generation: int, capacity: int) -> dict[str, np.memmap]:
+        return {
+            name: np.lib.format.open_memmap(self._column_path(name, generation), mode="w+", dtype=dtype, shape=(capacity,))
+            for name, dtype, _ in COLUMNS
+        }
+
+    def _remove_other_generations(self, generation: int):
+        for path in self.path.glob("*.npy"):
+            if not path.name.endswith(f".{generation}.npy"):
+                try:
+                    path.unlink()
+                except OSError:
+                    # Still mapped by a reader on a platform that refuses; the next rewrite retries
+                    pass
+
+    @contextmanager
+    def _locked(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with _refresh_lock, open(self.path / "lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    # --- DATABASE READS (inside the caller's read transaction) ---
+
+    def _connect(self):
+        connection = connect_sqlite(self.file_name)
+        # Everything read until the rollback comes from one committed state (WAL snapshot)
+        connection.execute("BEGIN")
+        return connection
+
+    def _count_orders(self, connection) -> int:
+        return sum(connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in _TABLES)
+
+    def _fetch_orders(self, connection, order_ids: list[int]) -> np.ndarray:
+        """The current row of each order, from whichever table holds it; missing orders are left out."""
+        parts = []
+        for start in range(0, len(order_ids), ID_BATCH_SIZE):
+            batch = order_ids[start:start + ID_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            for table in _TABLES:
+                rows = connection.execute(f"SELECT {_SELECT_LIST} FROM {table} WHERE id IN ({placeholders})", batch).fetchall()
+                if rows:
+                    parts.append(np.fromiter(rows, dtype=_ROW_DTYPE, count=len(rows)))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=_ROW_DTYPE)
+
+    # --- BUILD & REFRESH ---
+
+    def rebuild(self, progress=None) -> RefreshResult:
+        """Recreates the snapshot from the tables. progress(loaded, total) is called per chunk."""
+        with self._locked():
+            return self._rebuild(progress)
+
+    def _rebuild(self, progress=None) -> RefreshResult:
+        started = time.perf_counter()
+        old = self.load_meta()
+        generation = old.generation + 1 if old else 1
+        connection = self._connect()
+        try:
+            event_id = connection.execute(f"SELECT coalesce(max(id), 0) FROM {OrderEvent.__tablename__}").fetchone()[0]
+            total = self._count_orders(connection)
+            capacity = _capacity_for(total)
+            columns = self._create_columns(generation, capacity)
+            position = 0
+            for table in _TABLES:
+                cursor = connection.execute(f"SELECT {_SELECT_LIST} FROM {table}")
+                while rows := cursor.fetchmany(FETCH_SIZE):
+                    chunk = np.fromiter(rows, dtype=_ROW_DTYPE, count=len(rows))
+                    for name in COLUMN_NAMES:
+                        columns[name][position:position + len(rows)] = chunk[name]
+                    position += len(rows)
+                    if progress:
+                        progress(position, total)
+        finally:
+            connection.rollback()
+            connection.close()
+
+        for column in columns.values():
+            column.flush()
+        self._write_meta(SnapshotMeta(
+            database=self.file_name, rows=position, capacity=capacity, generation=generation,
+            event_id=event_id, built_at=_now(), refreshed_at=_now()
+        ))
+        self._remove_other_generations(generation)
+
+        seconds = time.perf_counter() - started
+        column_snapshot_seconds.labels(str(self.shard), "rebuild").observe(seconds)
+        column_snapshot_rows.labels(str(self.shard)).set(position)
+        return RefreshResult(self.shard, appended=position, rebuilt=True, drift=0, seconds=seconds)
+
+    def refresh(self, check_drift: bool = True) -> RefreshResult:
+        """
+        Applies the events logged since the watermark (see the module docstring). A missing
+        snapshot is built. With check_drift, the result's drift compares the order count.
+        """
+        with self._locked():
+            meta = self.load_meta()
+            if meta is None:
+                return self._rebuild()
+            return self._refresh(meta, check_drift)
+
+    def _refresh(self, meta: SnapshotMeta, check_drift: bool) -> RefreshResult:
+        started = time.perf_counter()
+        result = RefreshResult(self.shard)
+
+        # 1. Events since the watermark, the orders' current rows and the count: one read snapshot
+        last_event = {}
+        watermark = meta.event_id
+        connection = self._connect()
+        try:
+            while batch := connection.execute(
+                f"SELECT id, order_id, event_type FROM {OrderEvent.__tablename__} WHERE id > ? ORDER BY id LIMIT ?",
+                (watermark, EVENT_BATCH_SIZE)
+            ).fetchall():
+                for _, order_id, event_type in batch:
+                    # An archive move changes none of the snapshot's columns
+                    if event_type != "archived":
+                        last_event[order_id] = event_type
+                watermark = batch[-1][0]
+                result.events += len(batch)
+            current = self._fetch_orders(connection, [order_id for order_id, event_type in last_event.items() if event_type != "deleted"])
+            table_rows = self._count_orders(connection) if check_drift else None
+        finally:
+            connection.rollback()
+            connection.close()
+
+        if result.events == 0:
+            if check_drift:
+                status = self.open_columns(meta, ["status"])["status"][:meta.rows]
+                result.drift = table_rows - int(np.count_nonzero(status != TOMBSTONE))
+            result.seconds = time.perf_counter() - started
+            return result
+
+        # 2. Patch the orders already present (a tombstone whose ID came back is revived)
+        columns = self.open_columns(meta, mode="r+")
+        ids = columns["id"][:meta.rows]
+        present = np.flatnonzero(np.isin(ids, current["id"]))
+        if len(present):
+            row_of = {order_id: index for index, order_id in enumerate(current["id"].tolist())}
+            source = [row_of[order_id] for order_id in ids[present].tolist()]
+            for name in COLUMN_NAMES:
+                columns[name][present] = current[name][source]
+        result.patched = len(present)
+
+        # Deleted: logged as deleted, or gone from both tables by the time of the read
+        found = set(current["id"].tolist())
+        gone = [order_id for order_id in last_event if order_id not in found]
+        status = columns["status"]
+        removed = np.flatnonzero(np.isin(ids, gone) & (status[:meta.rows] != TOMBSTONE))
+        status[removed] = TOMBSTONE
+        result.deleted = len(removed)
+
+        # 3. Append the new orders, rewriting compacted first when they do not fit
+        new = current[~np.isin(current["id"], ids[present])]
+        tombstones = int(np.count_nonzero(status[:meta.rows] == TOMBSTONE))
+        if meta.rows + len(new) > meta.capacity or tombstones > COMPACT_FRACTION * meta.rows:
+            columns, meta = self._compact(columns, meta, len(new))
+            result.compacted = True
+            tombstones = 0
+        for name in COLUMN_NAMES:
+            columns[name][meta.rows:meta.rows + len(new)] = new[name]
+            columns[name].flush()
+        result.appended = len(new)
+        meta.rows += len(new)
+
+        # 4. Publish: the watermark only moves once the columns are on disk
+        meta.event_id = watermark
+        meta.refreshed_at = _now()
+        self._write_meta(meta)
+        if result.compacted:
+            self._remove_other_generations(meta.generation)
+
+        if check_drift:
+            result.drift = table_rows - (meta.rows - tombstones)
+        result.seconds = time.perf_counter() - started
+        column_snapshot_seconds.labels(str(self.shard), "refresh").observe(result.seconds)
+        column_snapshot_events.labels(str(self.shard)).inc(result.events)
+        column_snapshot_rows.labels(str(self.shard)).set(meta.rows - tombstones)
+        return result
+
+    def _compact(self, columns: dict, meta: SnapshotMeta, appending: int) -> tuple[dict, SnapshotMeta]:
+        """Copies the live rows into a new generation with room for `appending` more and growth (published by the caller)."""
+        live = np.flatnonzero(columns["status"][:meta.rows] != TOMBSTONE)
+        generation = meta.generation + 1
+        compacted = self._create_columns(generation, _capacity_for(len(live) + appending))
+        for name in COLUMN_NAMES:
+            compacted[name][:len(live)] = columns[name][:meta.rows][live]
+        meta = SnapshotMeta(**{**asdict(meta), "rows": len(live), "capacity": len(compacted["id"]), "generation": generation})
+        return compacted, meta
+
+    # --- READS ---
+
+    def live_columns(self, names) -> dict[str, np.ndarray] | None:
+        """
+        The named columns of the shard's live rows: views of the mapped files when there
+        are no tombstones (nothing is copied), otherwise the live rows gathered.
+        """
+        meta = self.load_meta()
+        if meta is None:
+            return None
+        columns = self.open_columns(meta, sorted(set(names) | {"status"}))
+        live = columns["status"][:meta.rows] != TOMBSTONE
+        if live.all():
+            return {name: np.asarray(columns[name][:meta.rows]) for name in names}
+        return {name: np.asarray(columns[name][:meta.rows][live]) for name in names}
+
+    def verify(self) -> tuple[tuple[int, int], tuple[int, int]]:
+        """((orders, sum of IDs) in the tables, the same for the snapshot's live rows)."""
+        connection = self._connect()
+        try:
+            expected = [0, 0]
+            for table in _TABLES:
+                count, id_sum = connection.execute(f"SELECT count(*), coalesce(sum(id), 0) FROM {table}").fetchone()
+                expected[0] += count
+                expected[1] += id_sum
+        finally:
+            connection.rollback()
+            connection.close()
+        columns = self.live_columns(["id"])
+        ids = columns["id"] if columns is not None else np.empty(0, dtype=np.int64)
+        return tuple(expected), (len(ids), int(ids.sum()))
+
+# --- ALL SHARDS ---
+
+def shard_snapshots() -> list[ShardSnapshot]:
+    """One per shard, or none for an in-memory database."""
+    if SNAPSHOT_DIR is None:
+        return []
+    return [ShardSnapshot(shard) for shard in range(len(shard_engines))]
+
+def refresh_snapshots(rebuild_drifted: bool = False, progress=None) -> list[RefreshResult]:
+    """
+    Refreshes every shard's snapshot (building missing ones). With rebuild_drifted, a shard
+    whose order count no longer matches is rebuilt from the tables; progress(loaded, total)
+    follows a rebuild.
+    """
+    results = []
+    for snapshot in shard_snapshots():
+        result = snapshot.refresh()
+        if rebuild_drifted and result.drift:
+            result = snapshot.rebuild(progress)
+        results.append(result)
+    return results
+
+def read_columns(names) -> dict[str, np.ndarray] | None:
+    """
+    The named columns of every live order in the snapshot, shard by shard. With one
+    shard and no tombstones the arrays are the mapped files themselves (zero-copy).
+    None when there is no snapshot (in-memory database, or a shard never built).
+    """
+    snapshots = shard_snapshots()
+    parts = [snapshot.live_columns(names) for snapshot in snapshots]
+    if not parts or any(part is None for part in parts):
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([part[name] for part in parts]) for name in names}
+
+# --- REPORTING ---
+
+def _file_bytes(snapshot: ShardSnapshot, meta: SnapshotMeta) -> int:
+    return sum(snapshot._column_path(name, meta.generation).stat().st_size for name in COLUMN_NAMES)
+
+def render_status():
+    table = Table(title=f"Column snapshot ({SNAPSHOT_DIR})", show_lines=False)
+    table.add_column("Shard", justify="right")
+    table.add_column("Rows", justify="right", style="bold")
+    table.add_column("Tombstones", justify="right")
+    table.add_column("Capacity", justify="right", style="dim")
+    table.add_column("Event", justify="right")
+    table.add_column("MiB", justify="right")
+    table.add_column("Refreshed", style="green")
+    for snapshot in shard_snapshots():
+        meta = snapshot.load_meta()
+        if meta is None:
+            table.add_row(str(snapshot.shard), "[yellow]not built[/yellow]", "", "", "", "", "")
+            continue
+        status = snapshot.open_columns(meta, ["status"])["status"][:meta.rows]
+        tombstones = int(np.count_nonzero(status == TOMBSTONE))
+        table.add_row(
+            str(snapshot.shard), f"{meta.rows - tombstones:,}", f"{tombstones:,}", f"{meta.capacity:,}",
+            str(meta.event_id), f"{_file_bytes(snapshot, meta) / 1024 / 1024:.1f}", meta.refreshed_at
+        )
+    console.print(table)
+
+def render_refresh_results(results: list[RefreshResult]):
+    table = Table(title="Column snapshot refresh", show_lines=False)
+    table.add_column("Shard", justify="right")
+    table.add_column("Events", justify="right")
+    table.add_column("Appended", justify="right", style="green")
+    table.add_column("Patched", justify="right")
+    table.add_column("Deleted", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Note")
+    for result in results:
+        notes = []
+        if result.rebuilt:
+            notes.append("rebuilt")
+        if result.compacted:
+            notes.append("compacted")
+        if result.drift:
+            notes.append(f"[red]drift {result.drift:+,}: run rebuild[/red]")
+        table.add_row(
+            str(result.shard), f"{result.events:,}", f"{result.appended:,}", f"{result.patched:,}",
+            f"{result.deleted:,}", f"{result.seconds:.3f}", ", ".join(notes)
+        )
+    console.print(table)
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped columnar snapshot of the order tables.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("refresh", help="Apply the order events logged since the last refresh.")
+    subparsers.add_parser("rebuild", help="Recreate the snapshot from the tables.")
+    subparsers.add_parser("verify", help="Compare order counts and ID sums with the tables.")
+    subparsers.add_parser("status", help="Rows, tombstones and watermark per shard.")
+    args = parser.parse_args()
+
+    if SNAPSHOT_DIR is None:
+        console.print("[yellow]In-memory databases have no column snapshot.[/yellow]")
+        return
+
+    if args.command == "refresh":
+        render_refresh_results(refresh_snapshots())
+    elif args.command == "rebuild":
+        results = []
+        for snapshot in shard_snapshots():
+            with console.status(f"Rebuilding shard {snapshot.shard}...") as status:
+                results.append(snapshot.rebuild(
+                    progress=lambda loaded, total: status.update(f"Rebuilding shard {snapshot.shard}... {loaded:,}/{total:,}")
+                ))
+        render_refresh_results(results)
+    elif args.command == "verify":
+        for snapshot in shard_snapshots():
+            expected, actual = snapshot.verify()
+            if expected == actual:
+                console.print(f"[green]Shard {snapshot.shard}: {actual[0]:,} orders, in sync.[/green]")
+            else:
+                console.print(
+                    f"[red]Shard {snapshot.shard}: tables have {expected[0]:,} orders (ID sum {expected[1]}), "
+                    f"snapshot {actual[0]:,} (ID sum {actual[1]}). Run rebuild.[/red]"
+                )
+    elif args.command == "status":
+        render_status()
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,213 @@
-from sqlmodel import SQLModel, create_engine
-from app.models import User, ServiceRequest
+import atexit
+import os
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
 
-# sqlite_file_name = "data/database.db"
-sqlite_file_name = "data/dummy_database.db"
-# sqlite_file_name = "data/test_db.db"
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from sqlmodel import SQLModel, Session, create_engine
+from app.models import User, ServiceRequest, UserDirectory, OrderDirectory, Job, DeadLetterJob
+from app.lookups import seed_lookup_tables, load_dictionaries
+from app.metrics import instrumented_connection_class, instrument_pool
 
+# --- DATABASE TARGET ---
+# SMS_DATABASE picks the database this process opens (make_engine() takes the same specs):
+#   data/dummy_database.db   a file path (the default)
+#   :memory: / memory:NAME   a shared-cache in-memory database; every connection in this
+#                            process sees it, and it lives until the process exits
+#   tmp                      a fresh file in a per-process temp folder, deleted at exit,
+#                            so parallel test or benchmark workers never share a file
+# SMS_DATABASE_TEMPLATE optionally names a pre-seeded database file that is copied into the
+# target at startup with the backup API (see clone_database), instead of re-seeding.
+DEFAULT_DATABASE = "data/dummy_database.db"
+MEMORY_PREFIX = "memory:"
+TEMP_TARGET = "tmp"
+
+DATABASE_TARGET = os.environ.get("SMS_DATABASE", DEFAULT_DATABASE)
+DATABASE_TEMPLATE = os.environ.get("SMS_DATABASE_TEMPLATE")
+
+# --- SHARDING ---
+# Customers are spread over SHARD_COUNT files by customer_id % SHARD_COUNT.
+# A customer's User row and all of their ServiceRequest rows live on the same shard.
+# Shard 0 is the main database file, which also holds the username -> customer_id
+# directory used to route logins. With the default of 1 shard nothing changes.
+# After changing SMS_SHARD_COUNT, move the data with: python -m app.sharding rebalance <N>
+SHARD_COUNT = int(os.environ.get("SMS_SHARD_COUNT", "1"))
+SHARD_DIR = Path("data/shards")
+
+# How long a connection waits on a locked database before raising "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+_temp_dir = None
+# One open connection per in-memory database; SQLite frees it when the last one closes
+_memory_keepalive = {}
+
+def _process_temp_dir() -> Path:
+    global _temp_dir
+    if _temp_dir is None:
+        _temp_dir = Path(tempfile.mkdtemp(prefix=f"sms-{os.getpid()}-"))
+        atexit.register(shutil.rmtree, _temp_dir, True)
+    return _temp_dir
+
+def is_memory_database(file_name: str) -> bool:
+    return file_name.startswith("file:")
+
+def resolve_database(target: str) -> str:
+    """
+    Turns a target spec (see DATABASE TARGET) into what sqlite3 opens: a file path,
+    or a "file:" URI for a shared-cache in-memory database.
+    """
+    if target == ":memory:":
+        target = MEMORY_PREFIX + "sms"
+    if target.startswith(MEMORY_PREFIX):
+        return f"file:{target.removeprefix(MEMORY_PREFIX)}?mode=memory&cache=shared"
+    if target == TEMP_TARGET:
+        handle, path = tempfile.mkstemp(suffix=".db", dir=_process_temp_dir())
+        os.close(handle)
+        return path
+    return target
+
+def connect_sqlite(file_name: str, **kwargs) -> sqlite3.Connection:
+    """Plain sqlite3 connection to a resolved database name (file path or in-memory URI)."""
+    return sqlite3.connect(file_name, uri=is_memory_database(file_name), **kwargs)
+
+def _keep_alive(file_name: str):
+    if is_memory_database(file_name) and file_name not in _memory_keepalive:
+        _memory_keepalive[file_name] = connect_sqlite(file_name, check_same_thread=False)
+
+def clone_database(template: str, target: str = TEMP_TARGET) -> str:
+    """
+    Copies a pre-seeded template database into `target` with SQLite's backup API
+    (all pages in one step, so a small template takes milliseconds).
+    Returns the resolved name of the copy, ready for make_engine().
+    """
+    file_name = resolve_database(target)
+    _keep_alive(file_name)
+    source = connect_sqlite(template)
+    destination = connect_sqlite(file_name)
+    try:
+        source.backup(destination)
+    finally:
+        destination.close()
+        source.close()
+    return file_name
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Runs once for every new SQLite connection in the pool.
+    WAL lets readers (including the online backup in app.backup) run alongside a writer,
+    so copying the database never blocks bookings.
+    auto_vacuum only takes effect on a brand-new file (and must precede WAL); existing
+    files are switched by the migration in app.maintenance.
+    (An in-memory database keeps its own journal mode and ignores the WAL request.)
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def shard_file_name(index: int) -> str:
+    """
+    Shard 0 is the main database. The other shards of the default database live in
+    data/shards/; any other target keeps them next to it (<name>_shard_<N>).
+    """
+    if index == 0:
+        return sqlite_file_name
+    if is_memory_database(sqlite_file_name):
+        name, _, query = sqlite_file_name.removeprefix("file:").partition("?")
+        return f"file:{name}_shard_{index}?{query}"
+    if sqlite_file_name == DEFAULT_DATABASE:
+        return str(SHARD_DIR / f"shard_{index}.db")
+    path = Path(sqlite_file_name)
+    return str(path.with_name(f"{path.stem}_shard_{index}{path.suffix}"))
+
+def make_engine(target: str, metrics_label: str | None = None):
+    """
+    Engine for a target spec or resolved database name (see DATABASE TARGET).
+    With a metrics_label, its queries and pool are recorded under that shard label (app.metrics).
+    """
+    file_name = resolve_database(target)
+    options = {"connect_args": {}}
+    if is_memory_database(file_name):
+        _keep_alive(file_name)
+        # Pooled like a file database, so worker threads (e.g. ShardedSession) can share connections
+        file_name += "&uri=true"
+        options = {"poolclass": QueuePool, "connect_args": {"check_same_thread": False}}
+    if metrics_label is not None:
+        options["connect_args"]["factory"] = instrumented_connection_class(metrics_label)
+    # echo=False stops the console from showing raw SQL commands (cleaner UI)
+    new_engine = create_engine(f"sqlite:///{file_name}", echo=False, **options)
+    event.listen(new_engine, "connect", _set_sqlite_pragmas)
+    if metrics_label is not None:
+        instrument_pool(new_engine, metrics_label)
+    return new_engine
+
+sqlite_file_name = resolve_database(DATABASE_TARGET)
 sqlite_url = f"sqlite:///{sqlite_file_name}"
-# echo=False stops the console from showing raw SQL commands (cleaner UI)
-engine = create_engine(sqlite_url, echo=False)
+
+if SHARD_COUNT > 1 and sqlite_file_name == DEFAULT_DATABASE:
+    SHARD_DIR.mkdir(parents=True, exist_ok=True)
+
+if DATABASE_TEMPLATE:
+    # Shard N of the copy comes from the template's shard N, where the template has one
+    template_base = Path(DATABASE_TEMPLATE)
+    for index in range(SHARD_COUNT):
+        template_file = template_base if index == 0 else template_base.with_name(f"{template_base.stem}_shard_{index}{template_base.suffix}")
+        if template_file.exists():
+            clone_database(str(template_file), shard_file_name(index))
+
+# Query latency and pool usage are recorded per shard (app.metrics)
+engine = make_engine(sqlite_file_name, metrics_label="0")
+shard_engines = [engine] + [make_engine(shard_file_name(i), metrics_label=str(i)) for i in range(1, SHARD_COUNT)]
+
+# Tables that only live on shard 0: the username and order directories and the job queue (app.jobs)
+CATALOG_TABLES = {model.__tablename__ for model in (UserDirectory, OrderDirectory, Job, DeadLetterJob)}
+# Tables that exist on every shard
+SHARD_TABLES = [table for table in SQLModel.metadata.sorted_tables if table.name not in CATALOG_TABLES]
+
+def is_sharded() -> bool:
+    return SHARD_COUNT > 1
+
+def shard_index(customer_id: int, shard_count: int = SHARD_COUNT) -> int:
+    return customer_id % shard_count
+
+def engine_for_customer(customer_id: int):
+    """Routes every per-customer read and write (booking, history, profile) to one shard."""
+    return shard_engines[shard_index(customer_id)]
+
+def engine_for_user_name(user_name: str):
+    """
+    Routes a login/registration lookup by username to the shard holding that user.
+    Returns None if the username is not registered (sharded mode only).
+    """
+    if not is_sharded():
+        return engine
+
+    with Session(engine) as session:
+        entry = session.get(UserDirectory, user_name)
+    return engine_for_customer(entry.customer_id) if entry else None
+
+def engine_for_order(order_id: int):
+    """
+    Routes an admin lookup by order ID (live or archived) to the shard holding that order.
+    Returns None if the order ID is not in the directory (sharded mode only).
+    """
+    if not is_sharded():
+        return engine
+
+    with Session(engine) as session:
+        entry = session.get(OrderDirectory, order_id)
+    return engine_for_customer(entry.customer_id) if entry else None
 
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
+    for shard in shard_engines[1:]:
+        SQLModel.metadata.create_all(shard, tables=SHARD_TABLES)
+
+    # Lookup codes: pick up any a migration appended, then make sure every shard has them all
+    load_dictionaries(engine)
+    for shard in shard_engines:
+        seed_lookup_tables(shard)
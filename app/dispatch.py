@@ -0,0 +1,325 @@
+"""
+app/dispatch.py
+---------------
+Automatic vendor dispatch for new bookings.
+
+Every booking enqueues a "dispatch" job (app.jobs). A pool of worker threads
+claims those jobs, confirms a vendor for the order and moves it to 'In Progress'.
+
+The vendor the customer booked keeps the order unless it is unavailable, i.e.
+already has VENDOR_CAPACITY orders in progress. Only then is the order handed
+to the best other vendor (rating and current load, from VENDOR_DATA) with room
+and a price at or below the booked amount; if none has room, it stays with
+the booked vendor. The booked amount is never changed, and a reassignment
+keeps the booked vendor and amount in the payload of the order's
+'status_changed' event (app.events).
+"""
+
+import argparse
+import threading
+import time
+from dataclasses import dataclass, field
+
+import questionary
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+from sqlmodel import Session, select, func
+
+from app.database import shard_engines
+from app.models import ServiceRequest
+from app.events import record_status_changed
+from app.summary import apply_order_changed
+from app.group_commit import writer_for_customer
+from app.jobs import enqueue, claim, ack, fail, queue_depth, queue_lag_seconds, dead_letter_count
+
+console = Console()
+
+DISPATCH_QUEUE = "dispatch"
+DISPATCH_WORKERS = 4
+IDLE_POLL_SECONDS = 0.5
+
+# A vendor with VENDOR_CAPACITY orders in progress takes no new ones. Scoring alternatives:
+# rating counts in full stars, and a vendor near capacity loses up to LOAD_PENALTY stars.
+VENDOR_CAPACITY = 20
+LOAD_PENALTY = 1.0
+LOAD_REFRESH_SECONDS = 30
+
+def _vendor_data():
+    # Imported lazily: service_mgr imports this module to enqueue bookings
+    from app.service_mgr import VENDOR_DATA
+    return VENDOR_DATA
+
+def dispatch_job_key(order_id: int) -> str:
+    return f"dispatch:{order_id}"
+
+def enqueue_dispatch(order: ServiceRequest, session: Session | None = None) -> bool:
+    """Queues the order for dispatch; with `session`, inside that transaction (shard 0 only, see jobs.enqueue)."""
+    return enqueue(
+        DISPATCH_QUEUE,
+        {"order_id": order.id, "customer_id": order.customer_id},
+        dedupe_key=dispatch_job_key(order.id),
+        session=session
+    )
+
+def enqueue_pending_orders() -> int:
+    """
+    Makes sure every 'Pending' order has a dispatch job, e.g. orders booked before
+    dispatch existed, or whose enqueue was lost to a crash right after booking.
+    Safe to run repeatedly thanks to the job dedupe key.
+    """
+    added = 0
+    for shard_engine in shard_engines:
+        with Session(shard_engine) as session:
+            pending = session.exec(
+                select(ServiceRequest.id, ServiceRequest.customer_id).where(ServiceRequest.status == "Pending")
+            ).all()
+        for order_id, customer_id in pending:
+            if enqueue(DISPATCH_QUEUE, {"order_id": order_id, "customer_id": customer_id}, dedupe_key=dispatch_job_key(order_id)):
+                added += 1
+    return added
+
+# --- VENDOR SELECTION ---
+
+class VendorLoad:
+    """
+    In-process count of 'In Progress' orders per vendor. Loaded from every shard,
+    bumped locally on each dispatch, and re-read every LOAD_REFRESH_SECONDS so
+    completions done by admins are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: dict[str, int] = {}
+        self._loaded_at = 0.0
+
+    def _refresh(self):
+        counts: dict[str, int] = {}
+        for shard_engine in shard_engines:
+            with Session(shard_engine) as session:
+                rows = session.exec(
+                    select(ServiceRequest.vendor_name, func.count())
+                    .where(ServiceRequest.status == "In Progress")
+                    .group_by(ServiceRequest.vendor_name)
+                ).all()
+            for vendor_name, count in rows:
+                counts[vendor_name] = counts.get(vendor_name, 0) + count
+        self._counts = counts
+        self._loaded_at = time.monotonic()
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            if time.monotonic() - self._loaded_at > LOAD_REFRESH_SECONDS:
+                self._refresh()
+            return dict(self._counts)
+
+    def assign(self, vendor_name: str):
+        with self._lock:
+            self._counts[vendor_name] = self._counts.get(vendor_name, 0) + 1
+
+def choose_vendor(order: ServiceRequest, load: dict[str, int]) -> str:
+    """
+    Returns the name of the vendor to dispatch to: the booked one while it has room,
+    otherwise the best-scoring vendor with room within the booked price.
+    """
+    def has_room(vendor_name: str) -> bool:
+        return load.get(vendor_name, 0) < VENDOR_CAPACITY
+
+    if has_room(order.vendor_name):
+        return order.vendor_name
+
+    candidates = [v for v in _vendor_data() if v["price"] <= order.amount and has_room(v["name"])]
+    if not candidates:
+        # Everyone affordable is full: the booked vendor takes it when they can
+        return order.vendor_name
+
+    def score(vendor):
+        return vendor["rating"] - LOAD_PENALTY * load.get(vendor["name"], 0) / VENDOR_CAPACITY
+
+    return max(candidates, key=score)["name"]
+
+def dispatch_order(order_id: int, customer_id: int, vendor_load: VendorLoad) -> str | None:
+    """
+    Confirms a vendor and moves the order to 'In Progress' on its shard, keeping the
+    booked amount. Returns the vendor name, or None if the order is gone or no longer
+    'Pending' (both are "done" as far as the queue is concerned).
+
+    Runs through the shard's group-commit writer (app.group_commit), like admin status
+    changes: the 'Pending' check happens inside the write transaction, so a cancel
+    committed in the meantime is seen here instead of being overwritten.
+    """
+    load = vendor_load.snapshot()
+
+    def dispatch(session: Session) -> str | None:
+        order = session.get(ServiceRequest, order_id)
+        if order is None or order.status != "Pending":
+            return None
+
+        vendor_name = choose_vendor(order, load)
+
+        old_status, old_vendor = order.status, order.vendor_name
+        reassigned = vendor_name != old_vendor
+        order.vendor_name = vendor_name
+        order.status = "In Progress"
+        session.add(order)
+        # A reassignment keeps what the customer booked in the event log
+        record_status_changed(
+            session, order, old_status,
+            details={"booked_vendor": old_vendor, "booked_amount": order.amount} if reassigned else None
+        )
+        apply_order_changed(session, order, old_status, old_vendor=old_vendor)
+        return vendor_name
+
+    vendor_name = writer_for_customer(customer_id).execute(dispatch)
+    if vendor_name is not None:
+        vendor_load.assign(vendor_name)
+    return vendor_name
+
+# --- WORKER POOL ---
+
+@dataclass
+class DispatchStats:
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+    dispatched: int = 0
+    skipped: int = 0
+    retried: int = 0
+    dead_lettered: int = 0
+    lag_at_start: float = 0.0
+    lag_at_end: float = 0.0
+    per_vendor: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def orders_per_second(self) -> float:
+        return self.dispatched / self.elapsed if self.elapsed else 0.0
+
+class DispatchPool:
+    """
+    N worker threads claiming dispatch jobs. With drain=True the pool stops once
+    the queue has no visible jobs left; otherwise it runs until stop() is called.
+    """
+
+    def __init__(self, workers: int = DISPATCH_WORKERS):
+        self.workers = workers
+        self.stats = DispatchStats()
+        self.vendor_load = VendorLoad()
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+
+    def stop(self):
+        self._stop.set()
+
+    def _count(self, attribute: str, vendor_name: str | None = None):
+        with self._stats_lock:
+            setattr(self.stats, attribute, getattr(self.stats, attribute) + 1)
+            if vendor_name:
+                self.stats.per_vendor[vendor_name] = self.stats.per_vendor.get(vendor_name, 0) + 1
+
+    def _work(self, worker_name: str, drain: bool):
+        while not self._stop.is_set():
+            job = claim(DISPATCH_QUEUE, worker_name)
+            if job is None:
+                if drain:
+                    return
+                time.sleep(IDLE_POLL_SECONDS)
+                continue
+
+            try:
+                vendor_name = dispatch_order(job.payload["order_id"], job.payload["customer_id"], self.vendor_load)
+                ack(job)
+                self._count("dispatched" if vendor_name else "skipped", vendor_name)
+            except Exception as e:
+                self._count("dead_lettered" if fail(job, repr(e)) else "retried")
+
+    def run(self, drain: bool = True) -> DispatchStats:
+        self.stats = DispatchStats(lag_at_start=queue_lag_seconds(DISPATCH_QUEUE))
+        threads = [
+            threading.Thread(target=self._work, args=(f"dispatch-{i}", drain), daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.stats.finished_at = time.perf_counter()
+        self.stats.lag_at_end = queue_lag_seconds(DISPATCH_QUEUE)
+        return self.stats
+
+# --- UI FUNCTIONS ---
+
+def render_dispatch_report(stats: DispatchStats):
+    table = Table(title="Dispatch Run", show_lines=True)
+    table.add_column("Metric", style="bold")
+    table.add_column("Value", justify="right", style="green")
+
+    table.add_row("Orders dispatched", str(stats.dispatched))
+    table.add_row("Skipped (no longer pending)", str(stats.skipped))
+    table.add_row("Retried / dead-lettered", f"{stats.retried} / {stats.dead_lettered}")
+    table.add_row("Elapsed", f"{stats.elapsed:.2f} s")
+    table.add_row("Throughput", f"{stats.orders_per_second:.1f} orders/s")
+    table.add_row("Queue lag (start -> end)", f"{stats.lag_at_start:.1f} s -> {stats.lag_at_end:.1f} s")
+    table.add_row("Jobs still queued", str(queue_depth(DISPATCH_QUEUE)))
+    table.add_row("Dead-letter total", str(dead_letter_count(DISPATCH_QUEUE)))
+    for vendor_name, count in sorted(stats.per_vendor.items()):
+        table.add_row(f"  -> {vendor_name}", str(count))
+
+    console.print(table)
+
+def dispatch_ui():
+    """
+    Admin screen: queue any un-dispatched pending orders, then drain the queue.
+    """
+    console.clear()
+    console.print(Panel("Dispatch Pending Orders", style="bold blue"))
+
+    console.print(
+        f"[dim]Queued jobs: {queue_depth(DISPATCH_QUEUE)} | "
+        f"Oldest waiting: {queue_lag_seconds(DISPATCH_QUEUE):.1f} s[/dim]"
+    )
+
+    confirm = questionary.confirm(
+        "Assign vendors to all pending orders and move them to 'In Progress'?",
+        default=True
+    ).ask()
+    if not confirm:
+        return
+
+    try:
+        with console.status("Dispatching orders..."):
+            added = enqueue_pending_orders()
+            stats = DispatchPool().run(drain=True)
+
+        if added:
+            console.print(f"[dim]{added} pending order(s) were missing a dispatch job and have been queued.[/dim]")
+        render_dispatch_report(stats)
+
+    except Exception as e:
+        console.print(f"[bold red]Dispatch Error:[/bold red] {e}")
+
+    questionary.press_any_key_to_continue().ask()
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor dispatch worker pool.")
+    parser.add_argument("--workers", type=int, default=DISPATCH_WORKERS)
+    parser.add_argument("--follow", action="store_true", help="Keep running and dispatch new bookings as they arrive.")
+    args = parser.parse_args()
+
+    enqueue_pending_orders()
+    pool = DispatchPool(workers=args.workers)
+    try:
+        stats = pool.run(drain=not args.follow)
+    except KeyboardInterrupt:
+        pool.stop()
+        stats = pool.stats
+        stats.finished_at = time.perf_counter()
+    render_dispatch_report(stats)
+
+if __name__ == "__main__":
+    main()
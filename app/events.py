@@ -0,0 +1,189 @@
+"""
+app/events.py
+-------------
+Append-only order event log and change-data-capture feed.
+
+Every order create, status change, archive move and delete adds an OrderEvent
+row in the SAME transaction as the change itself, so the log can never disagree
+with the table. Downstream consumers (rollups, caches, external systems) tail
+the log from a stored offset instead of re-scanning ServiceRequest.
+
+Each shard has its own log and its own offsets (see app.database). A shard
+rebalance (app.sharding) copies a customer's events to their new shard and
+logs a 'moved' event per order on the old one.
+
+Command line:
+    python -m app.events feed <file.jsonl> [--follow]
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+from rich.console import Console
+from sqlalchemy import insert, literal
+from sqlmodel import Session, select
+
+from app.database import engine, shard_engines
+from app.models import OrderEvent, EventOffset, ServiceRequestBase, OrderStatus
+
+console = Console()
+
+EVENT_BATCH_SIZE = 500
+POLL_INTERVAL_SECONDS = 1.0
+JSONL_FEED_CONSUMER = "jsonl-feed"
+
+# --- WRITERS (called inside the caller's transaction) ---
+
+def _order_payload(order: ServiceRequestBase) -> str:
+    return json.dumps(order.model_dump(), default=str)
+
+def record_order_created(session: Session, order: ServiceRequestBase):
+    session.add(OrderEvent(
+        order_id=order.id,
+        customer_id=order.customer_id,
+        event_type="created",
+        new_status=order.status,
+        payload=_order_payload(order)
+    ))
+
+def record_status_changed(session: Session, order: ServiceRequestBase, old_status: str, details: dict | None = None):
+    """details: optional JSON payload, e.g. the booked vendor when dispatch reassigns the order."""
+    session.add(OrderEvent(
+        order_id=order.id,
+        customer_id=order.customer_id,
+        event_type="status_changed",
+        old_status=old_status,
+        new_status=order.status,
+        payload=json.dumps(details) if details else "{}"
+    ))
+
+def record_bulk_events(session: Session, model, condition, event_type: str):
+    """
+    Logs one event per row of `model` (ServiceRequest or ServiceRequestArchive) matching
+    `condition`, with a single INSERT ... SELECT. Used by bulk moves and deletes, which
+    must call this BEFORE the rows are removed.
+    """
+    # The order stores a status code and the event log keeps the name, so decode it in SQL
+    old_status = select(OrderStatus.name).where(OrderStatus.id == model.__table__.c.status).scalar_subquery()
+    session.exec(insert(OrderEvent).from_select(
+        ["order_id", "customer_id", "event_type", "old_status", "payload", "created_at"],
+        select(model.id, model.customer_id, literal(event_type), old_status, literal("{}"), literal(datetime.now()))
+        .where(condition)
+    ))
+
+# --- CONSUMER API ---
+
+class EventConsumer:
+    """
+    Reads one shard's event log in order, resuming from the consumer's stored offset.
+
+    Delivery is at-least-once: an offset is only stored after the batch has been
+    handed out and the caller comes back for more (or calls commit()), so a crash
+    mid-batch means that batch is delivered again.
+    """
+
+    def __init__(self, name: str, shard_engine=engine):
+        self.name = name
+        self.engine = shard_engine
+
+    @property
+    def offset(self) -> int:
+        with Session(self.engine) as session:
+            stored = session.get(EventOffset, self.name)
+            return stored.last_event_id if stored else 0
+
+    def poll(self, batch_size: int = EVENT_BATCH_SIZE, after: int | None = None) -> list[OrderEvent]:
+        """Returns up to batch_size events after the stored offset (or `after`), oldest first."""
+        start = self.offset if after is None else after
+        with Session(self.engine) as session:
+            return session.exec(
+                select(OrderEvent)
+                .where(OrderEvent.id > start)
+                .order_by(OrderEvent.id)
+                .limit(batch_size)
+            ).all()
+
+    def commit(self, last_event_id: int):
+        with Session(self.engine) as session:
+            stored = session.get(EventOffset, self.name) or EventOffset(consumer=self.name)
+            stored.last_event_id = last_event_id
+            stored.updated_at = datetime.now()
+            session.add(stored)
+            session.commit()
+
+    def batches(self, batch_size: int = EVENT_BATCH_SIZE):
+        """
+        Yields batches until the consumer has caught up. The offset of each batch is
+        committed when the next one is requested, i.e. after the caller processed it.
+        """
+        last_id = self.offset
+        while True:
+            batch = self.poll(batch_size, after=last_id)
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1].id
+            self.commit(last_id)
+
+    def tail(self, handler, batch_size: int = EVENT_BATCH_SIZE, poll_interval: float = POLL_INTERVAL_SECONDS, stop=None):
+        """
+        Calls handler(batch) for every new batch, forever (or until stop() returns True),
+        sleeping poll_interval seconds whenever the log is drained.
+        """
+        while not (stop and stop()):
+            for batch in self.batches(batch_size):
+                handler(batch)
+            time.sleep(poll_interval)
+
+# --- JSONL FEED ---
+
+def _event_to_dict(event: OrderEvent, shard: int) -> dict:
+    record = event.model_dump()
+    record["payload"] = json.loads(event.payload or "{}")
+    record["created_at"] = event.created_at.isoformat()
+    record["shard"] = shard
+    return record
+
+def write_jsonl_feed(path: str, consumer_name: str = JSONL_FEED_CONSUMER, batch_size: int = EVENT_BATCH_SIZE) -> int:
+    """
+    Appends every event not yet exported to `path`, one JSON object per line.
+    Lines are flushed to disk before the offset moves, so a crash can repeat lines
+    but never skip them. Returns the number of events written.
+    """
+    written = 0
+    with open(path, "a", encoding="utf-8") as feed:
+        for shard, shard_engine in enumerate(shard_engines):
+            consumer = EventConsumer(consumer_name, shard_engine)
+            for batch in consumer.batches(batch_size):
+                for event in batch:
+                    feed.write(json.dumps(_event_to_dict(event, shard)) + "\n")
+                feed.flush()
+                os.fsync(feed.fileno())
+                written += len(batch)
+    return written
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Order change-data-capture feed.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    feed_parser = subparsers.add_parser("feed", help="Append new order events to a JSONL file.")
+    feed_parser.add_argument("path")
+    feed_parser.add_argument("--consumer", default=JSONL_FEED_CONSUMER)
+    feed_parser.add_argument("--follow", action="store_true", help="Keep tailing the log.")
+    args = parser.parse_args()
+
+    if args.command == "feed":
+        while True:
+            written = write_jsonl_feed(args.path, args.consumer)
+            if written or not args.follow:
+                console.print(f"[green]Wrote {written} event(s) to {args.path}[/green]")
+            if not args.follow:
+                break
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+app/group_commit.py
+-------------------
+Group commit for order writes.
+
+Every booking and status change used to be its own transaction, and every
+commit waits for the WAL to reach the disk (synchronous=FULL), so concurrent
+writers were capped at the disk's sync rate. Here each shard has one writer
+thread that takes write operations from a queue and commits whatever arrived
+together:
+
+    1. Wait for an operation, then keep collecting for up to WINDOW seconds
+       (SMS_GROUP_COMMIT_WINDOW_MS, default 2 ms) or MAX_BATCH operations.
+       Operations that queue up while a batch commits form the next batch
+       without waiting, so under load the batches grow by themselves.
+    2. Run them in one BEGIN IMMEDIATE transaction, each inside its own
+       SAVEPOINT, so one that raises (an IntegrityError on a duplicate ID, a
+       LookupError for a missing order) is rolled back alone and the rest
+       still commit.
+    3. Commit once, then resolve every caller's Future: the operation's return
+       value, or its exception. A caller is only released after its write is
+       durable; if the commit itself fails, every operation in the batch gets
+       that error.
+
+An operation is a function operation(session) -> result that stages its
+changes on the session and must not commit. The writer's session does not
+expire objects on commit, so ORM objects returned to the caller stay readable.
+
+Batch sizes, commit latency and per-operation latency (queued to durable) are
+recorded per shard in app.metrics and in each writer's GroupCommitStats.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from sqlmodel import Session
+
+from app.database import shard_engines, engine_for_customer
+from app.metrics import group_commit_batch_size, group_commit_seconds, group_commit_operation_seconds, group_commit_operations
+
+WINDOW_SECONDS = float(os.environ.get("SMS_GROUP_COMMIT_WINDOW_MS", "2")) / 1000
+MAX_BATCH = int(os.environ.get("SMS_GROUP_COMMIT_MAX_BATCH", "64"))
+
+_STOP = object()
+
+@dataclass
+class GroupCommitStats:
+    batches: int = 0
+    operations: int = 0
+    failed: int = 0
+    largest_batch: int = 0
+    commit_seconds: float = 0.0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.operations / self.batches if self.batches else 0.0
+
+class GroupCommitWriter:
+    """One shard's writer thread; see the module docstring."""
+
+    def __init__(self, shard_engine, label: str, window: float = WINDOW_SECONDS, max_batch: int = MAX_BATCH):
+        self.engine = shard_engine
+        self.label = label
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = GroupCommitStats()
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, operation) -> Future:
+        """Queues operation(session); the Future resolves once its batch has committed."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"sms-group-commit-{self.label}", daemon=True)
+                self._thread.start()
+        future = Future()
+        self._queue.put((operation, future, time.perf_counter()))
+        return future
+
+    def execute(self, operation):
+        """Runs operation(session) in the next batch and returns its result (or raises its error)."""
+        return self.submit(operation).result()
+
+    def close(self):
+        """Commits everything already queued, then stops the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    # --- WRITER THREAD ---
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch: list):
+        started = time.perf_counter()
+        staged = []
+        failed = 0
+        pending = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        with Session(self.engine, expire_on_commit=False) as session:
+            try:
+                # pysqlite only opens a transaction before INSERT/UPDATE/DELETE, not before a
+                # SAVEPOINT: without this BEGIN every savepoint's RELEASE would be its own commit
+                session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            except Exception as error:
+                session.rollback()
+                for _, future, _ in pending:
+                    future.set_exception(error)
+                failed = len(pending)
+                pending = []
+
+            for operation, future, queued in pending:
+                try:
+                    with session.begin_nested():
+                        result = operation(session)
+                except Exception as error:
+                    failed += 1
+                    future.set_exception(error)
+                else:
+                    staged.append((future, result, queued))
+
+            if pending:
+                try:
+                    session.commit()
+                except Exception as error:
+                    session.rollback()
+                    for future, _, _ in staged:
+                        future.set_exception(error)
+                    failed += len(staged)
+                    staged = []
+
+        finished = time.perf_counter()
+        for future, result, queued in staged:
+            group_commit_operation_seconds.labels(self.label).observe(finished - queued)
+            future.set_result(result)
+
+        self.stats.batches += 1
+        self.stats.operations += len(batch)
+        self.stats.failed += failed
+        self.stats.largest_batch = max(self.stats.largest_batch, len(batch))
+        self.stats.commit_seconds += finished - started
+        group_commit_batch_size.labels(self.label).observe(len(batch))
+        group_commit_seconds.labels(self.label).observe(finished - started)
+        group_commit_operations.labels(self.label, "committed").inc(len(staged))
+        group_commit_operations.labels(self.label, "failed").inc(failed)
+
+# --- WRITERS PER SHARD ---
+
+_writers: dict[int, GroupCommitWriter] = {}
+_writers_lock = threading.Lock()
+
+def writer_for(shard_engine) -> GroupCommitWriter:
+    """The group-commit writer of one of the app's shard engines."""
+    index = shard_engines.index(shard_engine)
+    with _writers_lock:
+        if index not in _writers:
+            _writers[index] = GroupCommitWriter(shard_engine, str(index))
+        return _writers[index]
+
+def writer_for_customer(customer_id: int) -> GroupCommitWriter:
+    return writer_for(engine_for_customer(customer_id))
+
+@atexit.register
+def close_writers():
+    """Commits what is still queued on every writer (also run at exit)."""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
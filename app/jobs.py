@@ -0,0 +1,154 @@
+"""
+app/jobs.py
+-----------
+A small durable job queue stored in SQLite (shard 0).
+
+    enqueue()  -> adds a job (optionally de-duplicated by key)
+    claim()    -> atomically takes the oldest visible job with UPDATE ... RETURNING
+                  and hides it for a visibility timeout
+    ack()      -> deletes a finished job
+    fail()     -> retries with backoff, or moves the job to DeadLetterJob once
+                  it has used up max_attempts
+
+A worker that dies mid-job simply never acks; the job becomes visible again
+when its visibility timeout runs out and another worker picks it up.
+"""
+
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func
+
+from app.database import engine
+from app.models import Job, DeadLetterJob
+
+VISIBILITY_TIMEOUT_SECONDS = 30
+RETRY_BACKOFF_SECONDS = 2  # doubled after every failed attempt
+MAX_ATTEMPTS = 5
+
+@dataclass
+class ClaimedJob:
+    id: int
+    queue: str
+    payload: dict
+    attempts: int
+    claimed_by: str
+
+def enqueue(queue: str, payload: dict, dedupe_key: str | None = None, max_attempts: int = MAX_ATTEMPTS, session: Session | None = None) -> bool:
+    """
+    Adds a job. Pass `session` to enqueue inside the caller's transaction (shard 0 only).
+    Returns False if a job with the same dedupe_key is already queued.
+    """
+    statement = sqlite_insert(Job.__table__).values(
+        queue=queue,
+        payload=json.dumps(payload),
+        dedupe_key=dedupe_key,
+        max_attempts=max_attempts,
+        attempts=0,
+        visible_at=datetime.now(),
+        created_at=datetime.now()
+    ).on_conflict_do_nothing(index_elements=["dedupe_key"])
+
+    if session is not None:
+        return session.exec(statement).rowcount > 0
+
+    with Session(engine) as own_session:
+        inserted = own_session.exec(statement).rowcount > 0
+        own_session.commit()
+    return inserted
+
+def claim(queue: str, worker: str, visibility_timeout: float = VISIBILITY_TIMEOUT_SECONDS) -> ClaimedJob | None:
+    """
+    Takes the oldest visible job on `queue`, or returns None if there is none.
+    The select and the update are one statement, so two workers can never claim the same job.
+    """
+    now = datetime.now()
+    job_table = Job.__table__
+    next_job = (
+        select(job_table.c.id)
+        .where(job_table.c.queue == queue)
+        .where(job_table.c.visible_at <= now)
+        .order_by(job_table.c.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    statement = (
+        update(job_table)
+        .where(job_table.c.id == next_job)
+        .values(
+            visible_at=now + timedelta(seconds=visibility_timeout),
+            attempts=job_table.c.attempts + 1,
+            claimed_by=worker
+        )
+        .returning(job_table.c.id, job_table.c.payload, job_table.c.attempts)
+    )
+
+    with Session(engine) as session:
+        row = session.exec(statement).first()
+        session.commit()
+
+    if row is None:
+        return None
+    return ClaimedJob(id=row.id, queue=queue, payload=json.loads(row.payload), attempts=row.attempts, claimed_by=worker)
+
+def _still_ours(job: ClaimedJob):
+    # If our visibility timeout ran out, another worker may have re-claimed the job
+    # (bumping attempts); our late ack/fail must not touch their claim.
+    return (Job.id == job.id) & (Job.attempts == job.attempts) & (Job.claimed_by == job.claimed_by)
+
+def ack(job: ClaimedJob) -> bool:
+    with Session(engine) as session:
+        deleted = session.exec(delete(Job).where(_still_ours(job))).rowcount
+        session.commit()
+    return deleted > 0
+
+def fail(job: ClaimedJob, error: str) -> bool:
+    """
+    Records a failed attempt. Returns True if the job was dead-lettered,
+    False if it was scheduled for another try.
+    """
+    with Session(engine) as session:
+        row = session.exec(select(Job).where(_still_ours(job))).first()
+        if row is None:
+            return False
+
+        if row.attempts >= row.max_attempts:
+            session.add(DeadLetterJob(
+                job_id=row.id,
+                queue=row.queue,
+                payload=row.payload,
+                attempts=row.attempts,
+                last_error=error,
+                created_at=row.created_at
+            ))
+            session.delete(row)
+            session.commit()
+            return True
+
+        row.last_error = error
+        row.claimed_by = None
+        row.visible_at = datetime.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (row.attempts - 1))
+        session.add(row)
+        session.commit()
+        return False
+
+def queue_depth(queue: str) -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(Job).where(Job.queue == queue)).one()
+
+def queue_lag_seconds(queue: str) -> float:
+    """Age of the oldest job that is waiting to be claimed (0 when the queue is drained)."""
+    with Session(engine) as session:
+        oldest = session.exec(
+            select(func.min(Job.created_at))
+            .where(Job.queue == queue)
+            .where(Job.visible_at <= datetime.now())
+        ).one()
+    return (datetime.now() - oldest).total_seconds() if oldest else 0.0
+
+def dead_letter_count(queue: str) -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(DeadLetterJob).where(DeadLetterJob.queue == queue)).one()
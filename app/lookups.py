@@ -0,0 +1,289 @@
+"""
+app/lookups.py
+--------------
+Dictionary encoding for the repetitive order columns.
+
+service_name, vendor_name and status each hold a handful of distinct strings,
+repeated on every order. ServiceRequest and ServiceRequestArchive store them as
+small integer codes instead, referencing one lookup table per column
+(servicetype, vendor, orderstatus) on every shard. SQLite stores a code of
+2-127 in one byte of the record (0 and 1 in none), against 8-22 bytes of text,
+so the tables, their pages and every scan shrink.
+
+The application keeps reading and writing plain strings: the EncodedString
+column type encodes on the way in and decodes on the way out through cached
+in-process maps, so no query has to join the lookup tables. Codes are the
+same on every shard, because archive moves and rebalancing copy them as-is:
+    - the known values below get fixed codes, in the order listed (append only)
+    - any other value found by the migration is appended once, on all shards
+
+Databases created before the encoding are converted once, in batches, by
+migrate_encoded_columns() (migration 1 in app.migrations).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import SmallInteger
+from sqlalchemy.types import TypeDecorator
+
+MIGRATION_BATCH_SIZE = 20_000
+# BackfillCheckpoint name of a table's copy: the last legacy ID copied
+CHECKPOINT_PREFIX = "encode:"
+# Suffix of the text-column copy a table is renamed to while it is being converted
+LEGACY_TABLE_SUFFIX = "_text"
+
+SERVICE_NAMES = ("AC Repair", "TV Repair", "Fridge Repair", "Washing Machine Repair")
+VENDOR_NAMES = ("Vendor A", "Vendor B", "Vendor C")
+ORDER_STATUSES = ("Pending", "In Progress", "Completed", "Cancelled")
+
+class Dictionary:
+    """Two-way string <-> code map for one lookup table, cached in process."""
+
+    def __init__(self, table_name: str, known: tuple[str, ...]):
+        self.table_name = table_name
+        self.known = known
+        self._set_names(list(known))
+
+    def _set_names(self, names: list[str]):
+        # Both maps are replaced together, so readers never need a lock
+        self.names = names
+        self.codes = {name: code for code, name in enumerate(names)}
+
+    def encode(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            raise ValueError(f"Unknown {self.table_name} value {name!r} (add it to app.lookups).")
+        return code
+
+    def decode(self, code: int) -> str:
+        if 0 <= code < len(self.names):
+            return self.names[code]
+        raise LookupError(f"Unknown {self.table_name} code {code}; run 'python -m app.migrations upgrade'.")
+
+    def extend(self, names) -> list[str]:
+        """Appends codes for the given names that are not known yet. Returns the new names."""
+        added = sorted(set(names) - self.codes.keys())
+        if added:
+            self._set_names(self.names + added)
+        return added
+
+    def load(self, connection):
+        """Picks up values a migration appended (possibly in another process)."""
+        rows = connection.exec_driver_sql(f"SELECT id, name FROM {self.table_name} ORDER BY id").all()
+        names = list(self.known)
+        for code, name in rows:
+            if code == len(names):
+                names.append(name)
+        self._set_names(names)
+
+    def seed(self, connection):
+        connection.exec_driver_sql(
+            f"INSERT OR IGNORE INTO {self.table_name} (id, name) VALUES (?, ?)",
+            list(enumerate(self.names))
+        )
+
+service_dictionary = Dictionary("servicetype", SERVICE_NAMES)
+vendor_dictionary = Dictionary("vendor", VENDOR_NAMES)
+status_dictionary = Dictionary("orderstatus", ORDER_STATUSES)
+DICTIONARIES = (service_dictionary, vendor_dictionary, status_dictionary)
+
+class EncodedString(TypeDecorator):
+    """A string column stored as its code in `dictionary`."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, dictionary: Dictionary):
+        super().__init__()
+        self.dictionary = dictionary
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.dictionary.encode(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.dictionary.decode(value)
+
+def _encoded_columns(table) -> list:
+    return [column for column in table.columns if isinstance(column.type, EncodedString)]
+
+# --- LOOKUP TABLES ---
+
+def seed_lookup_tables(shard_engine):
+    """Makes sure the lookup tables of one shard hold every known code (idempotent)."""
+    with shard_engine.begin() as conn:
+        for dictionary in DICTIONARIES:
+            dictionary.seed(conn)
+
+def load_dictionaries(catalog_engine):
+    """Refreshes the in-process maps from shard 0's lookup tables."""
+    with catalog_engine.connect() as conn:
+        for dictionary in DICTIONARIES:
+            dictionary.load(conn)
+
+# --- MIGRATION ---
+
+def _encoded_tables() -> list:
+    # Imported lazily: app.models imports this module for EncodedString
+    from app.models import ServiceRequest, ServiceRequestArchive
+    return [ServiceRequest.__table__, ServiceRequestArchive.__table__]
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).first() is not None
+
+def _needs_conversion(conn, table) -> bool:
+    """True while `table` still stores text, or an interrupted conversion left its legacy copy."""
+    if _table_exists(conn, table.name + LEGACY_TABLE_SUFFIX):
+        return True
+    column_types = {row[1]: row[2].upper() for row in conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+    encoded = _encoded_columns(table)
+    return bool(column_types) and column_types.get(encoded[0].name) != "SMALLINT"
+
+def _all_shards(engines):
+    if engines is None:
+        from app.database import shard_engines
+        return shard_engines
+    return engines
+
+def pending_conversions(engines=None) -> list[tuple]:
+    """(shard engine, table) pairs that still store text in their encoded columns."""
+    pending = []
+    for shard_engine in _all_shards(engines):
+        with shard_engine.connect() as conn:
+            pending += [(shard_engine, table) for table in _encoded_tables() if _needs_conversion(conn, table)]
+    return pending
+
+def _source_name(conn, table) -> str:
+    legacy = table.name + LEGACY_TABLE_SUFFIX
+    return legacy if _table_exists(conn, legacy) else table.name
+
+def migrate_encoded_columns(engines=None, batch_size: int = MIGRATION_BATCH_SIZE, progress=None) -> int:
+    """
+    Converts every order table that still stores text to lookup codes.
+
+    SQLite cannot change a column's type in place, so each table is renamed to
+    <name>_text, recreated from the model (with its indexes) and refilled in
+    primary-key batches of `batch_size`, one transaction each, with every text
+    value swapped for its code by a lookup-table subquery. The legacy copy is
+    dropped at the end, and only once every legacy row is found in the new table.
+
+    Order IDs are random and the app keeps writing to the new table meanwhile, so
+    the copy cannot resume from the new table's highest ID: the last legacy ID
+    copied and the number of rows copied are stored with each batch
+    (BackfillCheckpoint), so an interrupted run resumes where it stopped. A legacy
+    row whose ID a new order already took is skipped (INSERT OR IGNORE), and the
+    table is then kept with an error instead of dropped.
+
+    progress(converted, total) is called after each batch.
+    Returns the number of rows converted.
+    """
+    # Imported lazily: app.models imports this module for EncodedString
+    from app.models import BackfillCheckpoint
+
+    engines = _all_shards(engines)
+    pending = pending_conversions(engines)
+    if not pending:
+        return 0
+
+    # 1. Give values outside the fixed lists the same new code on every shard
+    total = 0
+    for shard_engine, table in pending:
+        with shard_engine.connect() as conn:
+            source = _source_name(conn, table)
+            total += conn.exec_driver_sql(f"SELECT count(*) FROM {source}").scalar_one()
+            for column in _encoded_columns(table):
+                values = conn.exec_driver_sql(f"SELECT DISTINCT {column.name} FROM {source}").scalars()
+                column.type.dictionary.extend(str(value) for value in values)
+
+    for shard_engine in engines:
+        seed_lookup_tables(shard_engine)
+
+    # 2. Rename, recreate and refill each table
+    converted = 0
+    for shard_engine, table in pending:
+        legacy = table.name + LEGACY_TABLE_SUFFIX
+        with shard_engine.begin() as conn:
+            if not _table_exists(conn, legacy):
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {legacy}")
+                # Index names move with the renamed table; free them for the new one
+                index_names = conn.exec_driver_sql(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (legacy,)
+                ).scalars().all()
+                for index_name in index_names:
+                    conn.exec_driver_sql(f"DROP INDEX {index_name}")
+                table.create(conn)
+
+        encoded = {column.name: column.type.dictionary.table_name for column in _encoded_columns(table)}
+        # Columns added by later migrations are not in the legacy table yet; they stay NULL
+        # here and are filled by their own migration
+        with shard_engine.connect() as conn:
+            legacy_columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({legacy})")}
+        names = [column.name for column in table.columns if column.name in legacy_columns]
+        expressions = [
+            f"(SELECT id FROM {encoded[name]} WHERE name = legacy.{name})" if name in encoded else f"legacy.{name}"
+            for name in names
+        ]
+        copy_sql = (
+            f"INSERT OR IGNORE INTO {table.name} ({', '.join(names)}) "
+            f"SELECT {', '.join(expressions)} FROM {legacy} AS legacy "
+            f"WHERE legacy.id > ? AND legacy.id <= ?"
+        )
+        checkpoint_name = f"{CHECKPOINT_PREFIX}{table.name}"
+        with shard_engine.begin() as conn:
+            BackfillCheckpoint.__table__.create(conn, checkfirst=True)
+            checkpoint = conn.exec_driver_sql(
+                "SELECT last_key, rows_done FROM backfillcheckpoint WHERE name = ?", (checkpoint_name,)
+            ).first()
+            if checkpoint:
+                last_id, rows_copied = checkpoint
+            else:
+                # A run without a checkpoint (an older one, or one stopped by the check below) may
+                # have copied rows already. Only rows that are the same order count: a new order
+                # that took a legacy ID has its own customer and booking time
+                last_id = 0
+                rows_copied = conn.exec_driver_sql(
+                    f"SELECT count(*) FROM {legacy} AS legacy WHERE EXISTS "
+                    f"(SELECT 1 FROM {table.name} AS copy WHERE copy.id = legacy.id "
+                    f"AND copy.customer_id = legacy.customer_id AND copy.created_at IS legacy.created_at)"
+                ).scalar_one()
+
+        while True:
+            with shard_engine.connect() as conn:
+                high_id = conn.exec_driver_sql(
+                    f"SELECT max(id) FROM (SELECT id FROM {legacy} WHERE id > ? ORDER BY id LIMIT ?)",
+                    (last_id, batch_size)
+                ).scalar_one()
+            if high_id is None:
+                break
+            with shard_engine.begin() as conn:
+                copied = max(conn.exec_driver_sql(copy_sql, (last_id, high_id)).rowcount, 0)
+                conn.exec_driver_sql(
+                    "INSERT INTO backfillcheckpoint (name, last_key, rows_done, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET last_key = excluded.last_key, "
+                    "rows_done = excluded.rows_done, updated_at = excluded.updated_at",
+                    (checkpoint_name, high_id, rows_copied + copied, datetime.now())
+                )
+            last_id = high_id
+            rows_copied += copied
+            converted += copied
+            if progress:
+                progress(converted, total)
+
+        # A legacy row skipped because a new order took its ID would be lost with the table
+        with shard_engine.connect() as conn:
+            legacy_rows = conn.exec_driver_sql(f"SELECT count(*) FROM {legacy}").scalar_one()
+        if legacy_rows != rows_copied:
+            # Without the checkpoint the next run recounts from the tables and copies from the
+            # start again, so rows whose ID has been freed meanwhile are picked up
+            with shard_engine.begin() as conn:
+                conn.exec_driver_sql("DELETE FROM backfillcheckpoint WHERE name = ?", (checkpoint_name,))
+            raise RuntimeError(
+                f"Copied {rows_copied:,} of {legacy_rows:,} rows from {legacy} to {table.name} "
+                f"(IDs taken by new orders?); {legacy} was kept. Resolve the conflicts, then run the migration again."
+            )
+        with shard_engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP TABLE {legacy}")
+            conn.exec_driver_sql("DELETE FROM backfillcheckpoint WHERE name = ?", (checkpoint_name,))
+
+    return converted
@@ -0,0 +1,325 @@
+"""
+app/maintenance.py
+------------------
+Space reclamation and housekeeping for the SQLite file.
+
+Deleting users (remove_user_ui) and archiving orders (app.archive) leaves free
+pages inside the database file. With auto_vacuum=INCREMENTAL those pages can be
+handed back to the filesystem a few at a time with PRAGMA incremental_vacuum,
+instead of a full VACUUM that rewrites (and locks) the whole file.
+
+A maintenance run does, in order and within a time budget:
+    1. incremental_vacuum in small chunks
+    2. PRAGMA optimize (runs ANALYZE only on tables whose stats are stale)
+    3. a PASSIVE WAL checkpoint (never waits on readers or writers)
+
+Runs are triggered by a background scheduler: every MAINTENANCE_INTERVAL_SECONDS,
+or sooner once DELETED_ROWS_THRESHOLD rows have been deleted.
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import questionary
+from rich.console import Console
+from rich.panel import Panel
+
+from app.database import sqlite_file_name, shard_file_name, connect_sqlite, BUSY_TIMEOUT_MS, SHARD_COUNT
+
+console = Console()
+
+# PRAGMA auto_vacuum values
+AUTO_VACUUM_NONE = 0
+AUTO_VACUUM_FULL = 1
+AUTO_VACUUM_INCREMENTAL = 2
+
+TIME_BUDGET_SECONDS = 0.2
+VACUUM_PAGES_PER_STEP = 64
+MAINTENANCE_INTERVAL_SECONDS = 15 * 60
+DELETED_ROWS_THRESHOLD = 1000
+
+@dataclass
+class MaintenanceReport:
+    started_at: datetime
+    duration_seconds: float = 0.0
+    pages_freed: int = 0
+    free_pages_left: int = 0
+    bytes_reclaimed: int = 0
+    optimized: bool = False
+    checkpointed: bool = False
+    budget_exhausted: bool = False
+    notes: list[str] = field(default_factory=list)
+
+def _connect(file_name: str = sqlite_file_name) -> sqlite3.Connection:
+    # Autocommit mode: every PRAGMA runs in its own short transaction
+    conn = connect_sqlite(file_name, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    return conn
+
+def _file_size(file_name: str) -> int:
+    total = 0
+    for path in (file_name, f"{file_name}-wal"):
+        if os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+# --- MIGRATION ---
+
+def get_auto_vacuum_mode() -> int:
+    conn = _connect()
+    try:
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+
+def migrate_to_incremental_auto_vacuum() -> bool:
+    """
+    One-time migration that switches every shard file to auto_vacuum=INCREMENTAL.
+
+    On an empty database the pragma alone is enough. An existing file has to be
+    rebuilt once with VACUUM for the setting to stick, which locks the database
+    for the duration, so run it during a quiet period.
+
+    Returns True if any file was changed, False if all were already incremental.
+    """
+    changed = False
+    for index in range(SHARD_COUNT):
+        conn = _connect(shard_file_name(index))
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+                continue
+
+            conn.execute(f"PRAGMA auto_vacuum={AUTO_VACUUM_INCREMENTAL}")
+            has_tables = conn.execute("SELECT count(*) FROM sqlite_master").fetchone()[0] > 0
+            if has_tables:
+                conn.execute("VACUUM")
+            changed = True
+        finally:
+            conn.close()
+    return changed
+
+# --- MAINTENANCE RUN ---
+
+def run_maintenance(time_budget: float = TIME_BUDGET_SECONDS) -> MaintenanceReport:
+    """
+    Performs one budgeted maintenance pass over every shard and reports what it reclaimed.
+    Steps that don't fit in the remaining budget are skipped until the next run.
+    """
+    report = MaintenanceReport(started_at=datetime.now())
+    start = time.perf_counter()
+    deadline = start + time_budget
+    # Cleared by any shard that runs out of budget before reaching these steps
+    report.optimized = report.checkpointed = True
+
+    for index in range(SHARD_COUNT):
+        _maintain_file(shard_file_name(index), deadline, report)
+
+    report.duration_seconds = time.perf_counter() - start
+    return report
+
+def _maintain_file(file_name: str, deadline: float, report: MaintenanceReport):
+    size_before = _file_size(file_name)
+    pages_freed_before = report.pages_freed
+
+    conn = _connect(file_name)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+
+        # 1. Hand free pages back to the filesystem, a chunk at a time
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+            while time.perf_counter() < deadline:
+                free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if free_pages == 0:
+                    break
+                # incremental_vacuum frees one page per step, so the cursor must be drained
+                conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})").fetchall()
+                report.pages_freed += free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        else:
+            report.notes.append(f"{file_name}: auto_vacuum is not INCREMENTAL; run the migration to reclaim space.")
+
+        free_pages_left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        report.free_pages_left += free_pages_left
+        if free_pages_left:
+            report.budget_exhausted = True
+
+        # 2. Refresh planner statistics where SQLite thinks they are stale
+        if time.perf_counter() < deadline:
+            conn.execute("PRAGMA analysis_limit=400")
+            conn.execute("PRAGMA optimize")
+        else:
+            report.optimized = False
+            report.budget_exhausted = True
+
+        # 3. Move WAL content into the main file without waiting on anyone
+        if time.perf_counter() < deadline:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        else:
+            report.checkpointed = False
+            report.budget_exhausted = True
+
+    finally:
+        conn.close()
+
+    # The file shrinks by the pages freed; the WAL may shrink too after a checkpoint
+    pages_freed = report.pages_freed - pages_freed_before
+    report.bytes_reclaimed += max(size_before - _file_size(file_name), pages_freed * page_size)
+
+# --- SCHEDULER ---
+
+class MaintenanceScheduler:
+    """
+    Background thread that runs maintenance on an interval, or early once
+    enough rows have been deleted. It never prints; the last report is kept
+    for the admin screen.
+    """
+
+    def __init__(self, interval: float = MAINTENANCE_INTERVAL_SECONDS, deleted_rows_threshold: int = DELETED_ROWS_THRESHOLD):
+        self.interval = interval
+        self.deleted_rows_threshold = deleted_rows_threshold
+        self.deleted_rows = 0
+        self.last_report: MaintenanceReport | None = None
+        self.last_error: Exception | None = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._loop, name="sms-maintenance", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> bool:
+        """Stops the thread, after the run in progress if any. Returns True if it was running."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return False
+        self._stopping.set()
+        self._wake.set()
+        thread.join()
+        return True
+
+    def note_deleted_rows(self, count: int):
+        """Called by code paths that delete rows; wakes the thread once the threshold is crossed."""
+        with self._lock:
+            self.deleted_rows += count
+            if self.deleted_rows >= self.deleted_rows_threshold:
+                self._wake.set()
+
+    def run_now(self) -> MaintenanceReport:
+        with self._lock:
+            self.deleted_rows = 0
+        self.last_report = run_maintenance()
+        return self.last_report
+
+    def _loop(self):
+        while True:
+            self._wake.wait(timeout=self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                return
+            try:
+                self.run_now()
+                self.last_error = None
+            except sqlite3.Error as e:
+                # Typically "database is locked"; try again on the next tick
+                self.last_error = e
+
+scheduler = MaintenanceScheduler()
+
+def note_deleted_rows(count: int):
+    scheduler.note_deleted_rows(count)
+
+# --- UI FUNCTIONS ---
+
+def render_report(report: MaintenanceReport):
+    status = "[yellow]budget exhausted, will continue next run[/yellow]" if report.budget_exhausted else "[green]complete[/green]"
+    notes = "".join(f"\n[dim]{note}[/dim]" for note in report.notes)
+    console.print(Panel(
+        f"[bold]Ran at:[/bold] {report.started_at.strftime('%Y-%m-%d %H:%M:%S')} ({report.duration_seconds * 1000:.1f} ms, {status})\n"
+        f"[bold]Pages freed:[/bold] {report.pages_freed} ({report.free_pages_left} still free)\n"
+        f"[bold]Bytes reclaimed:[/bold] {report.bytes_reclaimed:,}\n"
+        f"[bold]Optimize:[/bold] {'yes' if report.optimized else 'skipped'} | "
+        f"[bold]WAL checkpoint:[/bold] {'yes' if report.checkpointed else 'skipped'}"
+        f"{notes}",
+        title="Maintenance Report",
+        style="cyan"
+    ))
+
+def maintenance_ui():
+    """
+    Admin screen for database maintenance.
+    """
+    while True:
+        console.clear()
+        mode = {AUTO_VACUUM_NONE: "NONE", AUTO_VACUUM_FULL: "FULL", AUTO_VACUUM_INCREMENTAL: "INCREMENTAL"}.get(get_auto_vacuum_mode(), "?")
+        console.print(Panel(
+            f"Database Maintenance\n"
+            f"[dim]auto_vacuum: {mode} | rows deleted since last run: {scheduler.deleted_rows}[/dim]",
+            style="bold blue"
+        ))
+
+        choice = questionary.select(
+            "Maintenance Menu:",
+            choices=[
+                "Run Maintenance Now",
+                "Show Last Report",
+                "Enable Incremental Auto-Vacuum (one-time migration)",
+                "Back"
+            ]
+        ).ask()
+
+        if choice == "Back" or choice is None:
+            return
+
+        try:
+            if choice == "Run Maintenance Now":
+                render_report(scheduler.run_now())
+
+            elif choice == "Show Last Report":
+                if scheduler.last_report:
+                    render_report(scheduler.last_report)
+                else:
+                    console.print("[yellow]Maintenance has not run yet in this session.[/yellow]")
+                if scheduler.last_error:
+                    console.print(f"[red]Last scheduled run failed:[/red] {scheduler.last_error}")
+
+            elif choice == "Enable Incremental Auto-Vacuum (one-time migration)":
+                confirm = questionary.confirm(
+                    "This rebuilds the database file once and locks it while running. Proceed?",
+                    default=False
+                ).ask()
+                if confirm:
+                    with console.status("Rebuilding database file..."):
+                        changed = migrate_to_incremental_auto_vacuum()
+                    console.print("[green]auto_vacuum is now INCREMENTAL.[/green]" if changed else "[green]Already INCREMENTAL.[/green]")
+
+        except sqlite3.Error as e:
+            console.print(f"[bold red]Database Error:[/bold red] {e}")
+
+        questionary.press_any_key_to_continue().ask()
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Space reclamation and housekeeping for the SMS database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="Switch the database to auto_vacuum=INCREMENTAL (one-time VACUUM).")
+    run_parser = subparsers.add_parser("run", help="Run one maintenance pass.")
+    run_parser.add_argument("--budget", type=float, default=TIME_BUDGET_SECONDS, help="Time budget in seconds.")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        changed = migrate_to_incremental_auto_vacuum()
+        console.print("[green]auto_vacuum is now INCREMENTAL.[/green]" if changed else "[green]Already INCREMENTAL.[/green]")
+
+    elif args.command == "run":
+        render_report(run_maintenance(time_budget=args.budget))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""
+app/metrics.py
+--------------
+In-process metrics (counters, gauges, histograms) for the business flows and
+the database, exported in the Prometheus text format.
+
+    Counter    only goes up                      bookings, logins, removals...
+    Gauge      goes up and down, or is read      pool usage
+               from a function at scrape time
+    Histogram  counts observations in buckets    query latency, screen render time
+
+Updates are the hot path (one per query), so they take no lock: each thread
+adds into its own cell and a scrape sums the cells. An update is a dictionary
+lookup plus an addition, 0.2-0.4 us (python -m benchmarks.metrics_bench).
+
+Exporters, started by start_exporters() from the environment:
+    SMS_METRICS_PORT=9464            GET http://127.0.0.1:9464/metrics
+    SMS_METRICS_FILE=sms.prom        rewritten every SMS_METRICS_INTERVAL seconds
+                                     (default 15) and at exit, e.g. for the
+                                     node_exporter textfile collector
+The HTTP endpoint answers in OpenMetrics when the scraper asks for it.
+"""
+
+import atexit
+import math
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import get_ident
+
+# Query and render times are sub-millisecond to seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DEFAULT_EXPORT_INTERVAL_SECONDS = 15.0
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# --- METRIC TYPES ---
+
+class _CounterChild:
+    """One label combination of a Counter (or a Gauge's inc/dec part)."""
+
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        # thread id -> [value]; only the owning thread ever writes its cell
+        self._cells = {}
+
+    def inc(self, amount: float = 1):
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            cell = self._cells.setdefault(get_ident(), [0])
+        cell[0] += amount
+
+    def value(self) -> float:
+        return sum(cell[0] for cell in list(self._cells.values()))
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ("_base", "_function")
+
+    def __init__(self):
+        super().__init__()
+        self._base = 0
+        self._function = None
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        """For gauges that are only ever set (mixing set() with concurrent inc() may lose an update)."""
+        self._base = value - super().value()
+
+    def set_function(self, function):
+        """Reads the value from function() at scrape time instead; costs nothing between scrapes."""
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._base + super().value()
+
+class _Timer:
+    """Observes the elapsed seconds into a histogram; a context manager and a decorator."""
+
+    __slots__ = ("_observe", "_started")
+
+    def __init__(self, observe):
+        self._observe = observe
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._observe(time.perf_counter() - self._started)
+
+    def __call__(self, function):
+        observe = self._observe
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(time.perf_counter() - started)
+
+        timed.__name__ = function.__name__
+        timed.__doc__ = function.__doc__
+        timed.__wrapped__ = function
+        return timed
+
+class _HistogramChild:
+    __slots__ = ("_cells", "_bounds", "_size")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self._cells = {}
+        self._bounds = bounds
+        # One slot per bucket, one for +Inf, then the sum
+        self._size = len(bounds) + 2
+
+    def observe(self, value: float):
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            cell = self._cells.setdefault(get_ident(), [0] * self._size)
+        cell[bisect_left(self._bounds, value)] += 1
+        cell[-1] += value
+
+    def time(self) -> _Timer:
+        return _Timer(self.observe)
+
+    def snapshot(self) -> tuple[list[int], float]:
+        """Per-bucket counts (not cumulative, +Inf last) and the sum."""
+        totals = [0] * self._size
+        for cell in list(self._cells.values()):
+            for index, value in enumerate(cell):
+                totals[index] += value
+        return totals[:-1], totals[-1]
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Unlabelled metrics update their only child directly
+            self._bind(self.labels())
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _bind(self, child):
+        pass
+
+    def labels(self, *values: str):
+        """The child for one combination of label values, in labelnames order. Cache it on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def children(self) -> list[tuple[tuple[str, ...], object]]:
+        return sorted(self._children.items())
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _bind(self, child):
+        self.inc = child.inc
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def _bind(self, child):
+        self.inc, self.dec, self.set, self.set_function = child.inc, child.dec, child.set, child.set_function
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _bind(self, child):
+        self.observe, self.time = child.observe, child.time
+
+# --- REGISTRY & EXPOSITION ---
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return str(int(value))
+    return repr(value)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names, values, extra: tuple[str, str] | None = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Registry:
+    """The process's metrics, rendered in registration order."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self, openmetrics: bool = False) -> str:
+        """
+        Prometheus text format (0.0.4), or OpenMetrics 1.0. The two differ only in
+        how counters are named (OpenMetrics types them without the _total suffix)
+        and in the closing # EOF line.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            family = metric.name
+            if openmetrics and metric.kind == "counter":
+                family = metric.name.removesuffix("_total")
+            lines.append(f"# HELP {family} {metric.documentation}")
+            lines.append(f"# TYPE {family} {metric.kind}")
+
+            for values, child in metric.children():
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_label_text(metric.labelnames, values)} {_format_value(child.value())}")
+                    continue
+                counts, total = child.snapshot()
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (math.inf,), counts):
+                    cumulative += count
+                    labels = _label_text(metric.labelnames, values, ("le", "+Inf" if bound == math.inf else repr(float(bound))))
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                labels = _label_text(metric.labelnames, values)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{labels} {cumulative}")
+
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# --- APPLICATION METRICS ---
+
+process_start_time = registry.gauge("sms_process_start_time_seconds", "Start time of the process since the Unix epoch.")
+process_start_time.set(time.time())
+
+registrations = registry.counter("sms_registrations_total", "Customers registered.")
+logins = registry.counter("sms_logins_total", "Login attempts by result (success, failure, admin).", ("result",))
+bookings_created = registry.counter("sms_bookings_created_total", "Service requests booked, by service.", ("service",))
+status_transitions = registry.counter("sms_order_status_transitions_total", "Order status changes, by old and new status.", ("from_status", "to_status"))
+password_hash_seconds = registry.histogram("sms_password_hash_seconds", "Time to compute one scrypt hash (hashing or verifying).")
+password_rehashes = registry.counter("sms_password_rehashes_total", "Stored passwords re-hashed at login (plaintext or older cost).")
+password_pool_rejections = registry.counter("sms_password_pool_rejections_total", "Password checks refused because the hashing pool was full.")
+user_import_records = registry.counter("sms_user_import_records_total", "Records read by the bulk user import, by result (imported, rejected).", ("result",))
+group_commit_batch_size = registry.histogram("sms_group_commit_batch_size", "Write operations per group-commit transaction (app.group_commit), by shard.", ("shard",), buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+group_commit_seconds = registry.histogram("sms_group_commit_seconds", "Time to run and commit one group-commit batch, by shard.", ("shard",))
+group_commit_operation_seconds = registry.histogram("sms_group_commit_operation_seconds", "Time from queueing a write to its batch being committed, by shard.", ("shard",))
+group_commit_operations = registry.counter("sms_group_commit_operations_total", "Group-commit write operations by shard and result (committed, failed).", ("shard", "result"))
+column_snapshot_seconds = registry.histogram("sms_column_snapshot_seconds", "Time to refresh or rebuild one shard's column snapshot (app.column_snapshot), by shard and kind.", ("shard", "kind"))
+column_snapshot_events = registry.counter("sms_column_snapshot_events_total", "Order events applied to the column snapshot, by shard.", ("shard",))
+column_snapshot_rows = registry.gauge("sms_column_snapshot_rows", "Live orders in the column snapshot, by shard.", ("shard",))
+table_scan_rows = registry.counter("sms_table_scan_rows_total", "Rows read by parallel table scans (app.scan), by table.", ("table",))
+table_scan_seconds = registry.histogram("sms_table_scan_seconds", "Wall time of one parallel table scan, by table.", ("table",))
+user_removals = registry.counter("sms_user_removals_total", "Customers removed together with their order history.")
+screen_render_seconds = registry.histogram("sms_screen_render_seconds", "Time to build the table of a screen.", ("screen",))
+screen_frame_seconds = registry.histogram("sms_screen_frame_seconds", "Time to render and write one full-screen frame (app.screen), by screen.", ("screen",))
+screen_rows = registry.counter("sms_screen_rows_total", "Frame rows sent to the terminal or skipped as unchanged, by screen.", ("screen", "result"))
+
+db_query_seconds = registry.histogram("sms_db_query_seconds", "SQL statement execution time (to the first row), by shard and statement kind.", ("shard", "statement"))
+db_query_errors = registry.counter("sms_db_query_errors_total", "SQL statements that raised, by shard.", ("shard",))
+db_commits = registry.counter("sms_db_commits_total", "Committed transactions, by shard.", ("shard",))
+db_connections_opened = registry.counter("sms_db_connections_opened_total", "New SQLite connections, by shard.", ("shard",))
+db_pool_checkouts = registry.counter("sms_db_pool_checkouts_total", "Connections handed to a Session or Connection, by shard.", ("shard",))
+db_pool_checked_out = registry.gauge("sms_db_pool_checked_out", "Pooled connections currently in use (open sessions), by shard.", ("shard",))
+db_pool_size = registry.gauge("sms_db_pool_size", "Connections the pool keeps open, by shard.", ("shard",))
+
+# --- DATABASE INSTRUMENTATION ---
+# Statements are timed in the sqlite3 cursor rather than with SQLAlchemy's
+# before/after_cursor_execute events: any per-statement engine event moves every
+# query onto SQLAlchemy's slower event path (about 10 us each on a small machine),
+# while the cursor wrapper adds a few microseconds.
+
+STATEMENT_KINDS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+def instrumented_connection_class(shard: str) -> type[sqlite3.Connection]:
+    """
+    A sqlite3.Connection subclass (make_engine passes it as the connect factory)
+    whose cursors time every statement and whose commits are counted.
+    """
+    timings = {kind: db_query_seconds.labels(shard, kind) for kind in STATEMENT_KINDS}
+    other = db_query_seconds.labels(shard, "OTHER")
+    errors = db_query_errors.labels(shard)
+    commits = db_commits.labels(shard)
+    perf_counter = time.perf_counter
+    execute, executemany = sqlite3.Cursor.execute, sqlite3.Cursor.executemany
+    cursor, commit = sqlite3.Connection.cursor, sqlite3.Connection.commit
+
+    def observe(sql: str, started: float):
+        # SQLAlchemy emits upper-case statements; anything else is normalised first
+        timing = timings.get(sql[:6]) or timings.get(sql.lstrip()[:6].upper(), other)
+        timing.observe(perf_counter() - started)
+
+    class TimedCursor(sqlite3.Cursor):
+        def execute(self, sql, parameters=()):
+            started = perf_counter()
+            try:
+                return execute(self, sql, parameters)
+            except sqlite3.Error:
+                errors.inc()
+                raise
+            finally:
+                observe(sql, started)
+
+        def executemany(self, sql, parameters):
+            started = perf_counter()
+            try:
+                return executemany(self, sql, parameters)
+            except sqlite3.Error:
+                errors.inc()
+                raise
+            finally:
+                observe(sql, started)
+
+    class TimedConnection(sqlite3.Connection):
+        def cursor(self, factory=TimedCursor):
+            return cursor(self, factory)
+
+        def commit(self):
+            commit(self)
+            commits.inc()
+
+    return TimedConnection
+
+def instrument_pool(engine, shard: str):
+    """Connection and checkout counts via pool events (once per checkout, not per statement); usage read at scrape time."""
+    from sqlalchemy import event
+
+    connections, checkouts = db_connections_opened.labels(shard), db_pool_checkouts.labels(shard)
+    event.listen(engine, "connect", lambda dbapi_connection, connection_record: connections.inc())
+    event.listen(engine, "checkout", lambda dbapi_connection, connection_record, connection_proxy: checkouts.inc())
+
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        db_pool_checked_out.labels(shard).set_function(pool.checkedout)
+        db_pool_size.labels(shard).set_function(pool.size)
+
+# --- EXPORTERS ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = registry.render(openmetrics).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Request logs would print over the TUI
+        pass
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves /metrics from a daemon thread. Binds to localhost unless told otherwise."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="sms-metrics-http", daemon=True).start()
+    return server
+
+class FileExporter:
+    """Rewrites a .prom file on an interval (atomically, temp file + rename) and once more at exit."""
+
+    def __init__(self, path: Path, interval: float = DEFAULT_EXPORT_INTERVAL_SECONDS):
+        self.path = Path(path)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        temp_path.write_text(registry.render())
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="sms-metrics-file", daemon=True)
+            self._thread.start()
+            atexit.register(self.write)
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                # Disk full or folder gone; try again on the next tick
+                pass
+
+def start_exporters() -> list:
+    """Starts the exporters configured by SMS_METRICS_PORT / SMS_METRICS_FILE. Returns them."""
+    exporters = []
+    port = os.environ.get("SMS_METRICS_PORT")
+    if port:
+        exporters.append(start_http_server(int(port), os.environ.get("SMS_METRICS_HOST", "127.0.0.1")))
+    file_name = os.environ.get("SMS_METRICS_FILE")
+    if file_name:
+        interval = float(os.environ.get("SMS_METRICS_INTERVAL", DEFAULT_EXPORT_INTERVAL_SECONDS))
+        exporter = FileExporter(Path(file_name), interval)
+        exporter.start()
+        exporters.append(exporter)
+    return exporters
@@ -0,0 +1,363 @@
+"""
+app/migrations.py
+-----------------
+Versioned schema migrations.
+
+create_db_and_tables() only creates tables that are missing; it never changes a
+table that already exists. Every later change to an existing table (new
+columns, indexes, conversions, data backfills) is a numbered migration below.
+Each shard records the versions it has applied in its schemaversion table, and
+upgrade() applies the missing ones in order: at startup, or ahead of time from
+the command line.
+
+Steps check before they change anything (add_column, create_index), so on a
+fresh database, where create_all() already built the current schema, they are
+simply recorded.
+
+Long data changes go through MigrationContext.backfill():
+    - primary-key batches of batch_size rows, each in its own short transaction
+      together with its checkpoint (BackfillCheckpoint), so a stopped run resumes
+      after the last finished batch
+    - a pause after every batch, sized to cap the rate at rows_per_second, which
+      lets the live app's writes in between batches
+Index builds report their progress through SQLite's progress handler.
+
+Command line:
+    python -m app.migrations status
+    python -m app.migrations upgrade [--rows-per-second N] [--batch-size N]
+    python -m app.migrations schema > data/schema.sql
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlmodel import SQLModel, Session, select
+
+from app.database import engine, shard_engines, create_db_and_tables
+from app.models import SchemaVersion, BackfillCheckpoint
+from app.lookups import migrate_encoded_columns
+from app.addresses import route_keys
+from app.sharding import rebuild_order_directory
+
+console = Console()
+
+BACKFILL_BATCH_SIZE = 5000
+# Minimum pause between batches, even without a rate limit, so waiting writers get the lock
+BATCH_PAUSE_SECONDS = 0.005
+# SQLite VM instructions between progress callbacks
+PROGRESS_OPCODES = 100_000
+# CREATE INDEX runs about 8 VM instructions per row plus one per indexed column while
+# scanning the table; the estimate is capped below 100% because sorting the keys follows
+INDEX_OPCODES_PER_ROW = 8
+INDEX_SCAN_SHARE = 0.9
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[["MigrationContext"], None]
+    # "shard": applied to each shard on its own. "all": applied once with every shard that
+    # still needs it (for changes that must agree across shards, like lookup codes).
+    scope: str = "shard"
+
+MIGRATIONS: list[Migration] = []
+
+def migration(version: int, name: str, scope: str = "shard"):
+    """Registers a migration step. Versions are applied in ascending order."""
+    def register(apply):
+        MIGRATIONS.append(Migration(version, name, apply, scope))
+        MIGRATIONS.sort(key=lambda item: item.version)
+        return apply
+    return register
+
+class MigrationContext:
+    """What a migration step works with: its shard(s), plus the runner's batch and rate settings."""
+
+    def __init__(self, migration: Migration, engines: list, batch_size: int, rows_per_second: float | None, progress):
+        self.migration = migration
+        self.engines = engines
+        self.engine = engines[0]
+        self.batch_size = batch_size
+        self.rows_per_second = rows_per_second
+        self._progress = progress
+
+    def report(self, message: str):
+        if self._progress:
+            self._progress(f"v{self.migration.version} {self.migration.name}: {message}")
+
+    def execute(self, sql: str, parameters=()):
+        with self.engine.begin() as conn:
+            return conn.exec_driver_sql(sql, parameters)
+
+    def column_names(self, table: str) -> set[str]:
+        with self.engine.connect() as conn:
+            return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+    def add_column(self, table: str, column_sql: str):
+        """ALTER TABLE ... ADD COLUMN, unless the column exists. column_sql is e.g. "city VARCHAR"."""
+        if column_sql.split()[0] not in self.column_names(table):
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column_sql}")
+
+    def create_index(self, name: str, table: str, columns: list[str], unique: bool = False):
+        """
+        Builds an index unless it exists, reporting the estimated share of the table scanned.
+        The build holds the write lock until it finishes, so run big ones from the
+        command line at a quiet time.
+        """
+        with self.engine.connect() as conn:
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)
+            ).first()
+            if exists:
+                return
+            rows = conn.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar_one()
+
+        expected = max(1, rows * (INDEX_OPCODES_PER_ROW + len(columns)))
+        calls = 0
+        def on_progress():
+            nonlocal calls
+            calls += 1
+            share = min(INDEX_SCAN_SHARE, calls * PROGRESS_OPCODES / expected)
+            self.report(f"indexing {table} ({rows:,} rows) {share:.0%}")
+            return 0
+
+        self.report(f"indexing {table} ({rows:,} rows)")
+        with self.engine.begin() as conn:
+            dbapi_connection = conn.connection.driver_connection
+            dbapi_connection.set_progress_handler(on_progress, PROGRESS_OPCODES)
+            try:
+                conn.exec_driver_sql(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})"
+                )
+            finally:
+                dbapi_connection.set_progress_handler(None, 0)
+
+    def backfill(self, label: str, table: str, update, key: str = "id") -> int:
+        """
+        Runs `update` over `table` in primary-key batches; see the module docstring.
+
+        `update` is either a SQL SET clause (e.g. "city = lower(city)"), applied to the
+        rows of each batch, or a function (connection, low_key, high_key) -> rows changed
+        for changes computed in Python; it must only touch keys in (low_key, high_key].
+
+        Returns the rows changed by this run.
+        """
+        checkpoint_name = f"{self.migration.version}:{label}"
+        with Session(self.engine) as session:
+            checkpoint = session.get(BackfillCheckpoint, checkpoint_name)
+            last_key = checkpoint.last_key if checkpoint else 0
+            rows_done = checkpoint.rows_done if checkpoint else 0
+        with self.engine.connect() as conn:
+            remaining = conn.exec_driver_sql(f"SELECT count(*) FROM {table} WHERE {key} > ?", (last_key,)).scalar_one()
+        total = rows_done + remaining
+
+        changed = 0
+        started = time.perf_counter()
+        scanned = 0
+        while True:
+            # Find the batch first, so the write transaction starts with a write and
+            # simply waits (busy_timeout) for the live app's writer instead of failing
+            with self.engine.connect() as conn:
+                high_key = conn.exec_driver_sql(
+                    f"SELECT max({key}) FROM (SELECT {key} FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?)",
+                    (last_key, self.batch_size)
+                ).scalar_one()
+            if high_key is None:
+                break
+
+            with self.engine.begin() as conn:
+                if callable(update):
+                    batch_changed = update(conn, last_key, high_key)
+                else:
+                    batch_changed = conn.exec_driver_sql(
+                        f"UPDATE {table} SET {update} WHERE {key} > ? AND {key} <= ?", (last_key, high_key)
+                    ).rowcount
+                batch_rows = conn.exec_driver_sql(
+                    f"SELECT count(*) FROM {table} WHERE {key} > ? AND {key} <= ?", (last_key, high_key)
+                ).scalar_one()
+                conn.exec_driver_sql(
+                    "INSERT INTO backfillcheckpoint (name, last_key, rows_done, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET last_key = excluded.last_key, "
+                    "rows_done = excluded.rows_done, updated_at = excluded.updated_at",
+                    (checkpoint_name, high_key, rows_done + batch_rows, datetime.now())
+                )
+
+            last_key = high_key
+            rows_done += batch_rows
+            scanned += batch_rows
+            changed += max(batch_changed, 0)
+            self.report(f"backfilling {table} {rows_done:,} / {total:,} rows")
+
+            # Hold the average at rows_per_second; always leave a gap for live writers
+            pause = BATCH_PAUSE_SECONDS
+            if self.rows_per_second:
+                pause = max(pause, scanned / self.rows_per_second - (time.perf_counter() - started))
+            time.sleep(pause)
+
+        return changed
+
+# --- MIGRATIONS ---
+
+@migration(1, "encode service, vendor and status as lookup codes", scope="all")
+def _encode_order_columns(ctx: MigrationContext):
+    # Rebuilds the order tables, so the app must not write to them meanwhile (app.lookups)
+    migrate_encoded_columns(
+        ctx.engines,
+        progress=lambda done, total: ctx.report(f"converting {done:,} / {total:,} rows")
+    )
+
+@migration(2, "index live orders by status")
+def _index_order_status(ctx: MigrationContext):
+    ctx.create_index("ix_servicerequest_status", "servicerequest", ["status"])
+
+# The route index as of migration 5; a database that ran migration 3 first has only the first four
+ROUTE_INDEX_COLUMNS = ["status", "scheduled_date", "city", "area", "service_name", "amount"]
+
+def _route_key_backfill(table: str):
+    """Backfill step filling the route columns of `table` from its address and date slot."""
+    def update(conn, low_key: int, high_key: int) -> int:
+        rows = conn.exec_driver_sql(
+            f"SELECT id, address, date_slot FROM {table} WHERE id > ? AND id <= ?", (low_key, high_key)
+        ).all()
+        values = []
+        for order_id, address, date_slot in rows:
+            keys = route_keys(address, date_slot)
+            scheduled = keys["scheduled_date"].isoformat() if keys["scheduled_date"] else None
+            values.append((keys["city"], keys["area"], scheduled, order_id))
+        if values:
+            conn.exec_driver_sql(f"UPDATE {table} SET city = ?, area = ?, scheduled_date = ? WHERE id = ?", values)
+        return len(values)
+    return update
+
+@migration(3, "parse order addresses into indexed route keys")
+def _add_route_keys(ctx: MigrationContext):
+    for table in ("servicerequest", "servicerequestarchive"):
+        ctx.add_column(table, "city VARCHAR(50)")
+        ctx.add_column(table, "area VARCHAR(50)")
+        ctx.add_column(table, "scheduled_date DATE")
+        ctx.backfill(f"route keys {table}", table, _route_key_backfill(table))
+    ctx.create_index("ix_servicerequest_route", "servicerequest", ROUTE_INDEX_COLUMNS)
+
+@migration(4, "index order IDs across shards in the order directory", scope="all")
+def _build_order_directory(ctx: MigrationContext):
+    # Only shard 0 holds the directory, and only a sharded layout uses it (app.sharding)
+    if len(shard_engines) < 2:
+        return
+    ctx.report("indexing order IDs")
+    duplicates = rebuild_order_directory(shard_engines)
+    if duplicates:
+        ctx.report(f"{duplicates:,} order ID(s) exist on more than one shard; the directory keeps the lowest shard's")
+
+@migration(5, "cover the route groups query with the route index")
+def _cover_route_index(ctx: MigrationContext):
+    with ctx.engine.connect() as conn:
+        columns = [row[2] for row in conn.exec_driver_sql("PRAGMA index_info(ix_servicerequest_route)")]
+    if columns != ROUTE_INDEX_COLUMNS:
+        # Built by an earlier migration 3 without service_name and amount; rebuilt under the same name
+        ctx.execute("DROP INDEX IF EXISTS ix_servicerequest_route")
+    ctx.create_index("ix_servicerequest_route", "servicerequest", ROUTE_INDEX_COLUMNS)
+
+# --- RUNNER ---
+
+def applied_versions(shard_engine) -> set[int]:
+    with Session(shard_engine) as session:
+        return set(session.exec(select(SchemaVersion.version)).all())
+
+def pending_migrations(engines=None) -> list[tuple[Migration, list]]:
+    """(migration, engines that still need it), in version order."""
+    engines = shard_engines if engines is None else engines
+    applied = {shard_engine: applied_versions(shard_engine) for shard_engine in engines}
+    pending = []
+    for item in MIGRATIONS:
+        needing = [shard_engine for shard_engine in engines if item.version not in applied[shard_engine]]
+        if needing:
+            pending.append((item, needing))
+    return pending
+
+def upgrade(engines=None, batch_size: int = BACKFILL_BATCH_SIZE, rows_per_second: float | None = None, progress=None) -> list[tuple[Migration, float]]:
+    """
+    Applies every pending migration, in version order, and records it per shard.
+    progress(message) is called with a one-line status while steps run.
+    Returns (migration, seconds) for each migration applied on at least one shard.
+    """
+    applied = []
+    for item, needing in pending_migrations(engines):
+        started = time.perf_counter()
+        groups = [needing] if item.scope == "all" else [[shard_engine] for shard_engine in needing]
+        for group in groups:
+            group_started = time.perf_counter()
+            item.apply(MigrationContext(item, group, batch_size, rows_per_second, progress))
+            duration = time.perf_counter() - group_started
+            for shard_engine in group:
+                with Session(shard_engine) as session:
+                    # merge: a second runner finishing the same step just overwrites the record
+                    session.merge(SchemaVersion(version=item.version, name=item.name, duration_seconds=duration))
+                    session.commit()
+        applied.append((item, time.perf_counter() - started))
+    return applied
+
+def run_pending_migrations() -> int:
+    """Startup hook: applies pending migrations behind a status line. Returns how many ran."""
+    if not pending_migrations():
+        return 0
+    with console.status("Upgrading database schema...") as status:
+        return len(upgrade(progress=status.update))
+
+# --- COMMAND LINE ---
+
+def schema_sql() -> str:
+    """The current schema (every table and index, as create_all would build it) as SQLite DDL."""
+    statements = []
+    for table in SQLModel.metadata.sorted_tables:
+        statements.append(str(CreateTable(table).compile(engine)).strip() + ";")
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            statements.append(str(CreateIndex(index).compile(engine)).strip() + ";")
+    return "\n".join(statements) + "\n"
+
+def render_status():
+    table = Table(title="Schema Migrations", show_lines=False)
+    table.add_column("Version", justify="right", style="bold")
+    table.add_column("Migration")
+    for index in range(len(shard_engines)):
+        table.add_column(f"Shard {index}", justify="center")
+
+    applied = [applied_versions(shard_engine) for shard_engine in shard_engines]
+    for item in MIGRATIONS:
+        marks = ["[green]applied[/green]" if item.version in versions else "[yellow]pending[/yellow]" for versions in applied]
+        table.add_row(str(item.version), item.name, *marks)
+    console.print(table)
+
+def main():
+    parser = argparse.ArgumentParser(description="Versioned schema migrations for the SMS database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show which migrations each shard has applied.")
+    upgrade_parser = subparsers.add_parser("upgrade", help="Apply pending migrations.")
+    upgrade_parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE, help="Rows per backfill transaction.")
+    upgrade_parser.add_argument("--rows-per-second", type=float, default=None, help="Backfill rate limit.")
+    subparsers.add_parser("schema", help="Print the current schema as SQL.")
+    args = parser.parse_args()
+
+    if args.command == "schema":
+        print(schema_sql(), end="")
+        return
+
+    create_db_and_tables()
+    if args.command == "status":
+        render_status()
+
+    elif args.command == "upgrade":
+        with console.status("Upgrading...") as status:
+            applied = upgrade(batch_size=args.batch_size, rows_per_second=args.rows_per_second, progress=status.update)
+        for item, seconds in applied:
+            console.print(f"[green]Applied v{item.version}[/green] {item.name} ({seconds:.1f} s)")
+        if not applied:
+            console.print("[green]Schema is up to date.[/green]")
+
+if __name__ == "__main__":
+    main()
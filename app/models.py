@@ -1,7 +1,10 @@
 import random
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
-from datetime import datetime
+from datetime import datetime, date
+
+from app.lookups import EncodedString, service_dictionary, vendor_dictionary, status_dictionary
 
 def generate_id():
     """Generates a random 7-digit number (1,000,000 to 9,999,999)."""
@@ -13,21 +16,146 @@ class User(SQLModel, table=True):
 
     user_name: str = Field(max_length=50, unique=True, index=True)
     email: str = Field(max_length=255)
-    password: str = Field(max_length=30)
+    # scrypt hash with its salt and cost (app.passwords), never the password itself
+    password: str = Field(max_length=255)
     address: str = Field(max_length=100)
     # Validation is handled in UI; this just sets DB schema limits
     contact_number: str = Field(max_length=10)
 
-class ServiceRequest(SQLModel, table=True):
+class UserDirectory(SQLModel, table=True):
+    # Username -> customer ID routing table, only used when sharding is enabled.
+    # Lives on shard 0 and also enforces username uniqueness across all shards.
+    user_name: str = Field(max_length=50, primary_key=True)
+    customer_id: int = Field(index=True)
+
+class OrderDirectory(SQLModel, table=True):
+    # Order ID -> customer ID routing table, only used when sharding is enabled.
+    # Lives on shard 0 and keeps order IDs (live and archived) unique across all shards.
+    order_id: int = Field(primary_key=True)
+    customer_id: int = Field(index=True)
+
+class LookupBase(SQLModel):
+    # One dictionary-encoded value; the code is what order rows store (see app.lookups)
+    id: int = Field(primary_key=True)
+    name: str = Field(max_length=50, unique=True)
+
+class ServiceType(LookupBase, table=True):
+    pass
+
+class Vendor(LookupBase, table=True):
+    pass
+
+class OrderStatus(LookupBase, table=True):
+    pass
+
+class ServiceRequestBase(SQLModel):
     # 7-digit ID, Primary Key
     id: Optional[int] = Field(default_factory=generate_id, primary_key=True)
     
     customer_id: int = Field(foreign_key="user.id", index=True)
     
-    service_name: str
-    status: str = Field(default="Pending")
+    # Stored as small lookup codes, read and written as strings (app.lookups)
+    service_name: str = Field(sa_type=EncodedString(service_dictionary), foreign_key="servicetype.id")
+    status: str = Field(default="Pending", sa_type=EncodedString(status_dictionary), foreign_key="orderstatus.id")
     date_slot: str
     address: str
-    vendor_name: str
+    vendor_name: str = Field(sa_type=EncodedString(vendor_dictionary), foreign_key="vendor.id")
     amount: int
-    created_at: datetime = Field(default_factory=datetime.now)
\ No newline at end of file
+    created_at: datetime = Field(default_factory=datetime.now)
+
+    # Route keys parsed from address and date_slot when the order is saved (app.addresses, migration 3)
+    city: Optional[str] = Field(default=None, max_length=50)
+    area: Optional[str] = Field(default=None, max_length=50)
+    scheduled_date: Optional[date] = None
+
+class ServiceRequest(ServiceRequestBase, table=True):
+    # Dispatch and the vendor load query live orders by status (added by migration 2).
+    # Route batches group live orders by day and place (added by migration 3).
+    __table_args__ = (
+        Index("ix_servicerequest_status", "status"),
+        # service_name and amount make it a covering index for the route groups (app.route_batches)
+        Index("ix_servicerequest_route", "status", "scheduled_date", "city", "area", "service_name", "amount"),
+    )
+
+class ServiceRequestArchive(ServiceRequestBase, table=True):
+    # Cold storage for 'Completed' / 'Cancelled' orders, filled by app.archive.
+    # Same columns as ServiceRequest so both render through the same tables.
+    archived_at: datetime = Field(default_factory=datetime.now)
+
+class CustomerSummary(SQLModel, table=True):
+    # Per-customer order rollup (app.summary), updated in the same transaction as the
+    # order change so the history header is a single primary-key read.
+    # Covers live and archived orders; cancelled orders add to the count only.
+    customer_id: int = Field(primary_key=True)
+
+    pending_count: int = 0
+    in_progress_count: int = 0
+    completed_count: int = 0
+    cancelled_count: int = 0
+    total_amount: int = 0
+    first_order_at: Optional[datetime] = None
+    last_order_at: Optional[datetime] = None
+    vendor_counts: str = "{}"  # JSON {vendor_name: orders}
+    preferred_vendor: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+class OrderEvent(SQLModel, table=True):
+    # Append-only change log for orders, written in the same transaction as the change.
+    # The auto-increment ID is the feed position consumers resume from (see app.events).
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    order_id: int
+    customer_id: int
+    event_type: str  # "created", "status_changed", "archived", "deleted" or "moved" (to another shard)
+    old_status: Optional[str] = None
+    new_status: Optional[str] = None
+    payload: str = "{}"  # JSON snapshot of the order for "created" events; booked vendor/amount when dispatch reassigns
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class EventOffset(SQLModel, table=True):
+    # Last OrderEvent ID a named consumer has fully processed, stored next to the events it tracks.
+    consumer: str = Field(max_length=50, primary_key=True)
+    last_event_id: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+class Job(SQLModel, table=True):
+    # Durable work item for app.jobs. A claimed job stays in the table, invisible
+    # until visible_at, and is deleted once the worker acknowledges it.
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    queue: str = Field(max_length=50, index=True)
+    payload: str = "{}"
+    # Optional idempotency key; enqueueing the same key twice keeps the first job
+    dedupe_key: Optional[str] = Field(default=None, max_length=100, unique=True)
+    attempts: int = 0
+    max_attempts: int = 5
+    visible_at: datetime = Field(default_factory=datetime.now, index=True)
+    claimed_by: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class DeadLetterJob(SQLModel, table=True):
+    # Jobs that failed max_attempts times, kept for inspection and manual replay.
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    job_id: int
+    queue: str = Field(max_length=50, index=True)
+    payload: str = "{}"
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime
+    failed_at: datetime = Field(default_factory=datetime.now)
+
+class SchemaVersion(SQLModel, table=True):
+    # Migrations applied to this shard (see app.migrations)
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.now)
+    duration_seconds: float = 0.0
+
+class BackfillCheckpoint(SQLModel, table=True):
+    # Resume point of a batched backfill: the last primary key it has finished
+    name: str = Field(max_length=100, primary_key=True)  # "<version>:<label>"
+    last_key: int = 0
+    rows_done: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,271 @@
+"""
+app/order_board.py
+------------------
+Live order board for admins: the most recently active orders and the live
+order counts per status, updated in place while the admin's menu stays open.
+
+Watching is cheap:
+* Each shard gets one extra connection that only runs PRAGMA data_version,
+  twice a second. The value changes when any other connection (this process's
+  pool included) commits to that file, and reading it touches no table.
+* Only when it changes is the order event log (app.events) read past the
+  board's high-water mark. Just the orders named in those events are
+  fetched, and the status counts are adjusted from the events' old and new
+  statuses instead of being counted again.
+Idle, the board costs one PRAGMA per shard per poll and no redraws.
+
+The menu is a questionary prompt run with ask_async(); between polls the board
+is redrawn above it through prompt_toolkit's run_in_terminal(), which takes
+the prompt down, lets app.screen rewrite only the changed rows, and puts the
+prompt back under the new frame.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from datetime import datetime
+
+import questionary
+from prompt_toolkit.application import run_in_terminal
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+from sqlmodel import Session, select, func, col
+
+from app.database import shard_engines, shard_file_name, connect_sqlite
+from app.models import ServiceRequest, OrderEvent
+from app.read_models import OrderListRow, select_order_list, as_rows
+from app.events import EventConsumer
+from app.screen import screen, PROMPT_ROWS
+
+console = Console()
+
+POLL_INTERVAL_SECONDS = 0.5
+# Rows changed by the last refresh stay highlighted this long
+HIGHLIGHT_SECONDS = 5.0
+MIN_BOARD_ROWS = 5
+# Rows the board itself uses around its table (panel, header, borders)
+BOARD_CHROME_ROWS = 9
+EVENT_BATCH_SIZE = 500
+STATUS_ORDER = ("Pending", "In Progress", "Completed", "Cancelled")
+BOARD_CONSUMER = "order-board"
+
+class DataVersionWatcher:
+    """One connection per shard that only reads PRAGMA data_version."""
+
+    def __init__(self):
+        self._connections = [connect_sqlite(shard_file_name(index), check_same_thread=False) for index in range(len(shard_engines))]
+        self._versions = [self._read(connection) for connection in self._connections]
+
+    @staticmethod
+    def _read(connection) -> int:
+        return connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed_shards(self) -> list[int]:
+        """Shards another connection has committed to since the last call."""
+        changed = []
+        for index, connection in enumerate(self._connections):
+            version = self._read(connection)
+            if version != self._versions[index]:
+                self._versions[index] = version
+                changed.append(index)
+        return changed
+
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+
+class OrderBoard:
+    """The newest `size` orders by last activity, plus live counts per status, kept current from the event log."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.rows: dict[int, OrderListRow] = {}
+        # Order ID -> time of its last create / status change (the board's sort key)
+        self.activity: dict[int, datetime] = {}
+        # Order ID -> monotonic time it changed on this board (for the highlight)
+        self.changed_at: dict[int, float] = {}
+        self.status_counts: Counter = Counter()
+        self.shard_counts: list[Counter] = [Counter() for _ in shard_engines]
+        self.high_water = [0] * len(shard_engines)
+        self.last_change: datetime | None = None
+        self.watcher = DataVersionWatcher()
+
+    # --- LOADING & REFRESH ---
+
+    def _count_statuses(self, index: int):
+        with Session(shard_engines[index]) as session:
+            counts = session.exec(select(ServiceRequest.status, func.count()).group_by(ServiceRequest.status)).all()
+        self.status_counts -= self.shard_counts[index]
+        self.shard_counts[index] = Counter(dict(counts))
+        self.status_counts += self.shard_counts[index]
+
+    def load(self):
+        """One pass over every shard: high-water mark, status counts and the newest orders."""
+        for index, shard_engine in enumerate(shard_engines):
+            with Session(shard_engine) as session:
+                self.high_water[index] = session.exec(select(func.max(OrderEvent.id))).one() or 0
+                newest = as_rows(session.exec(
+                    select_order_list(ServiceRequest).order_by(col(ServiceRequest.created_at).desc()).limit(self.size)
+                ).all(), OrderListRow)
+            self._count_statuses(index)
+            for row in newest:
+                self.rows[row.id] = row
+                self.activity[row.id] = row.created_at or datetime.min
+        self._trim()
+
+    def _trim(self):
+        if len(self.rows) <= self.size:
+            return
+        keep = sorted(self.rows, key=lambda order_id: self.activity[order_id], reverse=True)[:self.size]
+        for order_id in set(self.rows) - set(keep):
+            del self.rows[order_id]
+            del self.activity[order_id]
+            self.changed_at.pop(order_id, None)
+
+    def _apply(self, index: int, events: list[OrderEvent]):
+        # Only the orders the events name are fetched, in one query
+        touched = {event.order_id for event in events if event.event_type in ("created", "status_changed")}
+        fetched = {}
+        if touched:
+            with Session(shard_engines[index]) as session:
+                fetched = {row.id: row for row in as_rows(session.exec(
+                    select_order_list(ServiceRequest).where(col(ServiceRequest.id).in_(touched))
+                ).all(), OrderListRow)}
+
+        recount = False
+        now = time.monotonic()
+        for event in events:
+            if event.event_type == "created":
+                self.status_counts[event.new_status] += 1
+                self.shard_counts[index][event.new_status] += 1
+            elif event.event_type == "status_changed":
+                for counts in (self.status_counts, self.shard_counts[index]):
+                    counts[event.old_status] -= 1
+                    counts[event.new_status] += 1
+            else:
+                # Archive moves and deletes also log rows of the archive table; recount once
+                recount = True
+
+            if event.order_id in fetched:
+                self.rows[event.order_id] = fetched[event.order_id]
+                self.activity[event.order_id] = event.created_at
+                self.changed_at[event.order_id] = now
+            elif event.order_id in self.rows:
+                del self.rows[event.order_id]
+                del self.activity[event.order_id]
+                self.changed_at.pop(event.order_id, None)
+
+        if recount:
+            self._count_statuses(index)
+        self.last_change = max(event.created_at for event in events)
+        self._trim()
+
+    def refresh(self) -> bool:
+        """Applies every event committed since the last refresh. Returns True if the board changed."""
+        changed = False
+        for index in self.watcher.changed_shards():
+            consumer = EventConsumer(BOARD_CONSUMER, shard_engines[index])
+            while events := consumer.poll(EVENT_BATCH_SIZE, after=self.high_water[index]):
+                self._apply(index, events)
+                self.high_water[index] = events[-1].id
+                changed = True
+        return changed
+
+    def expire_highlights(self) -> bool:
+        """Drops highlights older than HIGHLIGHT_SECONDS. Returns True if any did (the board needs a redraw)."""
+        cutoff = time.monotonic() - HIGHLIGHT_SECONDS
+        expired = [order_id for order_id, changed in self.changed_at.items() if changed < cutoff]
+        for order_id in expired:
+            del self.changed_at[order_id]
+        return bool(expired)
+
+    def close(self):
+        self.watcher.close()
+
+    # --- RENDERING ---
+
+    def render(self) -> list:
+        counts = [f"{status}: [bold]{self.status_counts.get(status, 0)}[/bold]" for status in STATUS_ORDER]
+        counts += [f"{status}: [bold]{count}[/bold]" for status, count in self.status_counts.items() if status not in STATUS_ORDER]
+        last_change = self.last_change.strftime("%H:%M:%S") if self.last_change else "none since opened"
+        header = Panel(
+            f"[bold cyan]Live Order Board[/bold cyan]  [dim](last change: {last_change})[/dim]\n" + "  |  ".join(counts),
+            style="cyan"
+        )
+
+        table = Table(expand=True)
+        table.add_column("", width=1)
+        table.add_column("Order ID", style="cyan", no_wrap=True)
+        table.add_column("Customer", style="magenta", no_wrap=True)
+        table.add_column("Service", style="bold white")
+        table.add_column("Vendor")
+        table.add_column("Amount", justify="right", style="green")
+        table.add_column("Status", justify="center")
+        table.add_column("Last Change", justify="center")
+
+        today = datetime.now().date()
+        for order_id in sorted(self.rows, key=lambda order_id: self.activity[order_id], reverse=True):
+            row = self.rows[order_id]
+            activity = self.activity[order_id]
+            when = activity.strftime("%H:%M:%S") if activity.date() == today else activity.strftime("%Y-%m-%d")
+            status_style = "yellow" if row.status == "Pending" else "green"
+            fresh = order_id in self.changed_at
+            table.add_row(
+                "[bold green]●[/bold green]" if fresh else "",
+                str(row.id),
+                row.user_name or f"ID {row.customer_id}",
+                row.service_name,
+                row.vendor_name,
+                f"${row.amount}",
+                f"[{status_style}]{row.status}[/{status_style}]",
+                when,
+                style="bold" if fresh else None
+            )
+        return [header, table]
+
+# --- UI ---
+
+def _draw(board: OrderBoard, update: bool):
+    screen.draw("order_board", *board.render(), update=update)
+
+async def _watch_while_prompting(board: OrderBoard) -> str | None:
+    """Shows the menu and keeps the board current above it until the admin picks something."""
+    _draw(board, update=False)
+    prompt = asyncio.ensure_future(questionary.select(
+        "Order Board (updates live):",
+        choices=["Change Order Status", "Back to Menu"]
+    ).ask_async())
+
+    while not prompt.done():
+        await asyncio.wait([prompt], timeout=POLL_INTERVAL_SECONDS)
+        if prompt.done():
+            break
+        # The PRAGMA poll is microseconds; reading events and rows runs off the prompt's thread
+        changed = await asyncio.to_thread(board.refresh)
+        if board.expire_highlights() or changed:
+            await run_in_terminal(lambda: _draw(board, update=True))
+    return prompt.result()
+
+def order_board_ui():
+    """
+    Admin screen: the live order board, until the admin goes back.
+    """
+    # Enough rows to keep the table, and the menu under it, on one screen
+    size = max(MIN_BOARD_ROWS, console.height - PROMPT_ROWS - BOARD_CHROME_ROWS)
+    board = OrderBoard(size)
+    try:
+        with console.status("Loading order board..."):
+            board.load()
+
+        while True:
+            choice = asyncio.run(_watch_while_prompting(board))
+            if choice == "Change Order Status":
+                # Imported here: admin_mgr imports this module for its menu
+                from app.admin_mgr import change_order_status_ui
+                change_order_status_ui()
+                board.refresh()
+            else:
+                return
+    finally:
+        board.close()
@@ -0,0 +1,262 @@
+"""
+app/passwords.py
+----------------
+Password hashing with scrypt, verified off the calling thread.
+
+User.password holds
+    scrypt$<n>$<r>$<p>$<salt>$<hash>      (salt and hash in unpadded urlsafe base64)
+
+so every hash carries the cost it was made with. The cost of new hashes comes
+from SMS_SCRYPT_N / SMS_SCRYPT_R / SMS_SCRYPT_P (default 2**14, 8, 1: 16 MiB
+and roughly 30-60 ms of CPU per hash).
+
+Accounts stored before hashing (plaintext) and hashes made with an older cost
+keep working: authenticate() re-hashes them with the current cost on the next
+successful login (rehash-on-login). `python -m app.passwords status` shows what
+is left per shard; `upgrade` hashes the remaining plaintext passwords in one go.
+
+Hashing and verifying run in a bounded pool of threads (hashlib.scrypt releases
+the GIL, so the threads use every core while the UI thread keeps drawing). At
+most SMS_PASSWORD_WORKERS hashes run at once and at most MAX_PENDING_PER_WORKER
+per worker wait, in arrival order; past that, callers get PasswordPoolBusy at
+once instead of queueing behind a backlog.
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cache
+
+from rich.console import Console
+from rich.table import Table
+
+from app.database import shard_engines
+from app.metrics import password_hash_seconds, password_pool_rejections
+
+console = Console()
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+HASH_BYTES = 32
+MAX_PENDING_PER_WORKER = 8
+UPGRADE_BATCH_SIZE = 200
+
+@dataclass(frozen=True)
+class ScryptCost:
+    n: int
+    r: int
+    p: int
+
+    @property
+    def maxmem(self) -> int:
+        # OpenSSL needs 128 * r * (n + p + 2) bytes; its default cap is 32 MiB
+        return 128 * self.r * (self.n + self.p + 2) + 1024 * 1024
+
+CURRENT_COST = ScryptCost(
+    n=int(os.environ.get("SMS_SCRYPT_N", 2 ** 14)),
+    r=int(os.environ.get("SMS_SCRYPT_R", 8)),
+    p=int(os.environ.get("SMS_SCRYPT_P", 1)),
+)
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _scrypt(password: str, salt: bytes, cost: ScryptCost) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=cost.n, r=cost.r, p=cost.p, maxmem=cost.maxmem, dklen=HASH_BYTES)
+
+def _parse(stored: str) -> tuple[ScryptCost, bytes, bytes] | None:
+    """(cost, salt, hash) of a stored hash, or None for a legacy plaintext password."""
+    parts = stored.split("$")
+    if len(parts) != 6 or parts[0] != SCHEME:
+        return None
+    try:
+        cost = ScryptCost(int(parts[1]), int(parts[2]), int(parts[3]))
+        salt, digest = _b64decode(parts[4]), _b64decode(parts[5])
+    except ValueError:
+        return None
+    return (cost, salt, digest) if len(digest) == HASH_BYTES else None
+
+def is_hashed(stored: str) -> bool:
+    return _parse(stored) is not None
+
+def current_prefix(cost: ScryptCost = CURRENT_COST) -> str:
+    """Every hash made with `cost` starts with this."""
+    return f"{SCHEME}${cost.n}${cost.r}${cost.p}$"
+
+# --- HASHING (runs in the calling thread) ---
+
+def hash_password(password: str, cost: ScryptCost = CURRENT_COST) -> str:
+    salt = secrets.token_bytes(SALT_BYTES)
+    started = time.perf_counter()
+    digest = _scrypt(password, salt, cost)
+    password_hash_seconds.observe(time.perf_counter() - started)
+    return f"{current_prefix(cost)}{_b64encode(salt)}${_b64encode(digest)}"
+
+def verify_password(password: str, stored: str) -> bool:
+    """Constant-time check against a stored hash, or against a legacy plaintext password."""
+    parsed = _parse(stored)
+    if parsed is None:
+        return hmac.compare_digest(password.encode(), stored.encode())
+    cost, salt, digest = parsed
+    started = time.perf_counter()
+    candidate = _scrypt(password, salt, cost)
+    password_hash_seconds.observe(time.perf_counter() - started)
+    return hmac.compare_digest(candidate, digest)
+
+def needs_rehash(stored: str) -> bool:
+    """True for plaintext, and for hashes made with a different cost than the current one."""
+    return not stored.startswith(current_prefix())
+
+@cache
+def dummy_hash() -> str:
+    """Checked against when a username does not exist, so a miss takes as long as a wrong password."""
+    return hash_password(secrets.token_urlsafe(16))
+
+# --- BOUNDED POOL ---
+
+class PasswordPoolBusy(RuntimeError):
+    """Every worker is busy and the waiting line is full; try again shortly."""
+
+class PasswordPool:
+    """
+    Fixed number of hashing threads. The executor's queue is the waiting line,
+    so jobs start in arrival order; it is capped, and a job that would make it
+    longer is refused at once (PasswordPoolBusy) rather than left to wait.
+    """
+
+    def __init__(self, workers: int, max_pending_per_worker: int = MAX_PENDING_PER_WORKER):
+        self.workers = workers
+        self.max_pending = workers * (1 + max_pending_per_worker)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sms-password")
+        # Running plus waiting jobs
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, function, *args) -> Future:
+        """Queues function(*args). Raises PasswordPoolBusy if the waiting line is full."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                password_pool_rejections.inc()
+                raise PasswordPoolBusy("Too many password checks in progress.")
+            self._pending += 1
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def hash(self, password: str) -> str:
+        return self.submit(hash_password, password).result()
+
+    def verify(self, password: str, stored: str) -> bool:
+        return self.submit(verify_password, password, stored).result()
+
+    def hash_many(self, passwords: list[str]) -> list[str]:
+        """
+        Hashes a batch on every worker at once. Bulk work is never refused; it is
+        fed in windows of one job per worker, so it never queues far ahead of a login.
+        """
+        hashes = []
+        for start in range(0, len(passwords), self.workers):
+            window = [self._executor.submit(hash_password, password) for password in passwords[start:start + self.workers]]
+            hashes += [future.result() for future in window]
+        return hashes
+
+password_pool = PasswordPool(int(os.environ.get("SMS_PASSWORD_WORKERS", os.cpu_count() or 1)))
+
+# --- BULK UPGRADE ---
+
+def password_status(engines=None) -> list[dict]:
+    """Per shard: accounts hashed with the current cost, with an older cost, and still in plaintext."""
+    rows = []
+    for shard_engine in engines or shard_engines:
+        with shard_engine.connect() as conn:
+            counts = dict(conn.exec_driver_sql(
+                "SELECT CASE WHEN substr(password, 1, ?) = ? THEN 'current' "
+                "            WHEN password LIKE ? THEN 'outdated' ELSE 'plaintext' END, count(*) "
+                "FROM \"user\" GROUP BY 1",
+                (len(current_prefix()), current_prefix(), SCHEME + "$%")
+            ).all())
+        rows.append({kind: counts.get(kind, 0) for kind in ("current", "outdated", "plaintext")})
+    return rows
+
+def upgrade_plaintext_passwords(engines=None, batch_size: int = UPGRADE_BATCH_SIZE, progress=None) -> int:
+    """
+    Hashes every plaintext password, a batch of users at a time (hashed in
+    parallel on the pool, then written in one transaction). A password changed
+    meanwhile is left alone. Hashes with an older cost are not touched: they can
+    only be redone with the password, at the next login.
+    progress(hashed) is called after each batch. Returns the number hashed.
+    """
+    hashed = 0
+    pattern = SCHEME + "$%"
+    for shard_engine in engines or shard_engines:
+        last_id = 0
+        while True:
+            with shard_engine.connect() as conn:
+                batch = conn.exec_driver_sql(
+                    "SELECT id, password FROM \"user\" WHERE id > ? AND password NOT LIKE ? ORDER BY id LIMIT ?",
+                    (last_id, pattern, batch_size)
+                ).all()
+            if not batch:
+                break
+            new_hashes = password_pool.hash_many([password for _, password in batch])
+            with shard_engine.begin() as conn:
+                for (user_id, old_password), new_hash in zip(batch, new_hashes):
+                    hashed += conn.exec_driver_sql(
+                        "UPDATE \"user\" SET password = ? WHERE id = ? AND password = ?", (new_hash, user_id, old_password)
+                    ).rowcount
+            last_id = batch[-1][0]
+            if progress:
+                progress(hashed)
+    return hashed
+
+# --- COMMAND LINE ---
+
+def render_status():
+    table = Table(title=f"Stored Passwords (current cost n={CURRENT_COST.n}, r={CURRENT_COST.r}, p={CURRENT_COST.p})")
+    table.add_column("Shard", justify="right", style="bold")
+    table.add_column("Current", justify="right", style="green")
+    table.add_column("Older cost", justify="right", style="yellow")
+    table.add_column("Plaintext", justify="right", style="red")
+    for index, row in enumerate(password_status()):
+        table.add_row(str(index), f"{row['current']:,}", f"{row['outdated']:,}", f"{row['plaintext']:,}")
+    console.print(table)
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and upgrade stored password hashes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Count current, outdated and plaintext passwords per shard.")
+    upgrade_parser = subparsers.add_parser("upgrade", help="Hash every remaining plaintext password now.")
+    upgrade_parser.add_argument("--batch-size", type=int, default=UPGRADE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        render_status()
+    elif args.command == "upgrade":
+        with console.status("Hashing plaintext passwords...") as status:
+            hashed = upgrade_plaintext_passwords(
+                batch_size=args.batch_size,
+                progress=lambda done: status.update(f"Hashing plaintext passwords... {done:,}")
+            )
+        console.print(f"[green]Hashed {hashed:,} plaintext password(s).[/green]")
+        render_status()
+
+if __name__ == "__main__":
+    main()
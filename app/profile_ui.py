@@ -6,6 +6,7 @@ Contains both the static assets (ASCII art, Themes) and the rendering logic.
 """
 
 import random
+from functools import lru_cache
 from rich import box
 from rich.console import Console
 from rich.panel import Panel
@@ -13,7 +14,9 @@ from rich.align import Align
 from rich.text import Text
 from rich.console import Group
 from rich.rule import Rule
-from app.models import User
+from rich.table import Table
+from app.models import User, CustomerSummary
+from app.screen import screen, Static
 
 console = Console()
 
@@ -73,17 +76,41 @@ HEADERS = [
 
 # --- RENDERER (LOGIC) ---
 
-def render_profile_dashboard(user: User):
+def render_order_summary(summary: CustomerSummary | None) -> Panel:
     """
-    Clears the screen and draws a randomized Profile Card for the given user.
+    Builds the lifetime order totals panel shown above the history and on the profile.
     """
-    console.clear()
+    if summary is None:
+        return Panel("[dim]No orders yet.[/dim]", title="Your Orders", style="cyan")
 
-    # 1. Randomizer Engine
-    avatar = random.choice(AVATARS)
-    theme = random.choice(THEMES)
-    box_style = random.choice(LAYOUT_STYLES)
-    header_text = random.choice(HEADERS)
+    open_orders = summary.pending_count + summary.in_progress_count
+    first = summary.first_order_at.strftime("%Y-%m-%d") if summary.first_order_at else "N/A"
+    last = summary.last_order_at.strftime("%Y-%m-%d") if summary.last_order_at else "N/A"
+
+    grid = Table.grid(padding=(0, 3))
+    grid.add_column(style="bold")
+    grid.add_column()
+    grid.add_column(style="bold")
+    grid.add_column()
+    grid.add_row("Lifetime Spend:", f"[green]${summary.total_amount}[/green]", "Preferred Vendor:", summary.preferred_vendor or "N/A")
+    grid.add_row("Open Orders:", f"[yellow]{open_orders}[/yellow] ({summary.pending_count} pending)", "Completed:", str(summary.completed_count))
+    grid.add_row("First Order:", first, "Last Order:", last)
+    grid.add_row("Cancelled:", str(summary.cancelled_count), "", "")
+
+    return Panel(grid, title="Your Orders", style="cyan")
+
+def _pick_look() -> tuple[int, int, int, int]:
+    """A random avatar, theme, box and header (as indices), picked on every load."""
+    return (
+        random.randrange(len(AVATARS)), random.randrange(len(THEMES)),
+        random.randrange(len(LAYOUT_STYLES)), random.randrange(len(HEADERS))
+    )
+
+@lru_cache(maxsize=256)
+def _profile_card(look: tuple[int, int, int, int], user_id: int, user_name: str, email: str, address: str) -> Static:
+    """The centred profile card in one look; built once per look and set of shown fields."""
+    # 1. Randomizer Engine (the pick itself is _pick_look)
+    avatar, theme, box_style, header_text = AVATARS[look[0]], THEMES[look[1]], LAYOUT_STYLES[look[2]], HEADERS[look[3]]
 
     # 2. Component Construction
     
@@ -93,16 +120,16 @@ def render_profile_dashboard(user: User):
     # B. User Details (Styled Text)
     details_text = Text()
     details_text.append("\nUser ID: ", style=f"bold {theme['border']}")
-    details_text.append(f"{user.id}\n", style=theme["text"])
+    details_text.append(f"{user_id}\n", style=theme["text"])
     
     details_text.append("Name:    ", style=f"bold {theme['border']}")
-    details_text.append(f"{user.user_name}\n", style=theme["text"])
+    details_text.append(f"{user_name}\n", style=theme["text"])
     
     details_text.append("Email:   ", style=f"bold {theme['border']}")
-    details_text.append(f"{user.email}\n", style=theme["text"])
+    details_text.append(f"{email}\n", style=theme["text"])
     
     details_text.append("Address: ", style=f"bold {theme['border']}")
-    details_text.append(f"{user.address}", style=theme["text"])
+    details_text.append(f"{address}", style=theme["text"])
 
     # C. Grouping
     card_content = Group(
@@ -121,7 +148,19 @@ def render_profile_dashboard(user: User):
         width=50,
         padding=(1, 2)
     )
+    return Static(Align.center(profile_card))
+
+def render_profile_dashboard(user: User, summary: CustomerSummary | None = None, update: bool = False):
+    """
+    Draws the customer's Profile Card (a new random look on every load),
+    followed by their order totals when a summary is given.
+    update=True when the previous profile frame is still on screen (only the
+    rows that changed are redrawn, see app.screen).
+    """
+    parts = [_profile_card(_pick_look(), user.id, user.user_name, user.email, user.address)]
+    if summary is not None:
+        parts.append(Align.center(render_order_summary(summary), width=70))
+    parts.append("\n")
 
     # 3. Final Output
-    console.print(Align.center(profile_card))
-    console.print("\n")
\ No newline at end of file
+    screen.draw("profile", *parts, update=update)
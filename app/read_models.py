@@ -0,0 +1,79 @@
+"""
+app/read_models.py
+------------------
+Column-projected rows for the list and search screens.
+
+The tables only print a handful of strings per row, so instead of loading full
+ORM objects (identity map, change tracking, Pydantic validation) those screens
+select just the rendered columns and get plain NamedTuples back. The field names
+match the model attributes, so the renderers work unchanged.
+
+    statement = select_rows(User, UserRow).where(...)
+    rows = as_rows(session.exec(statement).all(), UserRow)
+
+See benchmarks/read_models_bench.py for the hydration time / memory comparison.
+"""
+
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlmodel import select
+
+from app.models import User
+
+class OrderListRow(NamedTuple):
+    # Admin "View All Orders" table: the order plus its customer (see select_order_list)
+    id: int
+    customer_id: int
+    service_name: str
+    vendor_name: str
+    amount: int
+    status: str
+    created_at: datetime | None
+    user_name: str | None
+    contact_number: str | None
+
+# OrderListRow fields that come from the joined User row
+ORDER_LIST_CUSTOMER_FIELDS = ("user_name", "contact_number")
+
+class OrderHistoryRow(NamedTuple):
+    # Customer "View Order History" table
+    id: int
+    customer_id: int
+    service_name: str
+    vendor_name: str
+    amount: int
+    status: str
+    date_slot: str
+    address: str
+    created_at: datetime | None
+
+class UserRow(NamedTuple):
+    # Admin customer search results
+    id: int
+    user_name: str
+    email: str
+    address: str
+    contact_number: str
+
+def select_rows(model, row_type):
+    """select() of exactly the row type's fields, in order, from `model`."""
+    return select(*(getattr(model, name) for name in row_type._fields))
+
+def select_order_list(model):
+    """
+    Admin order list for `model` (ServiceRequest or ServiceRequestArchive), joined to
+    the customer's name and contact in the same query. A customer's User row lives on
+    the same shard as their orders, so the join never crosses shards. The join is a
+    rowid lookup per order, and it is a LEFT JOIN so orders are never hidden.
+    """
+    order_columns = [getattr(model, name) for name in OrderListRow._fields if name not in ORDER_LIST_CUSTOMER_FIELDS]
+    customer_columns = [getattr(User, name) for name in ORDER_LIST_CUSTOMER_FIELDS]
+    return (
+        select(*order_columns, *customer_columns)
+        .join(User, User.id == model.customer_id, isouter=True)
+    )
+
+def as_rows(rows, row_type) -> list:
+    """Wraps result rows from a select_rows() statement in `row_type`."""
+    return [row_type._make(row) for row in rows]
@@ -0,0 +1,233 @@
+"""
+app/route_batches.py
+--------------------
+Pending orders grouped by scheduled day, city and area, so each vendor can be
+handed a batch of nearby jobs for the same day.
+
+Both queries are range scans of ix_servicerequest_route (status,
+scheduled_date, city, area, service_name, amount):
+    groups   status = 'Pending' AND scheduled_date in the window, grouped in
+             index order. The index also holds the service filter and the
+             amount, so it covers the query: no table rows are read and no
+             sort is needed
+    a group  the full key prefix, i.e. only that group's index entries, then
+             each stop's row for its address and slot
+The route keys come from app.addresses (filled at booking time and, for older
+orders, by migration 3). Every shard is queried in parallel and the groups
+are summed across shards.
+
+Command line:
+    python -m app.route_batches [--date YYYY-MM-DD] [--days N] [--service NAME]
+"""
+
+import argparse
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+import questionary
+from questionary import Choice
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+from sqlmodel import select, func
+
+from app.models import ServiceRequest, User
+from app.sharding import ShardedSession
+from app.lookups import SERVICE_NAMES
+from app.addresses import DATE_SLOT_FORMAT
+
+console = Console()
+
+ROUTE_WINDOWS = {"Today": (0, 1), "Tomorrow": (1, 1), "Next 7 Days": (0, 7)}
+ALL_SERVICES = "All Services"
+SLOT_START_FORMAT = DATE_SLOT_FORMAT + " %I:%M %p"
+
+class RouteGroup(NamedTuple):
+    scheduled_date: date
+    city: str | None
+    area: str | None
+    orders: int
+    amount: int
+
+class RouteStop(NamedTuple):
+    # One order of a route batch, with what the vendor needs to reach the customer
+    id: int
+    date_slot: str
+    service_name: str
+    vendor_name: str
+    amount: int
+    address: str
+    user_name: str | None
+    contact_number: str | None
+
+# --- QUERIES ---
+
+def _pending(statement, service: str | None):
+    statement = statement.where(ServiceRequest.status == "Pending")
+    if service:
+        statement = statement.where(ServiceRequest.service_name == service)
+    return statement
+
+def route_groups(start: date, days: int, service: str | None = None) -> list[RouteGroup]:
+    """Pending orders per (day, city, area) from `start` for `days` days, in that order."""
+    key_columns = (ServiceRequest.scheduled_date, ServiceRequest.city, ServiceRequest.area)
+    statement = (
+        _pending(select(*key_columns, func.count(), func.sum(ServiceRequest.amount)), service)
+        .where(ServiceRequest.scheduled_date >= start)
+        .where(ServiceRequest.scheduled_date < start + timedelta(days=days))
+        .group_by(*key_columns)
+    )
+
+    with ShardedSession() as shards:
+        partials = shards.all(statement)
+
+    # A city/area can have orders on several shards: add the partial groups up
+    totals: dict[tuple, list[int]] = {}
+    for scheduled_date, city, area, orders, amount in partials:
+        total = totals.setdefault((scheduled_date, city, area), [0, 0])
+        total[0] += orders
+        total[1] += amount or 0
+    groups = [RouteGroup(*key, orders, amount) for key, (orders, amount) in totals.items()]
+    return sorted(groups, key=lambda group: (group.scheduled_date, group.city or "", group.area or ""))
+
+def _slot_start(date_slot: str) -> datetime:
+    try:
+        return datetime.strptime(date_slot[:19], SLOT_START_FORMAT)
+    except ValueError:
+        return datetime.max
+
+def route_stops(group: RouteGroup, service: str | None = None) -> list[RouteStop]:
+    """The pending orders of one group, in time-slot order."""
+    statement = _pending(
+        select(
+            ServiceRequest.id, ServiceRequest.date_slot, ServiceRequest.service_name, ServiceRequest.vendor_name,
+            ServiceRequest.amount, ServiceRequest.address, User.user_name, User.contact_number
+        )
+        .join(User, User.id == ServiceRequest.customer_id, isouter=True)
+        .where(ServiceRequest.scheduled_date == group.scheduled_date)
+        .where(ServiceRequest.city == group.city)
+        .where(ServiceRequest.area == group.area),
+        service
+    )
+    with ShardedSession() as shards:
+        stops = [RouteStop._make(row) for row in shards.all(statement)]
+    return sorted(stops, key=lambda stop: (_slot_start(stop.date_slot), stop.id))
+
+# --- RENDERING ---
+
+def _place(group: RouteGroup) -> str:
+    return f"{(group.city or '(no city)').title()} / {(group.area or '(no area)').title()}"
+
+def render_route_groups(groups: list[RouteGroup], title: str) -> Table:
+    table = Table(title=title, show_lines=False)
+    table.add_column("Date", style="cyan", no_wrap=True)
+    table.add_column("City", style="bold white")
+    table.add_column("Area")
+    table.add_column("Orders", justify="right", style="bold")
+    table.add_column("Value", justify="right", style="green")
+
+    for index, group in enumerate(groups):
+        next_group = groups[index + 1] if index + 1 < len(groups) else None
+        table.add_row(
+            group.scheduled_date.isoformat(),
+            (group.city or "(no city)").title(),
+            (group.area or "(no area)").title(),
+            str(group.orders),
+            f"${group.amount}",
+            # One section per day
+            end_section=next_group is not None and next_group.scheduled_date != group.scheduled_date
+        )
+    return table
+
+def render_route_stops(group: RouteGroup, stops: list[RouteStop]) -> Table:
+    table = Table(title=f"{group.scheduled_date.isoformat()}: {_place(group)}", show_lines=False)
+    table.add_column("Order ID", style="cyan", no_wrap=True)
+    table.add_column("Slot", no_wrap=True)
+    table.add_column("Service", style="bold white")
+    table.add_column("Vendor")
+    table.add_column("Customer", style="magenta")
+    table.add_column("Contact")
+    table.add_column("Address")
+    table.add_column("Amount", justify="right", style="green")
+    for stop in stops:
+        table.add_row(
+            str(stop.id),
+            stop.date_slot[11:],
+            stop.service_name,
+            stop.vendor_name,
+            stop.user_name or "[dim]Unknown[/dim]",
+            stop.contact_number or "-",
+            stop.address,
+            f"${stop.amount}"
+        )
+    return table
+
+def _window_title(start: date, days: int, service: str | None) -> str:
+    span = start.isoformat() if days == 1 else f"{start.isoformat()} to {(start + timedelta(days=days - 1)).isoformat()}"
+    return f"Pending {service or 'orders'} by area, {span}"
+
+# --- UI ---
+
+def route_batches_ui():
+    """
+    Admin screen: pick a day window (and optionally a service), then drill into an area's orders.
+    """
+    console.clear()
+    console.print(Panel("Route Batches", style="bold blue"))
+
+    window = questionary.select("Scheduled for:", choices=list(ROUTE_WINDOWS) + ["Back"]).ask()
+    if window not in ROUTE_WINDOWS:
+        return
+    service = questionary.select("Service:", choices=[ALL_SERVICES, *SERVICE_NAMES]).ask()
+    if service is None:
+        return
+    service = None if service == ALL_SERVICES else service
+
+    offset, days = ROUTE_WINDOWS[window]
+    start = date.today() + timedelta(days=offset)
+    title = _window_title(start, days, service)
+
+    while True:
+        with console.status("Grouping pending orders..."):
+            groups = route_groups(start, days, service)
+
+        console.clear()
+        if not groups:
+            console.print(Panel(f"No pending orders scheduled ({title}).", style="yellow"))
+            questionary.press_any_key_to_continue().ask()
+            return
+        console.print(render_route_groups(groups, title))
+
+        choices = [
+            Choice(f"{group.scheduled_date.isoformat()}  {_place(group)}  ({group.orders} order(s))", value=group)
+            for group in groups
+        ]
+        group = questionary.select(
+            "Open a batch:",
+            choices=choices + [Choice("Back", value=None)]
+        ).ask()
+        if group is None:
+            return
+
+        console.clear()
+        console.print(render_route_stops(group, route_stops(group, service)))
+        questionary.press_any_key_to_continue().ask()
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Pending orders grouped by day, city and area.")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today(), help="First day (YYYY-MM-DD), default today.")
+    parser.add_argument("--days", type=int, default=1, help="Number of days from --date.")
+    parser.add_argument("--service", choices=SERVICE_NAMES, default=None, help="Only this service.")
+    args = parser.parse_args()
+
+    groups = route_groups(args.date, args.days, args.service)
+    title = _window_title(args.date, args.days, args.service)
+    if not groups:
+        console.print(f"[yellow]No pending orders scheduled ({title}).[/yellow]")
+        return
+    console.print(render_route_groups(groups, title))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+app/scan.py
+-----------
+Parallel full-table scans over primary-key ranges.
+
+A single SQLite cursor walks a table on one core, and the Python work per row
+(decoding, aggregating, hashing) runs on that same core. parallel_scan() splits
+each shard's table into key ranges and scans them in a process pool:
+
+    1. Plan: min/max of the key on every shard, cut into equal key ranges,
+       PARTITIONS_PER_WORKER per worker so a dense range cannot hold the scan
+       back (the others keep the workers busy meanwhile).
+    2. Scan: each partition opens its own read-only connection (mode=ro). Under
+       WAL every reader sees one committed snapshot and never blocks or waits
+       on the app's writers. It runs `SELECT columns ... WHERE key in
+       (low, high]` and hands the rows, FETCH_SIZE at a time, to the caller's
+       scan(chunks) function, which returns a partial result.
+    3. Reduce: partial results come back to this process and are folded with
+       the caller's reduce(accumulated, partial) in partition order (shard,
+       then key), so order-sensitive reducers (exports) stay deterministic.
+
+scan and reduce must be module-level functions (they are pickled by name) and
+rows are raw SQLite values: lookup-coded columns (app.lookups) arrive as codes.
+Per-partition rows, time and rows/s are reported through progress() and kept
+in the ScanResult.
+
+In-memory databases cannot be opened from another process, so they, and
+workers=1, run the same partitions one by one in this process.
+
+Workers are spawned, not forked (no copied connections or threads). They start
+with SMS_DATABASE pointing at this process's resolved database and without
+SMS_DATABASE_TEMPLATE, so a worker that imports app.database (through the main
+module or the scan function's module) never re-clones or re-creates the database.
+
+SMS_SCAN_WORKERS sets the default worker count (default: one per core).
+
+Command line (an order-independent checksum, e.g. to compare a table before and
+after a restore or a rebalance):
+    python -m app.scan checksum <table> [--workers N] [--key id]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from app.metrics import table_scan_rows, table_scan_seconds
+
+console = Console()
+
+SCAN_WORKERS = int(os.environ.get("SMS_SCAN_WORKERS", os.cpu_count() or 1))
+PARTITIONS_PER_WORKER = 4
+FETCH_SIZE = 10_000
+
+@dataclass(frozen=True)
+class ScanPartition:
+    shard: int
+    index: int
+    file_name: str
+    # Keys in (low, high]
+    low: int
+    high: int
+
+@dataclass
+class PartitionStats:
+    partition: ScanPartition
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+@dataclass
+class ScanResult:
+    value: object
+    table: str
+    workers: int
+    seconds: float
+    partitions: list[PartitionStats] = field(default_factory=list)
+
+    @property
+    def rows(self) -> int:
+        return sum(stats.rows for stats in self.partitions)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+# --- WORKER SIDE ---
+
+def _read_only_connection(file_name: str) -> sqlite3.Connection:
+    if file_name.startswith("file:"):
+        # Shared-cache in-memory database (only reachable from this process)
+        connection = sqlite3.connect(file_name, uri=True)
+        connection.execute("PRAGMA query_only=ON")
+        return connection
+    return sqlite3.connect(f"{Path(file_name).resolve().as_uri()}?mode=ro", uri=True)
+
+def _scan_partition(partition: ScanPartition, sql: str, parameters: tuple, scan):
+    """Runs scan(chunks) over one key range. Returns (partial result, rows, seconds)."""
+    started = time.perf_counter()
+    rows = 0
+    connection = _read_only_connection(partition.file_name)
+    try:
+        cursor = connection.execute(sql, (partition.low, partition.high, *parameters))
+
+        def chunks():
+            nonlocal rows
+            while chunk := cursor.fetchmany(FETCH_SIZE):
+                rows += len(chunk)
+                yield chunk
+
+        partial = scan(chunks())
+    finally:
+        connection.close()
+    return partial, rows, time.perf_counter() - started
+
+@contextmanager
+def worker_environment(database: str):
+    """
+    The environment spawned workers start with. They import the parent's main module
+    and the target function's module (and so app.database) before running anything of
+    ours: pinned to the parent's database file, without a template, none of them
+    creates or clones a database of its own. Also used by app.user_import.
+    """
+    saved = {name: os.environ.get(name) for name in ("SMS_DATABASE", "SMS_DATABASE_TEMPLATE")}
+    os.environ["SMS_DATABASE"] = database
+    os.environ.pop("SMS_DATABASE_TEMPLATE", None)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+# --- PLANNING ---
+
+def plan_partitions(table: str, key: str = "id", partitions_per_shard: int = PARTITIONS_PER_WORKER) -> list[ScanPartition]:
+    """Equal key ranges covering `table` on every shard; empty shards get none."""
+    # Imported here, not at the top: workers import this module and need none of it
+    from app.database import shard_engines, shard_file_name
+
+    partitions = []
+    for shard in range(len(shard_engines)):
+        with shard_engines[shard].connect() as conn:
+            low, high = conn.exec_driver_sql(f"SELECT min({key}), max({key}) FROM {table}").one()
+        if low is None:
+            continue
+        low -= 1
+        count = max(1, min(partitions_per_shard, high - low))
+        step = -(-(high - low) // count)
+        for index in range(count):
+            partition_high = min(high, low + step)
+            partitions.append(ScanPartition(shard, index, shard_file_name(shard), low, partition_high))
+            low = partition_high
+            if low >= high:
+                break
+    return partitions
+
+# --- EXECUTOR ---
+
+def parallel_scan(table: str, columns: list[str], scan, reduce, initial=None, where: str | None = None,
+                  parameters: tuple = (), key: str = "id", workers: int = SCAN_WORKERS, progress=None) -> ScanResult:
+    """
+    Scans `columns` of `table` on every shard in parallel key ranges (see the module docstring).
+
+    scan(chunks) gets an iterator of row lists for one partition and returns its partial
+    result; reduce(accumulated, partial) folds the partials, starting from `initial`.
+    `where` is an optional SQL condition (with `parameters`) applied in every partition.
+    progress(stats, done, total) is called as each partition finishes.
+    """
+    from app.database import sqlite_file_name, is_memory_database
+
+    started = time.perf_counter()
+    sql = f"SELECT {', '.join(columns)} FROM {table} WHERE {key} > ? AND {key} <= ?"
+    if where:
+        sql += f" AND ({where})"
+
+    in_process = workers <= 1 or is_memory_database(sqlite_file_name)
+    workers = 1 if in_process else workers
+    partitions = plan_partitions(table, key, workers * PARTITIONS_PER_WORKER)
+
+    stats = []
+    # Partials that finished before an earlier partition, held until it is reduced
+    waiting = {}
+    next_position = 0
+    accumulated = initial
+
+    def finished(position: int, partial, rows: int, seconds: float):
+        nonlocal next_position, accumulated
+        stats.append(PartitionStats(partitions[position], rows, seconds))
+        if progress:
+            progress(stats[-1], len(stats), len(partitions))
+        waiting[position] = partial
+        while next_position in waiting:
+            accumulated = reduce(accumulated, waiting.pop(next_position))
+            next_position += 1
+
+    if in_process:
+        for position, partition in enumerate(partitions):
+            finished(position, *_scan_partition(partition, sql, parameters, scan))
+    else:
+        # spawn: workers must not inherit this process's open connections and threads.
+        # Every worker is started by the submits below, inside the adjusted environment.
+        with worker_environment(sqlite_file_name), ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = {
+                pool.submit(_scan_partition, partition, sql, parameters, scan): position
+                for position, partition in enumerate(partitions)
+            }
+            for future in as_completed(futures):
+                finished(futures[future], *future.result())
+
+    seconds = time.perf_counter() - started
+    stats.sort(key=lambda item: (item.partition.shard, item.partition.index))
+    table_scan_rows.labels(table).inc(sum(item.rows for item in stats))
+    table_scan_seconds.labels(table).observe(seconds)
+    return ScanResult(accumulated, table, workers, seconds, stats)
+
+# --- REPORTING ---
+
+def render_scan_stats(result: ScanResult) -> Table:
+    table = Table(
+        title=f"Scan of {result.table}: {result.rows:,} rows in {result.seconds:.2f} s "
+              f"({result.rows_per_second:,.0f} rows/s, {result.workers} worker(s))",
+        show_lines=False
+    )
+    table.add_column("Shard", justify="right")
+    table.add_column("Partition", justify="right")
+    table.add_column("Key range", justify="right", style="dim")
+    table.add_column("Rows", justify="right", style="bold")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Rows/s", justify="right", style="green")
+    for stats in result.partitions:
+        partition = stats.partition
+        table.add_row(
+            str(partition.shard),
+            str(partition.index),
+            f"{partition.low + 1:,} - {partition.high:,}",
+            f"{stats.rows:,}",
+            f"{stats.seconds:.3f}",
+            f"{stats.rows_per_second:,.0f}"
+        )
+    return table
+
+# --- CHECKSUM ---
+
+CHECKSUM_MODULUS = 2 ** 64
+
+def checksum_chunks(chunks) -> tuple[int, int]:
+    """(rows, sum of the rows' CRC32s): the same for the same rows in any order or partitioning."""
+    rows = 0
+    total = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        total += sum(zlib.crc32(repr(row).encode()) for row in chunk)
+    return rows, total % CHECKSUM_MODULUS
+
+def add_checksums(accumulated: tuple[int, int], partial: tuple[int, int]) -> tuple[int, int]:
+    return accumulated[0] + partial[0], (accumulated[1] + partial[1]) % CHECKSUM_MODULUS
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel table scans over primary-key ranges.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    checksum_parser = subparsers.add_parser("checksum", help="Row count and order-independent checksum of a table.")
+    checksum_parser.add_argument("table")
+    checksum_parser.add_argument("--workers", type=int, default=SCAN_WORKERS, help="Worker processes.")
+    checksum_parser.add_argument("--key", default="id", help="Integer primary key column to partition on.")
+    args = parser.parse_args()
+
+    if args.command == "checksum":
+        with console.status(f"Scanning {args.table}...") as status:
+            result = parallel_scan(
+                args.table, ["*"], checksum_chunks, add_checksums, initial=(0, 0), key=args.key, workers=args.workers,
+                progress=lambda stats, done, total: status.update(f"Scanning {args.table}... {done} / {total} partitions")
+            )
+        console.print(render_scan_stats(result))
+        rows, checksum = result.value
+        console.print(f"[bold]{args.table}[/bold]: {rows:,} rows, checksum [green]{checksum:016x}[/green]")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+app/screen.py
+-------------
+Full-screen frames drawn in place, for the menus and table screens.
+
+console.clear() blanks the terminal and then redraws everything, which
+flickers and resends every line (slow over SSH). Screen.draw() instead renders
+the frame to lines and positions the cursor on each row:
+
+* every row it writes is followed by erase-to-end-of-line, and the rows below
+  the frame are erased, so nothing is ever blanked first;
+* with update=True (the caller's previous frame is still on screen and only
+  prompts were drawn under it, e.g. the next page of a pager) rows that did not
+  change are not sent at all.
+
+Parts wrapped in Static are rendered once per terminal width and reused, so
+banners, catalogue tables and profile cards are not rebuilt on every frame.
+
+rich.live.Live is not used: it owns the cursor while running, which the
+questionary prompts drawn under each frame cannot share, and it repaints its
+whole region on every refresh.
+
+Frame times (render + write) and the rows written/skipped are recorded per
+screen in app.metrics (sms_screen_frame_seconds, sms_screen_rows_total).
+"""
+
+import time
+
+from rich.console import Console
+
+from app.metrics import screen_frame_seconds, screen_rows
+
+console = Console()
+
+# Rows kept free under a frame for the prompt and messages drawn below it.
+# A frame taller than the terminal minus this is printed normally (it scrolls),
+# and the next frame is drawn in full.
+PROMPT_ROWS = 12
+
+_CLEAR_FROM_ROW = "\x1b[{row};1H\x1b[J"
+_ROW = "\x1b[{row};1H{line}\x1b[K"
+
+class Static:
+    """A renderable that never changes; its rendered lines are kept per terminal width."""
+
+    def __init__(self, renderable):
+        self.renderable = renderable
+        self._lines: dict[int, list[str]] = {}
+
+    def lines(self, render, width: int) -> list[str]:
+        if width not in self._lines:
+            self._lines[width] = render(self.renderable)
+        return self._lines[width]
+
+class Screen:
+    def __init__(self, target: Console = console):
+        self.console = target
+        # The last frame's rows, while they are known to be on screen unchanged
+        self._rows: list[str] | None = None
+
+    def _render(self, renderable) -> list[str]:
+        with self.console.capture() as capture:
+            self.console.print(renderable)
+        return capture.get().split("\n")[:-1]
+
+    def draw(self, name: str, *parts, update: bool = False):
+        """
+        Draws parts (renderables or Static) top to bottom as one frame. name
+        labels the frame's metrics. Leaves the cursor on the row under the frame.
+        """
+        started = time.perf_counter()
+        width = self.console.width
+        rows = []
+        for part in parts:
+            rows += part.lines(self._render, width) if isinstance(part, Static) else self._render(part)
+
+        previous = self._rows if update else None
+        in_place = self.console.is_terminal and not self.console.legacy_windows
+        if not in_place or len(rows) + PROMPT_ROWS > self.console.height:
+            # Piped output, an old Windows console, or too tall to stay put under a prompt: plain printing, as before
+            self.console.clear()
+            self.console.file.write("\n".join(rows) + "\n")
+            self._rows = None
+            written, unchanged = len(rows), 0
+        else:
+            output = []
+            for index, row in enumerate(rows):
+                if previous is not None and index < len(previous) and previous[index] == row:
+                    continue
+                output.append(_ROW.format(row=index + 1, line=row))
+            output.append(_CLEAR_FROM_ROW.format(row=len(rows) + 1))
+            self.console.file.write("".join(output))
+            self._rows = rows
+            written = len(output) - 1
+            unchanged = len(rows) - written
+        self.console.file.flush()
+
+        screen_frame_seconds.labels(name).observe(time.perf_counter() - started)
+        screen_rows.labels(name, "written").inc(written)
+        screen_rows.labels(name, "unchanged").inc(unchanged)
+
+screen = Screen()
@@ -2,18 +2,31 @@ import questionary
 from questionary import Choice
 import re
 from datetime import datetime, timedelta
+from functools import cache
 
-from rich.console import Console
+from rich.console import Console, Group
 from rich.panel import Panel
 from rich.table import Table
 from rich import box
 
-from sqlmodel import select, Session
-
-from app.database import engine
-from app.models import ServiceRequest, User
-from app.utils import paginate_results, validate_email, validate_contact, validate_password_complexity
-from app.profile_ui import render_profile_dashboard
+from sqlmodel import select, Session, func
+
+from app.database import engine, engine_for_customer, is_sharded
+from app.models import ServiceRequest, ServiceRequestArchive, User
+from app.read_models import OrderHistoryRow, select_rows, as_rows
+from app.utils import PAGE_SIZE, paginate_results, validate_email, validate_contact, validate_password_complexity
+from app.profile_ui import render_profile_dashboard, render_order_summary
+from app.events import record_order_created
+from app.summary import apply_order_created, get_summary
+from app.dispatch import enqueue_dispatch
+from app.group_commit import writer_for
+from app.sharding import reserve_order_id, release_order_ids
+from app.search_index import user_index
+from app.lookups import SERVICE_NAMES
+from app.addresses import route_keys
+from app.metrics import bookings_created, screen_render_seconds
+from app.passwords import password_pool, PasswordPoolBusy
+from app.screen import screen, Static
 
 console = Console()
 
@@ -66,19 +79,65 @@ def validate_date_input(date_text: str):
 # --- DATABASE FUNCTIONS ---
 def save_request_to_db(request_data: ServiceRequest):
     """
-    Saves the request to the database.
-    Relies on SQLModel/Database to throw an error if ID exists.
+    Saves the request to the database, on the customer's shard, through that shard's
+    group-commit writer (app.group_commit): concurrent bookings share one commit.
+    Raises IntegrityError if the ID already exists, on any shard.
     """
-    with Session(engine) as session:
+    request_data.sqlmodel_update(route_keys(request_data.address, request_data.date_slot))
+    shard_engine = engine_for_customer(request_data.customer_id)
+    # The dispatch queue and the order directory live on shard 0; there both join the booking's transaction
+    dispatch_in_transaction = shard_engine is engine
+    reserve_separately = is_sharded() and not dispatch_in_transaction
+
+    if reserve_separately:
+        # Claim the ID across all shards before writing the order to its own shard
+        writer_for(engine).execute(lambda session: reserve_order_id(session, request_data.id, request_data.customer_id))
+
+    def book(session: Session) -> ServiceRequest:
+        if is_sharded() and dispatch_in_transaction:
+            reserve_order_id(session, request_data.id, request_data.customer_id)
         session.add(request_data)
-        session.commit()
-        session.refresh(request_data)
+        # Inside this operation's savepoint: a duplicate ID fails here, and the ID is known below
+        session.flush()
+        # Same transaction as the insert, so the event feed never misses a booking
+        record_order_created(session, request_data)
+        apply_order_created(session, request_data)
+        if dispatch_in_transaction:
+            enqueue_dispatch(request_data, session=session)
         return request_data
 
+    try:
+        writer_for(shard_engine).execute(book)
+    except Exception:
+        if reserve_separately:
+            writer_for(engine).execute(lambda session: release_order_ids(session, order_id=request_data.id))
+        raise
+    bookings_created.labels(request_data.service_name).inc()
+
+    # Hand the order to the vendor dispatch workers. If this is lost (crash),
+    # enqueue_pending_orders() picks the order up on the next dispatch run.
+    if not dispatch_in_transaction:
+        enqueue_dispatch(request_data)
+    return request_data
+
+def fetch_history_page(customer_id: int, page: int = 1, page_size: int = PAGE_SIZE) -> tuple[list[OrderHistoryRow], int]:
+    """
+    One page of a customer's live order history and the total number of live orders:
+    the same count and page queries the history screen runs, without the UI.
+    """
+    with Session(engine_for_customer(customer_id)) as session:
+        statement = select_rows(ServiceRequest, OrderHistoryRow).where(ServiceRequest.customer_id == customer_id)
+        total = session.exec(select(func.count()).select_from(statement.subquery())).one()
+        rows = session.exec(statement.offset((page - 1) * page_size).limit(page_size)).all()
+    return as_rows(rows, OrderHistoryRow), total
+
 # --- HELPER UI FUNCTIONS ---
-def display_vendor_options():
+@cache
+@screen_render_seconds.labels("vendor_options").time()
+def vendor_options_table() -> Static:
     """
-    Renders a comparison table of available vendors.
+    Builds the comparison table of available vendors.
+    VENDOR_DATA never changes, so it is built (and rendered, see app.screen) once.
     """
     table = Table(
         title="Available Service Partners",
@@ -107,8 +166,7 @@ def display_vendor_options():
             v['experience']
         )
 
-    console.print(table)
-    console.print("\n") # Spacing
+    return Static(Group(table, "\n"))  # Spacing
 
 # --- UI FUNCTIONS ---
 def create_service_request_ui(current_user: User):
@@ -118,7 +176,7 @@ def create_service_request_ui(current_user: User):
     # 1. Select Service
     service_type = questionary.select(
         "Select Service Type:",
-        choices=["AC Repair", "TV Repair", "Fridge Repair", "Washing Machine Repair"]
+        choices=list(SERVICE_NAMES)
     ).ask()
     if not service_type: return
 
@@ -151,11 +209,12 @@ def create_service_request_ui(current_user: User):
     if not address: return
 
     # 5. Vendor Selection (ENHANCED)
-    console.clear() # Clear screen to focus on the comparison
-    console.print(Panel(f"Step 5: Select Vendor for [bold]{service_type}[/bold]", style="cyan"))
-
-    # A. Show the Comparison Table
-    display_vendor_options()
+    # A. Show the Comparison Table on a screen of its own
+    screen.draw(
+        "vendor_options",
+        Panel(f"Step 5: Select Vendor for [bold]{service_type}[/bold]", style="cyan"),
+        vendor_options_table()
+    )
 
     # B. Build the 'Rich' Choices
     # We use questionary.Choice to display a string but return the Dictionary object
@@ -209,9 +268,10 @@ def create_service_request_ui(current_user: User):
 
     questionary.press_any_key_to_continue().ask()
 
-def render_history_table(results):
+@screen_render_seconds.labels("order_history").time()
+def render_history_table(results) -> Table:
     """
-    Draws the table for User Order History.
+    Builds the table for User Order History.
     Now displays ALL fields from the ServiceRequest table.
     """
     table = Table(show_lines=True)
@@ -244,22 +304,28 @@ def render_history_table(results):
             created_date
         )
 
-    console.print(table)
+    return table
 
 def view_order_history_ui(current_user: User):
     """
     Fetches and displays the service history using the shared Pagination Engine.
+    Archived (old, finished) orders follow the live ones when the customer pages past them.
     """
-    with Session(engine) as session:
+    with Session(engine_for_customer(current_user.id)) as session:
         # We define the query, filtering ONLY for this customer
-        statement = select(ServiceRequest).where(ServiceRequest.customer_id == current_user.id)
+        # Only the rendered columns are selected (see app.read_models)
+        statement = select_rows(ServiceRequest, OrderHistoryRow).where(ServiceRequest.customer_id == current_user.id)
 
         # Hand off control to the utility
         paginate_results(
             session=session,
             statement=statement,
             render_func=render_history_table,
-            title=f"Order History for {current_user.user_name}"
+            title=f"Order History for {current_user.user_name}",
+            archive_statement=select_rows(ServiceRequestArchive, OrderHistoryRow).where(ServiceRequestArchive.customer_id == current_user.id),
+            # Lifetime totals come from the rollup row, not from counting the orders
+            header=render_order_summary(get_summary(current_user.id)),
+            row_type=OrderHistoryRow
         )
 
 
@@ -268,10 +334,13 @@ def update_profile_ui(current_user: User):
     Allows the user to update their profile details.
     Delegates visual rendering to app.profile_ui.
     """
+    redraw = False
     while True:
         # 1. RENDER THE UI (Visual Separation)
-        # This function handles the clear screen, random themes, and avatar drawing.
-        render_profile_dashboard(current_user)
+        # This function handles the random themes and avatar drawing; after the first
+        # frame only the rows that changed (the new look, the edited field) are redrawn.
+        render_profile_dashboard(current_user, get_summary(current_user.id), update=redraw)
+        redraw = True
 
         # 2. MENU LOGIC
         field_choice = questionary.select(
@@ -289,7 +358,7 @@ def update_profile_ui(current_user: User):
             break
 
         # 3. DATABASE LOGIC (Transactional)
-        with Session(engine) as session:
+        with Session(engine_for_customer(current_user.id)) as session:
             # Fetch fresh user record
             user_in_db = session.get(User, current_user.id)
 
@@ -297,6 +366,9 @@ def update_profile_ui(current_user: User):
                 console.print("[red]Error: User record not found.[/red]")
                 return
 
+            # Kept to move the admin search index entries after the commit
+            old_email, old_contact = user_in_db.email, user_in_db.contact_number
+
             # --- INPUT & UPDATE HANDLERS ---
 
             if field_choice == "Update Email":
@@ -351,14 +423,24 @@ def update_profile_ui(current_user: User):
                     questionary.press_any_key_to_continue().ask()
                     continue
 
-                user_in_db.password = val1
-                current_user.password = val1
+                # Stored as a scrypt hash, computed on the password pool (app.passwords)
+                try:
+                    with console.status("Saving password..."):
+                        new_hash = password_pool.hash(val1)
+                except PasswordPoolBusy:
+                    console.print("[bold yellow]The server is busy checking other passwords. Please try again.[/bold yellow]")
+                    questionary.press_any_key_to_continue().ask()
+                    continue
+                user_in_db.password = new_hash
+                current_user.password = new_hash
 
             # 4. COMMIT
             try:
                 session.add(user_in_db)
                 session.commit()
                 session.refresh(user_in_db)
+                user_index.update_field(user_in_db.id, "email", old_email, user_in_db.email)
+                user_index.update_field(user_in_db.id, "contact_number", old_contact, user_in_db.contact_number)
 
                 # We don't need a huge success panel here because the loop restarts
                 # and the new data appears instantly on the "Identity Card".
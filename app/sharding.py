@@ -0,0 +1,333 @@
+"""
+app/sharding.py
+---------------
+Cross-shard helpers built on the routing in app.database.
+
+Per-customer screens talk to exactly one shard through engine_for_customer().
+Admin screens use ShardedSession, which runs the same statement on every shard
+in parallel and merge-sorts the partial results, so the shared pager in
+app.utils can page through all customers as if they were one table.
+
+Also provides the username and order directory helpers and the rebalance tool:
+    python -m app.sharding rebalance <new shard count>
+
+Rebalancing moves a customer's order events (app.events) with them. The
+target shard appends copies of the history under new event IDs, so its
+consumers see those events again, as new ones. The source shard logs a 'moved'
+event per order before deleting the old ones, so its consumers (the column
+snapshot, the order board) drop the orders there. Event offsets stay per
+shard and are not rewritten. External feeds (python -m app.events feed) must
+be drained before a rebalance and will then re-emit the moved history from the
+new shard. A running order board only follows the old layout, so restart the
+app afterwards.
+"""
+
+import argparse
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from rich.console import Console
+from sqlalchemy import delete as core_delete, select as core_select, insert as core_insert
+from sqlmodel import Session, SQLModel, select, delete, func, col
+
+from app.database import (
+    engine, shard_engines, is_sharded, make_engine, shard_file_name,
+    sqlite_file_name, is_memory_database, SHARD_DIR, SHARD_TABLES,
+)
+from app.models import (
+    User, ServiceRequest, ServiceRequestArchive, UserDirectory, OrderDirectory, CustomerSummary, OrderEvent,
+)
+from app.lookups import seed_lookup_tables
+from app.events import record_bulk_events
+
+console = Console()
+
+# Every table holding per-customer rows, with the column that holds the customer ID.
+# The rebalance tool moves these together so a customer never spans two shards.
+CUSTOMER_TABLES = [
+    (User.__table__, "id"),
+    (ServiceRequest.__table__, "customer_id"),
+    (ServiceRequestArchive.__table__, "customer_id"),
+    (CustomerSummary.__table__, "customer_id"),
+]
+
+REBALANCE_BATCH_SIZE = 200
+# Usernames per IN (...) lookup, well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+# --- SCATTER-GATHER ---
+
+class ShardedSession:
+    """
+    Read-only fan-out over all shards, for admin views.
+
+    Statements passed to fetch_page() must be ordered, and sort_key must return
+    the same ordering for a result row; each shard returns its first
+    offset + limit rows and the partial lists are merged with heapq.merge.
+    """
+
+    def __init__(self, sort_key=None):
+        self.sort_key = sort_key
+        self._pool = ThreadPoolExecutor(max_workers=len(shard_engines), thread_name_prefix="sms-shard")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._pool.shutdown(wait=False)
+
+    def _on_every_shard(self, work) -> list:
+        """Runs work(session) on every shard in parallel; results are in shard order."""
+        def run(shard_engine):
+            with Session(shard_engine) as session:
+                return work(session)
+
+        if len(shard_engines) == 1:
+            return [run(shard_engines[0])]
+        return list(self._pool.map(run, shard_engines))
+
+    def count(self, statement) -> int:
+        count_statement = select(func.count()).select_from(statement.subquery())
+        return sum(self._on_every_shard(lambda session: session.exec(count_statement).one()))
+
+    def fetch_page(self, statement, offset: int, limit: int) -> list:
+        if len(shard_engines) == 1:
+            return self._on_every_shard(lambda session: session.exec(statement.offset(offset).limit(limit)).all())[0]
+
+        # A global page can only contain rows from the first offset + limit of each shard
+        partials = self._on_every_shard(lambda session: session.exec(statement.limit(offset + limit)).all())
+        merged = heapq.merge(*partials, key=self.sort_key)
+        return list(islice(merged, offset, offset + limit))
+
+    def all(self, statement) -> list:
+        partials = self._on_every_shard(lambda session: session.exec(statement).all())
+        rows = [row for partial in partials for row in partial]
+        return sorted(rows, key=self.sort_key) if self.sort_key else rows
+
+# --- USERNAME DIRECTORY ---
+
+def user_name_taken(user_name: str) -> bool:
+    with Session(engine) as session:
+        if is_sharded():
+            return session.get(UserDirectory, user_name) is not None
+        return session.exec(select(User).where(User.user_name == user_name)).first() is not None
+
+def taken_user_names(user_names: list[str], chunk_size: int = LOOKUP_CHUNK_SIZE) -> set[str]:
+    """The subset of user_names already registered, a few IN (...) lookups on the unique index / directory."""
+    column = UserDirectory.user_name if is_sharded() else User.user_name
+    taken = set()
+    with Session(engine) as session:
+        for start in range(0, len(user_names), chunk_size):
+            chunk = user_names[start:start + chunk_size]
+            taken.update(session.exec(select(column).where(col(column).in_(chunk))).all())
+    return taken
+
+def add_to_directory(user_name: str, customer_id: int):
+    """Reserves a username for a customer. Raises IntegrityError if it is already taken."""
+    if not is_sharded():
+        return
+    with Session(engine) as session:
+        session.add(UserDirectory(user_name=user_name, customer_id=customer_id))
+        session.commit()
+
+def remove_from_directory(user_name: str):
+    if not is_sharded():
+        return
+    with Session(engine) as session:
+        session.exec(delete(UserDirectory).where(UserDirectory.user_name == user_name))
+        session.commit()
+
+# --- ORDER DIRECTORY ---
+# Order IDs are random (models.generate_id) and drawn on each customer's shard, so with
+# several shards the ID is reserved here first; the primary key rejects a duplicate.
+
+def reserve_order_id(session: Session, order_id: int, customer_id: int):
+    """Stages an order ID's directory entry on a shard 0 session; the flush raises IntegrityError if it is taken."""
+    session.add(OrderDirectory(order_id=order_id, customer_id=customer_id))
+    session.flush()
+
+def release_order_ids(session: Session, customer_id: int | None = None, order_id: int | None = None):
+    """Stages the removal of one order ID, or of every order ID of a customer, on a shard 0 session."""
+    statement = delete(OrderDirectory)
+    if order_id is not None:
+        statement = statement.where(OrderDirectory.order_id == order_id)
+    if customer_id is not None:
+        statement = statement.where(OrderDirectory.customer_id == customer_id)
+    session.exec(statement)
+
+def rebuild_order_directory(engines: list) -> int:
+    """
+    Rebuilds the order directory on shard 0 from the live and archived orders of
+    every shard in `engines`. Returns the number of order IDs found on more than
+    one shard (written before the directory existed); those keep the first entry.
+    """
+    directory_table = OrderDirectory.__table__
+    # Read first: shard 0 is one of the sources, and the write below holds its lock
+    entries = []
+    for shard_engine in engines:
+        with shard_engine.connect() as conn:
+            for table in (ServiceRequest.__table__, ServiceRequestArchive.__table__):
+                entries += conn.execute(core_select(table.c.id, table.c.customer_id)).all()
+
+    with engine.begin() as catalog:
+        catalog.execute(core_delete(directory_table))
+        inserted = 0
+        if entries:
+            inserted = catalog.execute(
+                core_insert(directory_table).prefix_with("OR IGNORE"),
+                [{"order_id": order_id, "customer_id": customer_id} for order_id, customer_id in entries]
+            ).rowcount
+    return len(entries) - inserted
+
+# --- REBALANCE ---
+
+def _existing_shard_files() -> dict[int, str]:
+    """Every shard of the current database, including ones beyond SMS_SHARD_COUNT left by an earlier layout."""
+    files = {index: shard_file_name(index) for index in range(len(shard_engines))}
+    if is_memory_database(sqlite_file_name):
+        return files
+    # Shard files are named by shard_file_name(), which differs for the default database
+    # and any other target: glob its name for a marker index with the index as a wildcard
+    marker = "987654321"
+    sample = Path(shard_file_name(int(marker)))
+    prefix, _, suffix = sample.name.partition(marker)
+    for path in sample.parent.glob(f"{prefix}*{suffix}"):
+        index = path.name[len(prefix):len(path.name) - len(suffix)]
+        if index.isdigit():
+            files[int(index)] = str(path)
+    return files
+
+def rebalance(new_count: int, batch_size: int = REBALANCE_BATCH_SIZE, progress=None) -> int:
+    """
+    Moves every customer (User + all their orders and order events) onto shard
+    customer_id % new_count, then rebuilds the username and order directories on shard 0.
+
+    Each batch is first copied (INSERT OR REPLACE) to its target shard and only then
+    deleted from the source, so an interrupted run leaves duplicates at worst,
+    never lost rows; running it again finishes the job. Events have no natural key,
+    so they are copied only for customers not yet on the target.
+
+    Returns the number of customers moved.
+    """
+    SHARD_DIR.mkdir(parents=True, exist_ok=True)
+    engines = {0: engine}
+    def get_engine(index):
+        if index not in engines:
+            engines[index] = make_engine(shard_file_name(index))
+            SQLModel.metadata.create_all(engines[index], tables=SHARD_TABLES)
+            seed_lookup_tables(engines[index])
+        return engines[index]
+
+    for index in range(new_count):
+        get_engine(index)
+
+    user_table = User.__table__
+    event_table = OrderEvent.__table__
+    # Copies get new IDs on the target; earlier 'moved' events stay behind
+    event_columns = [column for column in event_table.c if column.name != "id"]
+    moved = 0
+
+    # 1. Move misplaced customers off every shard file that exists today
+    for source_index in sorted(_existing_shard_files()):
+        source = get_engine(source_index)
+        last_id = 0
+
+        while True:
+            with source.connect() as conn:
+                customer_ids = conn.execute(
+                    core_select(user_table.c.id)
+                    .where(user_table.c.id > last_id)
+                    .where((user_table.c.id % new_count) != source_index)
+                    .order_by(user_table.c.id)
+                    .limit(batch_size)
+                ).scalars().all()
+            if not customer_ids:
+                break
+            last_id = customer_ids[-1]
+
+            by_target = {}
+            for customer_id in customer_ids:
+                by_target.setdefault(customer_id % new_count, []).append(customer_id)
+
+            for target_index, ids in by_target.items():
+                # A. Copy to the target shard (idempotent)
+                with source.connect() as src, get_engine(target_index).begin() as dst:
+                    arrived = set(dst.execute(core_select(user_table.c.id).where(user_table.c.id.in_(ids))).scalars())
+                    for table, customer_column in CUSTOMER_TABLES:
+                        rows = src.execute(core_select(table).where(table.c[customer_column].in_(ids))).mappings().all()
+                        if rows:
+                            dst.execute(core_insert(table).prefix_with("OR REPLACE"), [dict(row) for row in rows])
+
+                    new_arrivals = [customer_id for customer_id in ids if customer_id not in arrived]
+                    if new_arrivals:
+                        events = src.execute(
+                            core_select(*event_columns)
+                            .where(event_table.c.customer_id.in_(new_arrivals), event_table.c.event_type != "moved")
+                            .order_by(event_table.c.id)
+                        ).mappings().all()
+                        if events:
+                            dst.execute(core_insert(event_table), [dict(event) for event in events])
+
+                # B. Remove from the source shard. The 'moved' events are logged before the old
+                # ones are deleted, so the highest event ID never goes down and no ID is reused
+                # below a consumer's offset.
+                with Session(source) as session:
+                    last_event_id = session.exec(select(func.max(OrderEvent.id))).one() or 0
+                    for model in (ServiceRequest, ServiceRequestArchive):
+                        record_bulk_events(session, model, col(model.customer_id).in_(ids), "moved")
+                    session.exec(delete(OrderEvent).where(
+                        col(OrderEvent.customer_id).in_(ids), col(OrderEvent.id) <= last_event_id
+                    ))
+                    for table, customer_column in CUSTOMER_TABLES:
+                        session.exec(core_delete(table).where(table.c[customer_column].in_(ids)))
+                    session.commit()
+
+                moved += len(ids)
+                if progress:
+                    progress(moved)
+
+    # 2. Rebuild the username directory from the new layout
+    # (read first: shard 0 is one of the sources, and the write below holds its lock)
+    directory_table = UserDirectory.__table__
+    entries = []
+    if new_count > 1:
+        for index in range(new_count):
+            with get_engine(index).connect() as conn:
+                entries += conn.execute(core_select(user_table.c.user_name, user_table.c.id)).all()
+    with engine.begin() as catalog:
+        catalog.execute(core_delete(directory_table))
+        if entries:
+            catalog.execute(
+                core_insert(directory_table),
+                [{"user_name": name, "customer_id": customer_id} for name, customer_id in entries]
+            )
+
+    # 3. The order directory maps to customers, not shards, but is only kept while sharded
+    rebuild_order_directory([get_engine(index) for index in range(new_count)] if new_count > 1 else [])
+
+    return moved
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard maintenance for the SMS database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebalance_parser = subparsers.add_parser("rebalance", help="Redistribute customers across a new number of shards.")
+    rebalance_parser.add_argument("shard_count", type=int)
+    args = parser.parse_args()
+
+    if args.command == "rebalance":
+        if args.shard_count < 1:
+            console.print("[bold red]Error:[/bold red] Shard count must be at least 1.")
+            return
+        with console.status("Rebalancing shards...") as status:
+            moved = rebalance(args.shard_count, progress=lambda n: status.update(f"Rebalancing shards... {n} customers moved"))
+        console.print(
+            f"[green]Moved {moved} customer(s).[/green] "
+            f"Start the app with SMS_SHARD_COUNT={args.shard_count} to use the new layout."
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+app/summary.py
+--------------
+Per-customer order rollups (the CustomerSummary table).
+
+Every write path that changes an order calls one of the apply_* helpers inside
+its own transaction, so the summary commits (or rolls back) together with the
+order and the history screen can show lifetime totals with one session.get().
+
+    booking          -> apply_order_created()
+    status / vendor  -> apply_order_changed()   (admin status change, dispatch)
+    customer removed -> delete_summary()
+
+Archiving moves orders between tables without changing them, so it leaves the
+summary alone. rebuild_summaries() recomputes everything from the order tables
+(after seeding, a restore, or for databases that predate the table):
+    python -m app.summary rebuild
+"""
+
+import argparse
+import json
+from datetime import datetime
+
+from rich.console import Console
+from sqlmodel import Session, select, delete, func
+
+from app.database import engine_for_customer, shard_engines
+from app.models import CustomerSummary, ServiceRequest, ServiceRequestArchive, ServiceRequestBase
+
+console = Console()
+
+STATUS_COLUMNS = {
+    "Pending": "pending_count",
+    "In Progress": "in_progress_count",
+    "Completed": "completed_count",
+    "Cancelled": "cancelled_count",
+}
+# Orders in these states count towards the status totals only, not spend or vendor preference
+UNBILLED_STATUSES = ("Cancelled",)
+
+# --- INCREMENTAL UPDATES (called inside the caller's transaction) ---
+
+def _summary_for(session: Session, customer_id: int) -> CustomerSummary:
+    # Flushing first makes the order write take SQLite's write lock before we read,
+    # so two bookings for the same customer can't both read the old counts.
+    session.flush()
+    return session.get(CustomerSummary, customer_id) or CustomerSummary(customer_id=customer_id)
+
+def _apply(summary: CustomerSummary, status: str, amount: int, vendor_name: str, sign: int):
+    """Adds (sign=1) or removes (sign=-1) one order's contribution."""
+    column = STATUS_COLUMNS.get(status)
+    if column:
+        setattr(summary, column, getattr(summary, column) + sign)
+
+    if status in UNBILLED_STATUSES:
+        return
+
+    summary.total_amount += sign * amount
+    vendor_counts = json.loads(summary.vendor_counts)
+    vendor_counts[vendor_name] = vendor_counts.get(vendor_name, 0) + sign
+    if vendor_counts[vendor_name] <= 0:
+        del vendor_counts[vendor_name]
+    summary.vendor_counts = json.dumps(vendor_counts, sort_keys=True)
+    summary.preferred_vendor = _preferred_vendor(vendor_counts)
+
+def _preferred_vendor(vendor_counts: dict[str, int]) -> str | None:
+    # Most orders wins; ties go to the alphabetically first name so the result is stable
+    if not vendor_counts:
+        return None
+    return min(vendor_counts, key=lambda name: (-vendor_counts[name], name))
+
+def apply_order_created(session: Session, order: ServiceRequestBase):
+    summary = _summary_for(session, order.customer_id)
+    _apply(summary, order.status, order.amount, order.vendor_name, 1)
+
+    created_at = order.created_at or datetime.now()
+    if summary.first_order_at is None or created_at < summary.first_order_at:
+        summary.first_order_at = created_at
+    if summary.last_order_at is None or created_at > summary.last_order_at:
+        summary.last_order_at = created_at
+
+    summary.updated_at = datetime.now()
+    session.add(summary)
+
+def apply_order_changed(session: Session, order: ServiceRequestBase, old_status: str, old_amount: int | None = None, old_vendor: str | None = None):
+    """Moves one order's contribution from its old status/amount/vendor to the current ones."""
+    summary = _summary_for(session, order.customer_id)
+    _apply(
+        summary,
+        old_status,
+        order.amount if old_amount is None else old_amount,
+        order.vendor_name if old_vendor is None else old_vendor,
+        -1
+    )
+    _apply(summary, order.status, order.amount, order.vendor_name, 1)
+
+    summary.updated_at = datetime.now()
+    session.add(summary)
+
+def delete_summary(session: Session, customer_id: int):
+    session.exec(delete(CustomerSummary).where(CustomerSummary.customer_id == customer_id))
+
+# --- READ ---
+
+def get_summary(customer_id: int) -> CustomerSummary | None:
+    """Single primary-key lookup on the customer's shard."""
+    with Session(engine_for_customer(customer_id)) as session:
+        return session.get(CustomerSummary, customer_id)
+
+# --- REBUILD ---
+
+def _rebuild_shard(shard_engine) -> int:
+    summaries: dict[int, CustomerSummary] = {}
+
+    with Session(shard_engine) as session:
+        for model in (ServiceRequest, ServiceRequestArchive):
+            # One row per (customer, status, vendor); the aggregation happens in SQLite
+            rows = session.exec(
+                select(
+                    model.customer_id, model.status, model.vendor_name,
+                    func.count(), func.sum(model.amount),
+                    func.min(model.created_at), func.max(model.created_at)
+                ).group_by(model.customer_id, model.status, model.vendor_name)
+            ).all()
+
+            for customer_id, status, vendor_name, count, amount, first_at, last_at in rows:
+                summary = summaries.setdefault(customer_id, CustomerSummary(customer_id=customer_id))
+                column = STATUS_COLUMNS.get(status)
+                if column:
+                    setattr(summary, column, getattr(summary, column) + count)
+                if status not in UNBILLED_STATUSES:
+                    summary.total_amount += amount
+                    vendor_counts = json.loads(summary.vendor_counts)
+                    vendor_counts[vendor_name] = vendor_counts.get(vendor_name, 0) + count
+                    summary.vendor_counts = json.dumps(vendor_counts, sort_keys=True)
+                if summary.first_order_at is None or first_at < summary.first_order_at:
+                    summary.first_order_at = first_at
+                if summary.last_order_at is None or last_at > summary.last_order_at:
+                    summary.last_order_at = last_at
+
+        for summary in summaries.values():
+            summary.preferred_vendor = _preferred_vendor(json.loads(summary.vendor_counts))
+
+        # Replace the whole table in one transaction; readers see the old rows until commit
+        session.exec(delete(CustomerSummary))
+        session.add_all(summaries.values())
+        session.commit()
+
+    return len(summaries)
+
+def rebuild_summaries() -> int:
+    """Recomputes every customer's summary on every shard. Returns the number of customers."""
+    return sum(_rebuild_shard(shard_engine) for shard_engine in shard_engines)
+
+def ensure_summaries() -> int:
+    """
+    Rebuilds any shard whose summary table is empty while it holds orders
+    (a database created before summaries existed). Cheap to call at startup.
+    """
+    rebuilt = 0
+    for shard_engine in shard_engines:
+        with Session(shard_engine) as session:
+            has_summaries = session.exec(select(CustomerSummary.customer_id).limit(1)).first() is not None
+            has_orders = any(
+                session.exec(select(model.id).limit(1)).first() is not None
+                for model in (ServiceRequest, ServiceRequestArchive)
+            )
+        if has_orders and not has_summaries:
+            rebuilt += _rebuild_shard(shard_engine)
+    return rebuilt
+
+# --- COMMAND LINE ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-customer order summaries.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="Recompute every summary from the order tables.")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        with console.status("Rebuilding customer summaries..."):
+            customers = rebuild_summaries()
+        console.print(f"[green]Rebuilt summaries for {customers} customer(s).[/green]")
+
+if __name__ == "__main__":
+    main()
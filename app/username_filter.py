@@ -0,0 +1,202 @@
+"""
+app/username_filter.py
+----------------------
+Counting Bloom filter over User.user_name, for the registration screen.
+
+The username prompt validates on every keystroke. A filter miss means the name
+is definitely free, so the prompt accepts it with no database read at all; only
+a probable hit (taken, or a ~1% false positive) is confirmed against the unique
+index / username directory. Counters instead of bits let remove_user_ui take
+names back out.
+
+The filter is built at startup by streaming every shard and is saved to
+FILTER_FILE on exit. The file header stores the number of names and the sum of
+their user IDs; on the next start these are compared with one aggregate query
+per shard, and any mismatch (crash before saving, seeder run, restore from a
+backup, another process registering) triggers a rebuild.
+
+A stale filter can only cause a false "available" on the prompt; the insert
+itself is still guarded by the unique index and the directory primary key.
+"""
+
+import atexit
+import hashlib
+import math
+import os
+import struct
+import threading
+from pathlib import Path
+
+from sqlmodel import Session, select, func
+
+from app.database import shard_engines, sqlite_file_name, is_memory_database, DEFAULT_DATABASE
+from app.models import User
+
+def _filter_file() -> Path | None:
+    # Saved next to the database it describes; an in-memory database is rebuilt every run
+    if is_memory_database(sqlite_file_name):
+        return None
+    if sqlite_file_name == DEFAULT_DATABASE:
+        return Path("data/username_filter.bin")
+    return Path(sqlite_file_name).with_suffix(".username_filter.bin")
+
+FILTER_FILE = _filter_file()
+FALSE_POSITIVE_RATE = 0.01
+MIN_CAPACITY = 10_000
+GROWTH_FACTOR = 2  # capacity = names at build time * GROWTH_FACTOR
+LOAD_BATCH_SIZE = 5000
+
+_MAGIC = b"SMUF"
+_VERSION = 1
+# magic, version, hash count, counter count, name count, sum of user IDs
+_HEADER = struct.Struct("<4sHHQQQ")
+_COUNTER_MAX = 255
+
+class CountingBloomFilter:
+    """One saturating 8-bit counter per slot, k slots per name via double hashing."""
+
+    def __init__(self, capacity: int, false_positive_rate: float = FALSE_POSITIVE_RATE):
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.counters = bytearray(self.size)
+        self.item_count = 0
+        self.id_sum = 0
+
+    @property
+    def capacity(self) -> int:
+        return int(self.size * math.log(2) ** 2 / -math.log(FALSE_POSITIVE_RATE))
+
+    def _slots(self, name: str):
+        digest = hashlib.blake2b(name.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, name: str, user_id: int):
+        for slot in self._slots(name):
+            if self.counters[slot] < _COUNTER_MAX:
+                self.counters[slot] += 1
+        self.item_count += 1
+        self.id_sum += user_id
+
+    def remove(self, name: str, user_id: int):
+        # A saturated counter no longer knows its true count, so it is never decremented
+        for slot in self._slots(name):
+            if 0 < self.counters[slot] < _COUNTER_MAX:
+                self.counters[slot] -= 1
+        self.item_count -= 1
+        self.id_sum -= user_id
+
+    def might_contain(self, name: str) -> bool:
+        return all(self.counters[slot] for slot in self._slots(name))
+
+    def expected_false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hash_count * self.item_count / self.size)) ** self.hash_count
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(_MAGIC, _VERSION, self.hash_count, self.size, self.item_count, self.id_sum)
+        return header + bytes(self.counters)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CountingBloomFilter | None":
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, hash_count, size, item_count, id_sum = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION or len(data) != _HEADER.size + size:
+            return None
+        bloom = cls.__new__(cls)
+        bloom.size = size
+        bloom.hash_count = hash_count
+        bloom.counters = bytearray(data[_HEADER.size:])
+        bloom.item_count = item_count
+        bloom.id_sum = id_sum
+        return bloom
+
+def _database_checksum() -> tuple[int, int]:
+    """(number of users, sum of their IDs) across every shard."""
+    count, id_sum = 0, 0
+    for shard_engine in shard_engines:
+        with Session(shard_engine) as session:
+            shard_count, shard_sum = session.exec(select(func.count(), func.total(User.id))).one()
+        count += shard_count
+        id_sum += int(shard_sum)
+    return count, id_sum
+
+class UsernameFilter:
+    """Process-wide filter with load/build/save and the register/remove hooks."""
+
+    def __init__(self, path: Path | None = FILTER_FILE):
+        self.path = path
+        self.bloom: CountingBloomFilter | None = None
+        self.rebuilt = False
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def build(self) -> CountingBloomFilter:
+        """Streams every username from every shard into a fresh filter."""
+        count, _ = _database_checksum()
+        bloom = CountingBloomFilter(capacity=max(MIN_CAPACITY, count * GROWTH_FACTOR))
+        for shard_engine in shard_engines:
+            with Session(shard_engine) as session:
+                result = session.exec(
+                    select(User.user_name, User.id).execution_options(yield_per=LOAD_BATCH_SIZE)
+                )
+                for user_name, user_id in result:
+                    bloom.add(user_name, user_id)
+        return bloom
+
+    def load(self):
+        """Uses the saved filter if it still matches the database, otherwise rebuilds and saves."""
+        saved = None
+        if self.path and self.path.exists():
+            saved = CountingBloomFilter.from_bytes(self.path.read_bytes())
+
+        count, id_sum = _database_checksum()
+        if saved and (saved.item_count, saved.id_sum) == (count, id_sum) and count <= saved.capacity:
+            bloom, self.rebuilt = saved, False
+        else:
+            bloom, self.rebuilt = self.build(), True
+
+        with self._lock:
+            self.bloom = bloom
+            self._dirty = self.rebuilt
+        self.save()
+
+    def ensure_loaded(self):
+        if self.bloom is None:
+            self.load()
+
+    def save(self):
+        """Writes the filter atomically (temp file + rename), only if it changed."""
+        with self._lock:
+            if self.path is None or self.bloom is None or not self._dirty:
+                return
+            data = self.bloom.to_bytes()
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, self.path)
+
+    def might_contain(self, user_name: str) -> bool:
+        # Without a filter every name is a "probable hit", i.e. always checked in the database
+        if self.bloom is None:
+            return True
+        return self.bloom.might_contain(user_name)
+
+    # Hooks; call only after the change is committed
+
+    def add(self, user_name: str, user_id: int):
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.add(user_name, user_id)
+                self._dirty = True
+
+    def remove(self, user_name: str, user_id: int):
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.remove(user_name, user_id)
+                self._dirty = True
+
+username_filter = UsernameFilter()
+atexit.register(username_filter.save)
@@ -1,52 +1,77 @@
 import math
-import re
 
 import questionary
+from sqlalchemy import tuple_
 from sqlmodel import Session, select, func
 from rich.console import Console
 from rich.panel import Panel
 
+from app.sharding import ShardedSession
+from app.read_models import as_rows
+from app.screen import screen, Static
+# Field validators live in app.validators (no database imports, so import workers can load them)
+from app.validators import validate_email, validate_contact, validate_password_complexity
+
 console = Console()
 PAGE_SIZE = 5
 
-def validate_email(text):
-    # Simple regex for basic email format (user@domain.com)
-    pattern = r"^(?!\.)(?!.*\.\.)([A-Za-z0-9._%+-]{1,64})@([A-Za-z0-9-]+\.)+[A-Za-z]{2,}$"
-    if re.match(pattern, text) and len(text) <= 255:
-        return True
-    return "Please enter a valid email address (max 255 chars)."
-
-def validate_password_complexity(text):
-    if len(text) < 8 or len(text) > 30:
-        return "Password must be between 8 and 30 characters."
-    if not any(char.isupper() for char in text):
-        return "Password must contain at least one uppercase letter."
-    if not any(char.isdigit() for char in text):
-        return "Password must contain at least one digit."
-    if not re.search(r"[!@#$%^&*(),.?\":{}|<>]", text):
-        return "Password must contain at least one special character."
-    return True
-
-def validate_contact(text):
-    if text.isdigit() and len(text) == 10 and text[0] in "6789":
-        return True
-    return "Contact Number must be exactly 10 digits and starts from 6,7,8,9."
-
-
-def paginate_results(session: Session, statement, render_func, title: str):
+def _count_records(session, statement) -> int:
+    if isinstance(session, ShardedSession):
+        return session.count(statement)
+    # We use a subquery to safely count results regardless of the original statement's complexity
+    count_statement = select(func.count()).select_from(statement.subquery())
+    return session.exec(count_statement).one()
+
+def _fetch_page(session, statement, offset: int, limit: int) -> list:
+    if isinstance(session, ShardedSession):
+        return session.fetch_page(statement, offset, limit)
+    return session.exec(statement.offset(offset).limit(limit)).all()
+
+def paginate_results(session: Session | ShardedSession, statement, render_func, title: str, archive_statement=None, header=None, row_type=None,
+                     count_statement=None, archive_count_statement=None, keyset: str | tuple[str, ...] | None = None):
     """
     A generic pagination engine for SQLModel queries.
     
     Args:
-        session: The database session.
+        session: The database session, or a ShardedSession (app.sharding) for admin
+            views that span every shard.
         statement: The base SQLModel select statement (without filters applied yet).
-        render_func: A function that accepts 'results' and prints a Rich table.
+        render_func: A function that accepts 'results' and returns a Rich renderable (the table).
+            Pages are drawn as app.screen frames; after the first, only changed rows are sent.
         title: The title to display at the top of the view.
+        archive_statement: Optional select over the archive table (see app.archive).
+            It is only counted and fetched once the user pages past the hot data
+            and picks "Archived Orders >", so normal browsing never touches it.
+        header: Optional Rich renderable shown under the title on every page
+            (e.g. the customer's order summary).
+        row_type: Optional NamedTuple from app.read_models; the statements then select
+            only its columns and each page is handed to render_func as row_type tuples.
+        count_statement / archive_count_statement: Optional cheaper statements with the
+            same rows to count (e.g. without a join that only adds display columns).
+        keyset: Optional name of the column the statements are ordered by (ascending),
+            or a tuple of names for a composite order. The key must be unique across
+            the whole stream; for a ShardedSession that means across every shard.
+            Pages after the first then seek past the previous page's last key
+            instead of using OFFSET, so deep pages cost the same as page 1.
     """
+    key_names = (keyset,) if isinstance(keyset, str) else keyset
+
     # 1. Calculate Total Records (Efficient Count Query)
-    # We use a subquery to safely count results regardless of the original statement's complexity
-    count_statement = select(func.count()).select_from(statement.subquery())
-    total_records = session.exec(count_statement).one()
+    # Each segment is (statement, record count, label); the archive segment is appended on demand.
+    if count_statement is None:
+        count_statement = statement
+    if archive_count_statement is None:
+        archive_count_statement = archive_statement
+
+    segments = [(statement, _count_records(session, count_statement), None)]
+    archive_loaded = archive_statement is None
+
+    if segments[0][1] == 0 and not archive_loaded:
+        # Nothing hot to show, so paging "past the hot data" starts right away
+        segments = [(archive_statement, _count_records(session, archive_count_statement), "Archived")]
+        archive_loaded = True
+
+    total_records = sum(count for _, count, _ in segments)
     
     if total_records == 0:
         console.clear()
@@ -54,36 +79,69 @@ def paginate_results(session: Session, statement, render_func, title: str):
         questionary.press_any_key_to_continue().ask()
         return
 
-    total_pages = math.ceil(total_records / PAGE_SIZE)
     current_page = 1
+    # (segment label, page in segment) -> keyset value of that page's last row
+    page_last_keys = {}
+
+    # The header is the same on every page, so it is rendered once (app.screen)
+    if header is not None:
+        header = Static(header)
+    frame_name = getattr(render_func, "__name__", "pager")
+    redraw = False
 
     # 2. The Pagination Loop
     while True:
-        console.clear()
+
+        total_pages = sum(math.ceil(count / PAGE_SIZE) for _, count, _ in segments)
+        total_records = sum(count for _, count, _ in segments)
+
+        # Find which segment the current page falls in, and the offset inside it
+        page_in_segment = current_page
+        for segment_statement, count, label in segments:
+            segment_pages = math.ceil(count / PAGE_SIZE)
+            if page_in_segment <= segment_pages:
+                break
+            page_in_segment -= segment_pages
         
         # Calculate Offset
-        offset = (current_page - 1) * PAGE_SIZE
+        offset = (page_in_segment - 1) * PAGE_SIZE
         
         # Fetch ONLY the records for this page
-        # We clone the statement to avoid modifying the original permanently
-        paginated_statement = statement.offset(offset).limit(PAGE_SIZE)
-        results = session.exec(paginated_statement).all()
+        # offset/limit return a copy, so the original statement is never modified
+        previous_key = page_last_keys.get((label, page_in_segment - 1))
+        if key_names and previous_key is not None:
+            # A row-value comparison, (a, b) > (x, y), still seeks on the leading column's index
+            key_columns = tuple_(*(segment_statement.selected_columns[name] for name in key_names))
+            results = _fetch_page(session, segment_statement.where(key_columns > tuple_(*previous_key)), 0, PAGE_SIZE)
+        else:
+            results = _fetch_page(session, segment_statement, offset, PAGE_SIZE)
+        if row_type is not None:
+            results = as_rows(results, row_type)
+        if key_names and results:
+            page_last_keys[(label, page_in_segment)] = tuple(getattr(results[-1], name) for name in key_names)
 
         # UI Header
-        console.print(Panel(
-            f"[bold cyan]{title}[/bold cyan]\n"
+        label_text = f" [dim]({label})[/dim]" if label else ""
+        parts = [Panel(
+            f"[bold cyan]{title}[/bold cyan]{label_text}\n"
             f"Page {current_page} of {total_pages} | Total Records: {total_records}",
             style="cyan"
-        ))
+        )]
+        if header is not None:
+            parts.append(header)
 
-        # 3. Delegate Rendering
-        render_func(results)
+        # 3. Delegate Rendering (only prompts are drawn under a frame, so the next page can reuse it)
+        parts.append(render_func(results))
+        screen.draw(frame_name, *parts, update=redraw)
+        redraw = True
 
         # 4. Dynamic Navigation Menu
         choices = []
         
         if current_page < total_pages:
             choices.append("Next Page >")
+        elif not archive_loaded:
+            choices.append("Archived Orders >")
         
         if current_page > 1:
             choices.append("< Previous Page")
@@ -99,8 +157,16 @@ def paginate_results(session: Session, statement, render_func, title: str):
         # Handle Navigation
         if choice == "Next Page >":
             current_page += 1
+        elif choice == "Archived Orders >":
+            archive_count = _count_records(session, archive_count_statement)
+            archive_loaded = True
+            if archive_count == 0:
+                console.print("[yellow]No archived records.[/yellow]")
+                questionary.press_any_key_to_continue().ask()
+            else:
+                segments.append((archive_statement, archive_count, "Archived"))
+                current_page += 1
         elif choice == "< Previous Page":
             current_page -= 1
-        elif choice == "Back to Menu":
+        elif choice == "Back to Menu" or choice is None:
             break
-
@@ -0,0 +1,79 @@
+"""
+app/validators.py
+-----------------
+Field rules for customer accounts, shared by the registration and profile
+prompts (as questionary validators: True, or the message to show) and by the
+bulk import (app.user_import), which runs them in worker processes.
+
+Only the standard library is imported here, so an import worker starts without
+loading the database layer.
+"""
+
+import re
+
+USER_FIELDS = ("user_name", "email", "password", "address", "contact_number")
+
+def validate_user_name(text):
+    if 0 < len(text) <= 50:
+        return True
+    return "Username must be 1-50 characters."
+
+def validate_email(text):
+    # Simple regex for basic email format (user@domain.com)
+    pattern = r"^(?!\.)(?!.*\.\.)([A-Za-z0-9._%+-]{1,64})@([A-Za-z0-9-]+\.)+[A-Za-z]{2,}$"
+    if re.match(pattern, text) and len(text) <= 255:
+        return True
+    return "Please enter a valid email address (max 255 chars)."
+
+def validate_password_complexity(text):
+    if len(text) < 8 or len(text) > 30:
+        return "Password must be between 8 and 30 characters."
+    if not any(char.isupper() for char in text):
+        return "Password must contain at least one uppercase letter."
+    if not any(char.isdigit() for char in text):
+        return "Password must contain at least one digit."
+    if not re.search(r"[!@#$%^&*(),.?\":{}|<>]", text):
+        return "Password must contain at least one special character."
+    return True
+
+def validate_contact(text):
+    if text.isdigit() and len(text) == 10 and text[0] in "6789":
+        return True
+    return "Contact Number must be exactly 10 digits and starts from 6,7,8,9."
+
+def validate_address(text):
+    if len(text) <= 100:
+        return True
+    return "Address is too long (max 100 chars)."
+
+# --- RECORD CHECKS (bulk import) ---
+
+FIELD_VALIDATORS = {
+    "user_name": validate_user_name,
+    "email": validate_email,
+    "password": validate_password_complexity,
+    "address": validate_address,
+    "contact_number": validate_contact,
+}
+
+def check_user_record(record: dict) -> dict[str, str]:
+    """Field name -> problem for one imported record; empty if every field passes."""
+    problems = {}
+    for field_name, validator in FIELD_VALIDATORS.items():
+        value = record.get(field_name)
+        if not isinstance(value, str) or not value.strip():
+            problems[field_name] = f"Missing {field_name}."
+            continue
+        result = validator(value)
+        if result is not True:
+            problems[field_name] = result
+
+    # An explicit ID is optional (e.g. when moving customers between systems)
+    user_id = record.get("id")
+    if user_id not in (None, "") and not (str(user_id).isdigit() and 0 < int(user_id) < 2 ** 63):
+        problems["id"] = "User ID must be a positive whole number."
+    return problems
+
+def check_user_batch(records: list[dict]) -> list[dict[str, str]]:
+    """check_user_record over a batch; the unit of work sent to an import worker."""
+    return [check_user_record(record) for record in records]
@@ -0,0 +1,111 @@
+"""
+benchmarks/analytics_bench.py
+-----------------------------
+Times app.analytics on a large synthetic order table: the chunked column load
+and each vectorized report, plus the process's peak RSS.
+
+The scratch database is built with plain sqlite3 (one executemany per batch) in
+a temporary directory and the analytics module is pointed at it, so the real
+database is never touched.
+
+Run from the project root:
+    uv run -m benchmarks.analytics_bench [--rows 10000000]
+"""
+
+import argparse
+import random
+import resource
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+from sqlmodel import SQLModel
+
+from app import analytics
+from app.database import make_engine
+from app.models import ServiceRequest, ServiceRequestArchive, ServiceType, Vendor, OrderStatus
+from app.lookups import SERVICE_NAMES, VENDOR_NAMES, ORDER_STATUSES, seed_lookup_tables
+
+console = Console()
+
+SEED_BATCH_SIZE = 100_000
+HISTORY_DAYS = 365
+
+def _seed(file_name: str, rows: int):
+    engine = make_engine(file_name)
+    SQLModel.metadata.create_all(engine, tables=[
+        ServiceType.__table__, Vendor.__table__, OrderStatus.__table__,
+        ServiceRequest.__table__, ServiceRequestArchive.__table__
+    ])
+    seed_lookup_tables(engine)
+    engine.dispose()
+
+    # Rows are inserted below the ORM, so they carry lookup codes directly
+    services, vendors, statuses = (range(len(names)) for names in (SERVICE_NAMES, VENDOR_NAMES, ORDER_STATUSES))
+
+    start = time.time() - HISTORY_DAYS * 86_400
+    conn = sqlite3.connect(file_name)
+    for batch_start in range(0, rows, SEED_BATCH_SIZE):
+        batch = range(batch_start, min(rows, batch_start + SEED_BATCH_SIZE))
+        conn.executemany(
+            "INSERT INTO servicerequest (id, customer_id, service_name, status, date_slot, address, vendor_name, amount, created_at) "
+            "VALUES (?, ?, ?, ?, '', '', ?, ?, datetime(?, 'unixepoch'))",
+            (
+                (i, 1_000_000 + i % 50_000, random.choice(services), random.choice(statuses),
+                 random.choice(vendors), random.choice((100, 150, 200)), start + i * HISTORY_DAYS * 86_400 / rows)
+                for i in batch
+            )
+        )
+        conn.commit()
+    conn.close()
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run(rows: int):
+    with tempfile.TemporaryDirectory() as scratch:
+        file_name = str(Path(scratch) / "analytics.db")
+        with console.status(f"Seeding {rows:,} orders..."):
+            _seed(file_name, rows)
+
+        # Point the analytics module at the scratch database only
+        analytics.shard_engines = [make_engine(file_name)]
+
+        rss_before = _peak_rss_mib()
+        columns = analytics.load_order_columns()
+        timings = [("Load columns (chunked)", columns.load_seconds)]
+
+        reports = [
+            ("Vendor revenue per week", analytics.vendor_revenue_by_week),
+            ("Amount percentiles per service", analytics.amount_percentiles_by_service),
+            ("Status funnel by booking day", analytics.status_funnel_by_day),
+            ("Order volume histogram", analytics.order_volume_histogram),
+        ]
+        for name, report in reports:
+            started = time.perf_counter()
+            report(columns)
+            timings.append((name, time.perf_counter() - started))
+
+        analytics.shard_engines[0].dispose()
+
+    table = Table(title=f"Order analytics on {len(columns):,} orders", show_lines=True)
+    table.add_column("Step", style="bold")
+    table.add_column("Seconds", justify="right", style="green")
+    for name, seconds in timings:
+        table.add_row(name, f"{seconds:.3f}")
+    table.add_row("Column arrays", f"{columns.nbytes / 1024 / 1024:.0f} MiB")
+    table.add_row("Peak RSS (before -> after)", f"{rss_before:.0f} -> {_peak_rss_mib():.0f} MiB")
+    console.print(table)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized order analytics.")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Synthetic orders to create.")
+    args = parser.parse_args()
+    run(args.rows)
+
+if __name__ == "__main__":
+    main()
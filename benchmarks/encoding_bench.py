@@ -0,0 +1,160 @@
+"""
+benchmarks/encoding_bench.py
+----------------------------
+Measures what the lookup-code encoding (app.lookups) saves: database size and
+full-scan throughput of the order table, before and after the migration.
+
+A scratch database is filled with text-column orders in the pre-encoding
+schema, measured, converted with migrate_encoded_columns(), compacted with
+VACUUM (so both sides are measured on a freshly packed file) and measured again.
+
+Scans:
+    SQLite filter   SELECT count(*) ... WHERE status = ? (no index, stays in SQLite)
+    Python fetch    service, vendor and status of every order, decoded back to
+                    strings on the encoded side (what the ORM column type does)
+
+Run from the project root (the real database is never touched):
+    uv run -m benchmarks.encoding_bench [--rows 1000000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+from sqlmodel import SQLModel
+
+from app.database import make_engine
+from app.models import ServiceType, Vendor, OrderStatus
+from app.lookups import (
+    SERVICE_NAMES, VENDOR_NAMES, ORDER_STATUSES, service_dictionary, vendor_dictionary, status_dictionary,
+    seed_lookup_tables, migrate_encoded_columns,
+)
+
+console = Console()
+
+SEED_BATCH_SIZE = 100_000
+FETCH_BATCH_SIZE = 10_000
+
+# The order table as it was before the encoding
+LEGACY_SCHEMA = """
+CREATE TABLE servicerequest (
+    id INTEGER NOT NULL,
+    customer_id INTEGER NOT NULL,
+    service_name VARCHAR NOT NULL,
+    status VARCHAR NOT NULL,
+    date_slot VARCHAR NOT NULL,
+    address VARCHAR NOT NULL,
+    vendor_name VARCHAR NOT NULL,
+    amount INTEGER NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_servicerequest_customer_id ON servicerequest (customer_id);
+"""
+
+def _seed(file_name: str, rows: int):
+    conn = sqlite3.connect(file_name)
+    conn.executescript(LEGACY_SCHEMA)
+    created_at = datetime(2025, 1, 1).isoformat(sep=" ")
+    for batch_start in range(0, rows, SEED_BATCH_SIZE):
+        conn.executemany(
+            "INSERT INTO servicerequest VALUES (?, ?, ?, ?, '2026-03-12 10:00 AM - 11:00 AM', ?, ?, ?, ?)",
+            (
+                (2_000_000 + i, 1_000_000 + i % 50_000, random.choice(SERVICE_NAMES), random.choice(ORDER_STATUSES),
+                 f"Street {i % 50_000}, City", random.choice(VENDOR_NAMES), random.choice((100, 150, 200)), created_at)
+                for i in range(batch_start, min(rows, batch_start + SEED_BATCH_SIZE))
+            )
+        )
+        conn.commit()
+    conn.close()
+
+def _vacuum(file_name: str):
+    conn = sqlite3.connect(file_name, isolation_level=None)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+    conn.close()
+
+def _measure(file_name: str, status_parameter, decoders=None) -> dict:
+    """File size, page count and both scans. `decoders` turn codes back into strings, as the ORM column type does."""
+    _vacuum(file_name)
+    result = {"size": os.path.getsize(file_name)}
+
+    conn = sqlite3.connect(file_name)
+    has_dbstat = conn.execute("SELECT 1 FROM pragma_module_list WHERE name = 'dbstat'").fetchone()
+    result["pages"] = conn.execute("SELECT count(*) FROM dbstat WHERE name = 'servicerequest'").fetchone()[0] if has_dbstat else None
+
+    started = time.perf_counter()
+    conn.execute("SELECT count(*) FROM servicerequest WHERE status = ?", (status_parameter,)).fetchone()
+    result["filter_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cursor = conn.execute("SELECT service_name, vendor_name, status FROM servicerequest")
+    while batch := cursor.fetchmany(FETCH_BATCH_SIZE):
+        if decoders:
+            service, vendor, status = decoders
+            batch = [(service(s), vendor(v), status(t)) for s, v, t in batch]
+    result["fetch_seconds"] = time.perf_counter() - started
+    conn.close()
+    return result
+
+def run(rows: int):
+    with tempfile.TemporaryDirectory() as scratch:
+        file_name = str(Path(scratch) / "encoding.db")
+        with console.status(f"Seeding {rows:,} text-column orders..."):
+            _seed(file_name, rows)
+
+        with console.status("Measuring text columns..."):
+            before = _measure(file_name, "Completed")
+
+        engine = make_engine(file_name)
+        SQLModel.metadata.create_all(engine, tables=[ServiceType.__table__, Vendor.__table__, OrderStatus.__table__])
+        seed_lookup_tables(engine)
+
+        started = time.perf_counter()
+        with console.status("Migrating...") as status:
+            migrate_encoded_columns(
+                [engine],
+                progress=lambda done, total: status.update(f"Migrating... {done:,} / {total:,}")
+            )
+        migrate_seconds = time.perf_counter() - started
+
+        with console.status("Measuring encoded columns..."):
+            decoders = (service_dictionary.decode, vendor_dictionary.decode, status_dictionary.decode)
+            after = _measure(file_name, status_dictionary.encode("Completed"), decoders)
+        engine.dispose()
+
+    table = Table(title=f"Lookup-code encoding on {rows:,} orders", show_lines=True)
+    table.add_column("Metric", style="bold")
+    table.add_column("Text columns", justify="right")
+    table.add_column("Lookup codes", justify="right", style="green")
+    table.add_column("Change", justify="right", style="cyan")
+
+    def add(metric, old, new, fmt, better_when_lower=True):
+        ratio = old / new if better_when_lower else new / old
+        table.add_row(metric, fmt(old), fmt(new), f"{ratio:.2f}x")
+
+    add("Database file", before["size"], after["size"], lambda v: f"{v / 1024 / 1024:.1f} MiB")
+    if before["pages"] and after["pages"]:
+        add("Order table pages", before["pages"], after["pages"], lambda v: f"{v:,}")
+    add("SQLite filter scan", rows / before["filter_seconds"], rows / after["filter_seconds"],
+        lambda v: f"{v / 1e6:.1f} M rows/s", better_when_lower=False)
+    add("Python fetch (3 columns)", rows / before["fetch_seconds"], rows / after["fetch_seconds"],
+        lambda v: f"{v / 1e6:.2f} M rows/s", better_when_lower=False)
+    console.print(table)
+    console.print(f"[dim]Migration: {migrate_seconds:.1f} s ({rows / migrate_seconds:,.0f} rows/s)[/dim]")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lookup-code encoding of the order columns.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic orders to create.")
+    args = parser.parse_args()
+    run(args.rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+benchmarks/group_commit_bench.py
+--------------------------------
+Booking throughput with group commit (app.group_commit) against one commit per
+booking, as concurrent client threads grow.
+
+C client threads book back to back through save_request_to_db() for a few
+seconds per level, with the shard's writer set to:
+    per-op   window 0, batch 1: every booking is its own transaction and fsync
+    group    the default window (SMS_GROUP_COMMIT_WINDOW_MS) and batch limit
+and the benchmark reports bookings/s, p50/p99 booking latency, the mean batch
+size and the mean commit time. Commits wait for the disk (synchronous=FULL), so
+run it on the disk you care about (--dir); a tmpfs hides the fsync cost.
+
+SMS_DATABASE points the app at a scratch file in a temporary directory, so the
+real database is never touched.
+
+Run from the project root:
+    uv run -m benchmarks.group_commit_bench [--clients 1,4,16,32] [--duration 5] [--dir .]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+CUSTOMERS = 1000
+
+def _run_level(clients: int, duration: float, book) -> tuple[float, np.ndarray]:
+    """`clients` threads call book() back to back until the time is up. Returns (bookings/s, latencies)."""
+    latencies = [[] for _ in range(clients)]
+    start = threading.Barrier(clients + 1)
+
+    def client(index: int):
+        start.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            book()
+            latencies[index].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = np.array([latency for client_latencies in latencies for latency in client_latencies])
+    return len(samples) / elapsed, samples
+
+def run(client_levels: list[int], duration: float, directory: str):
+    with tempfile.TemporaryDirectory(dir=directory) as scratch:
+        # Before anything imports app.database, so the app opens the scratch file
+        os.environ["SMS_DATABASE"] = str(Path(scratch) / "group_commit.db")
+        os.environ.pop("SMS_DATABASE_TEMPLATE", None)
+        from app import service_mgr
+        from app.database import create_db_and_tables, engine
+        from app.migrations import run_pending_migrations
+        from app.group_commit import GroupCommitWriter, WINDOW_SECONDS, MAX_BATCH
+        from app.models import ServiceRequest
+        from app.lookups import SERVICE_NAMES
+
+        create_db_and_tables()
+        run_pending_migrations()
+        slot = f"{date.today() + timedelta(days=7)} 10:00 AM - 11:00 AM"
+
+        def book():
+            vendor = random.choice(service_mgr.VENDOR_DATA)
+            service_mgr.save_request_to_db(ServiceRequest(
+                customer_id=random.randrange(CUSTOMERS),
+                service_name=random.choice(SERVICE_NAMES),
+                date_slot=slot,
+                address="1 Bench Road, Sector 1, City",
+                vendor_name=vendor["name"],
+                amount=vendor["price"]
+            ))
+
+        modes = {"per-op": (0.0, 1), "group": (WINDOW_SECONDS, MAX_BATCH)}
+        table = Table(
+            title=f"Bookings with group commit (window {WINDOW_SECONDS * 1000:g} ms, batch <= {MAX_BATCH})",
+            show_lines=False
+        )
+        table.add_column("Clients", justify="right", style="bold")
+        for mode in modes:
+            table.add_column(f"{mode} /s", justify="right", style="green")
+            table.add_column(f"{mode} p50 ms", justify="right")
+            table.add_column(f"{mode} p99 ms", justify="right", style="yellow")
+        table.add_column("Mean batch", justify="right")
+        table.add_column("Commit ms", justify="right")
+
+        for clients in client_levels:
+            row = [str(clients)]
+            for mode, (window, max_batch) in modes.items():
+                writer = GroupCommitWriter(engine, "bench", window=window, max_batch=max_batch)
+                # Every booking in this run goes through this writer
+                service_mgr.writer_for = lambda shard_engine: writer
+                with console.status(f"{clients} client(s), {mode}..."):
+                    per_second, samples = _run_level(clients, duration, book)
+                writer.close()
+                row += [f"{per_second:.0f}", f"{np.percentile(samples, 50) * 1000:.1f}", f"{np.percentile(samples, 99) * 1000:.1f}"]
+            stats = writer.stats
+            row += [f"{stats.mean_batch_size:.1f}", f"{stats.commit_seconds / max(stats.batches, 1) * 1000:.2f}"]
+            table.add_row(*row)
+        console.print(table)
+        engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark booking throughput with and without group commit.")
+    parser.add_argument("--clients", default="1,4,16,32", help="Comma-separated concurrent client counts.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per client level and mode.")
+    parser.add_argument("--dir", default=".", help="Directory for the scratch database (its disk is what gets synced).")
+    args = parser.parse_args()
+    run([int(clients) for clients in args.clients.split(",")], args.duration, args.dir)
+
+if __name__ == "__main__":
+    main()
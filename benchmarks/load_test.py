@@ -0,0 +1,416 @@
+"""
+benchmarks/load_test.py
+-----------------------
+Multi-process load test. Worker processes run a weighted mix of the real flows,
+without the TUI, against one shared scratch database. Each ramp stage runs more
+workers than the last, and the harness finds where more workers stop helping.
+
+Operations (the functions the screens call, with the same transactions):
+    register   app.auth.create_user
+    login      app.auth.authenticate
+    book       app.service_mgr.save_request_to_db
+    history    app.service_mgr.fetch_history_page (a random page of 1-3)
+    status     app.admin_mgr.change_order_status
+    remove     app.admin_mgr.remove_user (only customers the worker registered itself)
+
+Each stage reports throughput, p50/p99 latency per operation, lock wait and errors.
+    Lock wait    time spent in the first write statement of each transaction. With
+                 deferred transactions that is where SQLite takes the write lock,
+                 i.e. where busy_timeout waits for the other writers
+    Errors       "locked" (database is locked / busy) and "failed" (anything else).
+                 Refusals the application makes itself (e.g. changing a Completed
+                 order) are counted as "rejected", not as errors
+
+The saturation point is the last stage before throughput stops growing by
+--min-gain, or before the error rate or p99 crosses its limit.
+
+Engine configuration under test: --shards (SMS_SHARD_COUNT) and --busy-timeout-ms.
+
+Run from the project root (a scratch database is seeded; the real one is never touched):
+    uv run -m benchmarks.load_test [--stages 1,2,4,8] [--duration 10] [--shards 1]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+# app.* is imported inside the functions below: app.database opens the database named
+# by SMS_DATABASE at import time, which is only set once the arguments are parsed.
+
+console = Console()
+
+# Relative weight of each operation in the mix
+OPERATION_MIX = {
+    "login": 30,
+    "book": 25,
+    "history": 25,
+    "status": 10,
+    "register": 7,
+    "remove": 3,
+}
+SEED_PASSWORD = "Password1!"
+TIME_SLOTS = ("09:00 AM - 10:00 AM", "12:00 PM - 01:00 PM", "04:00 PM - 05:00 PM")
+NEW_STATUSES = ("In Progress", "Completed", "Cancelled")
+HISTORY_PAGES = 3
+
+# --- LOCK WAIT ---
+
+WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+class LockWaitTracker:
+    """Adds up the time of the first write statement of every transaction on the engines it watches."""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def attach(self, engine):
+        from sqlalchemy import event
+        event.listen(engine, "begin", self._begin)
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "handle_error", self._error)
+
+    def _begin(self, conn):
+        conn.info["lock_pending"] = True
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("lock_pending") and statement.lstrip()[:7].upper().startswith(WRITE_VERBS):
+            conn.info["lock_pending"] = False
+            conn.info["lock_started"] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._stop(conn)
+
+    def _error(self, context):
+        # A lock timeout lands here instead of after_cursor_execute
+        if context.connection is not None:
+            self._stop(context.connection)
+
+    def _stop(self, conn):
+        started = conn.info.pop("lock_started", None)
+        if started is not None:
+            self.seconds += time.perf_counter() - started
+
+# --- WORKER ---
+
+def _classify(error: Exception) -> str:
+    message = str(error).lower()
+    return "locked" if "locked" in message or "busy" in message else "failed"
+
+def _worker(worker_id: int, stage: int, seed_users: list, seed_orders: list, options: dict, barrier, results):
+    """Runs the operation mix until the stage's time is up, then sends its measurements to `results`."""
+    # The parent set SMS_DATABASE / SMS_SHARD_COUNT before starting this process
+    from app import database
+    from app.auth import create_user, authenticate
+    from app.admin_mgr import change_order_status, remove_user
+    from app.models import ServiceRequest
+    from app.service_mgr import save_request_to_db, fetch_history_page, VENDOR_DATA
+    from app.lookups import SERVICE_NAMES
+
+    # Read by the connect hook, so it applies to every connection this worker opens
+    database.BUSY_TIMEOUT_MS = options["busy_timeout_ms"]
+    tracker = LockWaitTracker()
+    for shard_engine in database.shard_engines:
+        tracker.attach(shard_engine)
+
+    users = list(seed_users)   # (id, user_name) pairs this worker may log in as and book for
+    own_users = []             # customers it registered itself; only these are removed
+    orders = list(seed_orders) # orders it may change the status of
+    registered = 0
+
+    def register():
+        nonlocal registered
+        registered += 1
+        name = f"lt{stage}_{worker_id}_{registered}"
+        user = create_user(name, f"{name}@example.com", SEED_PASSWORD, f"{registered} Load Street, City", f"9{random.randrange(10**9):09d}")
+        users.append((user.id, user.user_name))
+        own_users.append((user.id, user.user_name))
+
+    def login():
+        _, name = random.choice(users)
+        if authenticate(name, SEED_PASSWORD) is None:
+            raise LookupError(f"Login failed for {name}")
+
+    def book():
+        customer_id, _ = random.choice(users)
+        vendor = random.choice(VENDOR_DATA)
+        order = save_request_to_db(ServiceRequest(
+            customer_id=customer_id,
+            service_name=random.choice(SERVICE_NAMES),
+            date_slot=f"{date.today() + timedelta(days=random.randint(1, 30))} | {random.choice(TIME_SLOTS)}",
+            address=f"{customer_id % 1000} Load Street, City",
+            vendor_name=vendor["name"],
+            amount=vendor["price"]
+        ))
+        orders.append((order.id, customer_id))
+
+    def history():
+        customer_id, _ = random.choice(users)
+        fetch_history_page(customer_id, random.randint(1, HISTORY_PAGES))
+
+    def status():
+        position = random.randrange(len(orders))
+        order_id, _ = orders[position]
+        order = change_order_status(order_id, random.choice(NEW_STATUSES))
+        if order.status == "Completed":
+            orders.pop(position)
+
+    def remove():
+        customer_id, name = own_users.pop(random.randrange(len(own_users)))
+        users.remove((customer_id, name))
+        orders[:] = [order for order in orders if order[1] != customer_id]
+        remove_user(customer_id)
+
+    operations = {"register": register, "login": login, "book": book, "history": history, "status": status, "remove": remove}
+    names = list(OPERATION_MIX)
+    weights = list(OPERATION_MIX.values())
+    latencies = {name: [] for name in operations}
+    lock_wait = Counter()
+    outcomes = {name: Counter() for name in operations}
+
+    # Open the connections before the clock starts
+    authenticate(users[0][1], SEED_PASSWORD)
+    barrier.wait()
+
+    started = time.perf_counter()
+    deadline = started + options["duration"]
+    while time.perf_counter() < deadline:
+        name = random.choices(names, weights)[0]
+        # Nothing to remove or change yet: do the operation that creates it
+        if name == "remove" and not own_users:
+            name = "register"
+        elif name == "status" and not orders:
+            name = "book"
+
+        lock_before = tracker.seconds
+        operation_started = time.perf_counter()
+        try:
+            operations[name]()
+            outcome = "ok"
+        except (LookupError, ValueError):
+            outcome = "rejected"
+        except Exception as error:
+            outcome = _classify(error)
+        latencies[name].append(time.perf_counter() - operation_started)
+        lock_wait[name] += tracker.seconds - lock_before
+        outcomes[name][outcome] += 1
+
+        if options["think_ms"]:
+            time.sleep(options["think_ms"] / 1000)
+
+    results.put({
+        "elapsed": time.perf_counter() - started,
+        "latencies": latencies,
+        "lock_wait": dict(lock_wait),
+        "outcomes": {name: dict(counts) for name, counts in outcomes.items()},
+    })
+
+# --- SEEDING ---
+
+def _seed(users: int, orders_per_user: int) -> tuple[list, list]:
+    """Creates the customers and orders every stage starts from, through the same code paths."""
+    from app.database import create_db_and_tables
+    from app.migrations import run_pending_migrations
+    from app.summary import ensure_summaries
+    from app.auth import create_user
+    from app.models import ServiceRequest
+    from app.service_mgr import save_request_to_db, VENDOR_DATA
+    from app.lookups import SERVICE_NAMES
+
+    create_db_and_tables()
+    run_pending_migrations()
+    ensure_summaries()
+
+    seed_users, seed_orders = [], []
+    for i in range(users):
+        user = create_user(f"load_{i}", f"load_{i}@example.com", SEED_PASSWORD, f"{i} Seed Street, City", f"9{i:09d}")
+        seed_users.append((user.id, user.user_name))
+        for _ in range(orders_per_user):
+            vendor = random.choice(VENDOR_DATA)
+            order = save_request_to_db(ServiceRequest(
+                customer_id=user.id,
+                service_name=random.choice(SERVICE_NAMES),
+                date_slot=f"{date.today() + timedelta(days=7)} | {TIME_SLOTS[0]}",
+                address=f"{i} Seed Street, City",
+                vendor_name=vendor["name"],
+                amount=vendor["price"]
+            ))
+            seed_orders.append((order.id, user.id))
+    return seed_users, seed_orders
+
+# --- STAGES ---
+
+def _run_stage(stage: int, workers: int, seed_users: list, seed_orders: list, options: dict) -> dict:
+    # spawn, not fork: a forked child would inherit the parent's open SQLite connections
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    # Each worker changes its own share of the seeded orders, so two never race on one
+    processes = [
+        context.Process(target=_worker, args=(i, stage, seed_users, seed_orders[i::workers], options, barrier, results))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    elapsed = max(report["elapsed"] for report in reports)
+    operations = {}
+    for name in OPERATION_MIX:
+        samples = np.array([latency for report in reports for latency in report["latencies"][name]])
+        outcomes = Counter()
+        for report in reports:
+            outcomes.update(report["outcomes"][name])
+        operations[name] = {
+            "count": len(samples),
+            "samples": samples,
+            "lock_wait": sum(report["lock_wait"].get(name, 0.0) for report in reports),
+            "outcomes": outcomes,
+        }
+
+    all_samples = np.concatenate([operation["samples"] for operation in operations.values()])
+    total = len(all_samples)
+    errors = sum(operation["outcomes"]["locked"] + operation["outcomes"]["failed"] for operation in operations.values())
+    return {
+        "workers": workers,
+        "elapsed": elapsed,
+        "operations": operations,
+        "throughput": total / elapsed,
+        "p50": np.percentile(all_samples, 50) if total else 0.0,
+        "p99": np.percentile(all_samples, 99) if total else 0.0,
+        "lock_wait": sum(operation["lock_wait"] for operation in operations.values()),
+        "error_rate": errors / total if total else 0.0,
+    }
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+def render_stage(result: dict):
+    table = Table(title=f"{result['workers']} worker(s), {result['elapsed']:.1f} s", show_lines=False)
+    table.add_column("Operation", style="bold")
+    table.add_column("Ops", justify="right")
+    table.add_column("Ops/s", justify="right", style="green")
+    table.add_column("p50 ms", justify="right")
+    table.add_column("p99 ms", justify="right", style="yellow")
+    table.add_column("Lock wait ms/op", justify="right", style="magenta")
+    table.add_column("Rejected", justify="right", style="dim")
+    table.add_column("Locked", justify="right", style="red")
+    table.add_column("Failed", justify="right", style="red")
+
+    for name, operation in result["operations"].items():
+        count = operation["count"]
+        if not count:
+            table.add_row(name, "0", "-", "-", "-", "-", "-", "-", "-")
+            continue
+        samples, outcomes = operation["samples"], operation["outcomes"]
+        table.add_row(
+            name,
+            f"{count:,}",
+            f"{count / result['elapsed']:,.1f}",
+            _ms(np.percentile(samples, 50)),
+            _ms(np.percentile(samples, 99)),
+            _ms(operation["lock_wait"] / count),
+            str(outcomes["rejected"]),
+            str(outcomes["locked"]),
+            str(outcomes["failed"]),
+        )
+    console.print(table)
+
+def find_saturation(results: list[dict], min_gain: float, max_error_rate: float, p99_limit: float) -> tuple[dict, str] | None:
+    """The last stage before scaling stops paying off, and why. None if every stage still scaled."""
+    for previous, current in zip(results, results[1:]):
+        gain = current["throughput"] / previous["throughput"] - 1 if previous["throughput"] else 0.0
+        if gain < min_gain:
+            return previous, f"{current['workers']} workers added only {gain:+.0%} throughput"
+        if current["error_rate"] > max_error_rate:
+            return previous, f"{current['workers']} workers hit a {current['error_rate']:.1%} error rate"
+        if current["p99"] > p99_limit:
+            return previous, f"{current['workers']} workers pushed p99 to {_ms(current['p99'])} ms"
+    return None
+
+def render_summary(results: list[dict], options: dict, saturation):
+    table = Table(title=f"Load ramp ({options['shards']} shard(s), busy_timeout {options['busy_timeout_ms']} ms)", show_lines=False)
+    table.add_column("Workers", justify="right", style="bold")
+    table.add_column("Ops/s", justify="right", style="green")
+    table.add_column("p50 ms", justify="right")
+    table.add_column("p99 ms", justify="right", style="yellow")
+    table.add_column("Lock wait", justify="right", style="magenta")
+    table.add_column("Errors", justify="right", style="red")
+
+    for result in results:
+        # Share of the workers' combined time spent waiting for the write lock
+        lock_share = result["lock_wait"] / (result["workers"] * result["elapsed"])
+        marker = " *" if saturation and result is saturation[0] else ""
+        table.add_row(
+            f"{result['workers']}{marker}",
+            f"{result['throughput']:,.1f}",
+            _ms(result["p50"]),
+            _ms(result["p99"]),
+            f"{result['lock_wait']:.2f} s ({lock_share:.0%})",
+            f"{result['error_rate']:.2%}",
+        )
+    console.print(table)
+
+    if saturation:
+        stage, reason = saturation
+        console.print(f"[bold]Saturation point:[/bold] {stage['workers']} worker(s), {stage['throughput']:,.1f} ops/s ({reason}).")
+    else:
+        console.print(f"[bold]Not saturated[/bold] up to {results[-1]['workers']} workers; add larger stages.")
+
+def run(options: dict):
+    with tempfile.TemporaryDirectory() as scratch:
+        # Every process (this one and each worker) opens the same scratch files
+        os.environ["SMS_DATABASE"] = str(Path(scratch) / "load.db")
+        os.environ["SMS_SHARD_COUNT"] = str(options["shards"])
+
+        with console.status(f"Seeding {options['users']:,} customers..."):
+            seed_users, seed_orders = _seed(options["users"], options["orders_per_user"])
+
+        results = []
+        for stage, workers in enumerate(options["stages"], start=1):
+            with console.status(f"Stage {stage}: {workers} worker(s) for {options['duration']} s..."):
+                result = _run_stage(stage, workers, seed_users, seed_orders, options)
+            render_stage(result)
+            results.append(result)
+
+        from app.database import shard_engines
+        for shard_engine in shard_engines:
+            shard_engine.dispose()
+
+    saturation = find_saturation(results, options["min_gain"], options["max_error_rate"], options["p99_limit_ms"] / 1000)
+    render_summary(results, options, saturation)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp concurrent worker processes over the real flows and find the saturation point.")
+    parser.add_argument("--stages", default="1,2,4,8", help="Comma-separated worker counts, one ramp stage each.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds each stage runs.")
+    parser.add_argument("--users", type=int, default=200, help="Customers seeded before the ramp.")
+    parser.add_argument("--orders-per-user", type=int, default=3, help="Orders seeded per customer.")
+    parser.add_argument("--shards", type=int, default=1, help="Shard count (SMS_SHARD_COUNT).")
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000, help="SQLite busy_timeout of every worker connection.")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between a worker's operations (0 = closed loop).")
+    parser.add_argument("--min-gain", type=float, default=0.10, help="Throughput growth a stage must add to count as scaling.")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate that counts as saturated.")
+    parser.add_argument("--p99-limit-ms", type=float, default=1000.0, help="p99 latency that counts as saturated.")
+    args = parser.parse_args()
+
+    options = vars(args)
+    options["stages"] = [int(workers) for workers in args.stages.split(",")]
+    if args.users < 1:
+        parser.error("--users must be at least 1")
+    run(options)
+
+if __name__ == "__main__":
+    main()
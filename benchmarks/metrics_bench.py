@@ -0,0 +1,96 @@
+"""
+benchmarks/metrics_bench.py
+---------------------------
+Cost of recording metrics (app.metrics): nanoseconds per update for each metric
+type, and what the database instrumentation adds to one small query.
+
+The query comparison runs the same primary-key SELECT through two engines on a
+scratch database, one of them built with make_engine(..., metrics_label=...).
+
+Run from the project root:
+    uv run -m benchmarks.metrics_bench [--updates 1000000] [--queries 20000]
+"""
+
+import argparse
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import text
+
+from app.database import make_engine
+from app.metrics import Registry
+
+console = Console()
+
+def _per_call_ns(statement: str, names: dict, number: int) -> float:
+    return min(timeit.repeat(statement, globals=names, number=number, repeat=3)) / number * 1e9
+
+def _query_seconds(engine, queries: int) -> float:
+    with engine.connect() as conn:
+        statement = text("SELECT value FROM numbers WHERE id = :id")
+        conn.execute(statement, {"id": 1})
+        started = time.perf_counter()
+        for i in range(queries):
+            conn.execute(statement, {"id": i % 1000}).first()
+        return time.perf_counter() - started
+
+def run(updates: int, queries: int):
+    registry = Registry()
+    counter = registry.counter("bench_total", "Benchmark counter.")
+    labelled = registry.counter("bench_labelled_total", "Benchmark counter with a label.", ("kind",))
+    gauge = registry.gauge("bench_gauge", "Benchmark gauge.")
+    histogram = registry.histogram("bench_seconds", "Benchmark histogram.")
+    child = labelled.labels("cached")
+    names = {"noop": lambda: None, "counter": counter, "labelled": labelled, "child": child, "gauge": gauge, "histogram": histogram}
+
+    table = Table(title="Metric update cost", show_lines=False)
+    table.add_column("Update", style="bold")
+    table.add_column("ns / call", justify="right", style="green")
+    for label, statement in [
+        ("Empty function call (baseline)", "noop()"),
+        ("Counter.inc()", "counter.inc()"),
+        ("Counter.labels(v).inc()", "labelled.labels('kind').inc()"),
+        ("cached child .inc()", "child.inc()"),
+        ("Gauge.inc() / dec()", "gauge.inc(); gauge.dec()"),
+        ("Histogram.observe()", "histogram.observe(0.003)"),
+    ]:
+        table.add_row(label, f"{_per_call_ns(statement, names, updates):.0f}")
+    console.print(table)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        file_name = str(Path(scratch) / "metrics.db")
+        plain = make_engine(file_name)
+        with plain.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE numbers (id INTEGER PRIMARY KEY, value INTEGER)")
+            conn.exec_driver_sql(
+                "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < 999) INSERT INTO numbers SELECT i, i * 2 FROM n"
+            )
+        instrumented = make_engine(file_name, metrics_label="bench")
+
+        # Best of three, alternating, so warm-up and noise hit both engines alike
+        plain_seconds, instrumented_seconds = (min(runs) for runs in zip(*(
+            (_query_seconds(plain, queries), _query_seconds(instrumented, queries)) for _ in range(3)
+        )))
+        plain.dispose()
+        instrumented.dispose()
+
+    overhead_us = (instrumented_seconds - plain_seconds) / queries * 1e6
+    console.print(
+        f"Primary-key SELECT: {plain_seconds / queries * 1e6:.1f} us plain, "
+        f"{instrumented_seconds / queries * 1e6:.1f} us instrumented "
+        f"([bold]{overhead_us:+.1f} us[/bold] per query, {instrumented_seconds / plain_seconds - 1:+.1%})"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metric updates and the database instrumentation.")
+    parser.add_argument("--updates", type=int, default=1_000_000, help="Calls timed per metric update.")
+    parser.add_argument("--queries", type=int, default=20_000, help="Queries timed per engine.")
+    args = parser.parse_args()
+    run(args.updates, args.queries)
+
+if __name__ == "__main__":
+    main()
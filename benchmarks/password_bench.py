@@ -0,0 +1,132 @@
+"""
+benchmarks/password_bench.py
+----------------------------
+Login cost under concurrent load with scrypt (app.passwords).
+
+1. Cost table: time and memory of one hash for a few scrypt n values, so the
+   SMS_SCRYPT_N default can be tuned for the machine.
+2. Concurrent logins: C client threads log in back to back (one verify each)
+   for a few seconds per level, two ways:
+       pool     through the bounded PasswordPool (what authenticate() does)
+       inline   every client hashes in its own thread, no bound
+   and the benchmark reports logins/s, p50/p99 latency of the logins that ran,
+   and pool rejections (a refused client retries after RETRY_SECONDS).
+   hashlib.scrypt releases the GIL, so both scale with cores. Past the core
+   count the pool keeps hashes from competing for CPU and memory (16 MiB each at
+   the default cost): throughput holds, the line is served in order and capped,
+   and clients beyond the cap are refused, instead of every login slowing down
+   together.
+
+Run from the project root (no database is touched):
+    uv run -m benchmarks.password_bench [--clients 1,2,4,8,16,32] [--duration 5] [--workers <cores>]
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from app.passwords import ScryptCost, PasswordPool, PasswordPoolBusy, hash_password, verify_password, CURRENT_COST
+
+console = Console()
+
+PASSWORD = "Password1!"
+COST_TABLE_N = (2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15)
+RETRY_SECONDS = 0.05
+
+def render_cost_table(r: int, p: int, repeat: int = 3):
+    table = Table(title=f"One scrypt hash (r={r}, p={p})", show_lines=False)
+    table.add_column("n", justify="right", style="bold")
+    table.add_column("Memory", justify="right")
+    table.add_column("ms / hash", justify="right", style="green")
+    for n in COST_TABLE_N:
+        cost = ScryptCost(n, r, p)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            hash_password(PASSWORD, cost)
+            timings.append(time.perf_counter() - started)
+        marker = " (current)" if cost == CURRENT_COST else ""
+        table.add_row(f"2**{n.bit_length() - 1}{marker}", f"{128 * r * n / 1024 / 1024:.0f} MiB", f"{min(timings) * 1000:.1f}")
+    console.print(table)
+
+def _run_level(clients: int, duration: float, login) -> dict:
+    """`clients` threads call login() back to back until the time is up."""
+    latencies = [[] for _ in range(clients)]
+    rejected = [0] * clients
+    start = threading.Barrier(clients + 1)
+
+    def client(index: int):
+        start.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                login()
+            except PasswordPoolBusy:
+                # A refused user tries again a moment later
+                rejected[index] += 1
+                time.sleep(RETRY_SECONDS)
+                continue
+            latencies[index].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = np.array([latency for client_latencies in latencies for latency in client_latencies])
+    return {
+        "logins_per_second": len(samples) / elapsed,
+        "p50": np.percentile(samples, 50) if len(samples) else 0.0,
+        "p99": np.percentile(samples, 99) if len(samples) else 0.0,
+        "rejected": sum(rejected),
+    }
+
+def run(client_levels: list[int], duration: float, workers: int):
+    render_cost_table(CURRENT_COST.r, CURRENT_COST.p)
+
+    stored = hash_password(PASSWORD)
+    pool = PasswordPool(workers)
+    modes = {
+        "pool": lambda: pool.verify(PASSWORD, stored),
+        "inline": lambda: verify_password(PASSWORD, stored),
+    }
+
+    table = Table(title=f"Concurrent logins (n={CURRENT_COST.n}, {workers} pool worker(s), {os.cpu_count()} core(s))", show_lines=False)
+    table.add_column("Clients", justify="right", style="bold")
+    for mode in modes:
+        table.add_column(f"{mode} logins/s", justify="right", style="green")
+        table.add_column(f"{mode} p50 ms", justify="right")
+        table.add_column(f"{mode} p99 ms", justify="right", style="yellow")
+    table.add_column("Rejected", justify="right", style="red")
+
+    for clients in client_levels:
+        row = [str(clients)]
+        rejected = 0
+        for mode, login in modes.items():
+            with console.status(f"{clients} client(s), {mode}..."):
+                result = _run_level(clients, duration, login)
+            row += [f"{result['logins_per_second']:.1f}", f"{result['p50'] * 1000:.1f}", f"{result['p99'] * 1000:.1f}"]
+            rejected += result["rejected"]
+        table.add_row(*row, str(rejected))
+    console.print(table)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scrypt login throughput and tail latency under concurrency.")
+    parser.add_argument("--clients", default="1,2,4,8,16,32", help="Comma-separated concurrent client counts.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per client level and mode.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Password pool threads.")
+    args = parser.parse_args()
+    run([int(clients) for clients in args.clients.split(",")], args.duration, args.workers)
+
+if __name__ == "__main__":
+    main()
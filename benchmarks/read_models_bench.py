@@ -0,0 +1,134 @@
+"""
+benchmarks/read_models_bench.py
+-------------------------------
+Compares per-page hydration cost of full ORM objects against the column-projected
+NamedTuple rows in app.read_models, for the three list screens.
+
+For each page size it fetches one page both ways from a scratch database filled
+with synthetic orders and users, and reports the best-of-N wall time and the
+peak memory allocated while building the page (tracemalloc).
+
+Run from the project root (the real database is never touched):
+    uv run -m benchmarks.read_models_bench [--rows 20000] [--repeat 5]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+from sqlmodel import SQLModel, Session, select
+
+from app.database import make_engine
+from app.models import User, ServiceRequest
+from app.read_models import OrderListRow, OrderHistoryRow, UserRow, select_rows, select_order_list, as_rows
+from app.lookups import SERVICE_NAMES, VENDOR_NAMES, ORDER_STATUSES
+
+console = Console()
+
+PAGE_SIZES = (5, 100, 1000, 10000)
+
+def _seed(engine, rows: int):
+    SQLModel.metadata.create_all(engine, tables=[User.__table__, ServiceRequest.__table__])
+    customers = max(1, rows // 20)
+    start = datetime(2025, 1, 1)
+    with Session(engine) as session:
+        session.add_all(
+            User(
+                id=1_000_000 + i,
+                user_name=f"user{i}",
+                email=f"user{i}@example.com",
+                password="Password1!",
+                address=f"Street {i}, City",
+                contact_number=f"9{i:09d}"
+            )
+            for i in range(customers)
+        )
+        session.add_all(
+            ServiceRequest(
+                id=2_000_000 + i,
+                customer_id=1_000_000 + i % customers,
+                service_name=random.choice(SERVICE_NAMES),
+                status=random.choice(ORDER_STATUSES),
+                date_slot="2025-01-01 | 02:00 PM - 04:00 PM",
+                address=f"Street {i % customers}, City",
+                vendor_name=random.choice(VENDOR_NAMES),
+                amount=random.choice((100, 150, 200)),
+                created_at=start + timedelta(minutes=i)
+            )
+            for i in range(rows)
+        )
+        session.commit()
+
+def _measure(engine, fetch, repeat: int) -> tuple[float, int]:
+    """Best wall time (ms) over `repeat` runs, and the peak traced allocation (bytes) of one run."""
+    best = float("inf")
+    for _ in range(repeat):
+        with Session(engine) as session:
+            started = time.perf_counter()
+            fetch(session)
+            best = min(best, time.perf_counter() - started)
+
+    with Session(engine) as session:
+        tracemalloc.start()
+        page = fetch(session)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del page
+    return best * 1000, peak
+
+def run(rows: int, repeat: int):
+    with tempfile.TemporaryDirectory() as scratch:
+        engine = make_engine(str(Path(scratch) / "bench.db"))
+        with console.status(f"Seeding {rows} orders..."):
+            _seed(engine, rows)
+
+        # Admin orders: ORM objects vs the joined read model, which also carries the customer columns
+        cases = [
+            ("Admin orders", ServiceRequest, OrderListRow, select_order_list(ServiceRequest)),
+            ("Order history", ServiceRequest, OrderHistoryRow, select_rows(ServiceRequest, OrderHistoryRow)),
+            ("User search", User, UserRow, select_rows(User, UserRow)),
+        ]
+
+        table = Table(title=f"Page hydration: ORM objects vs read models ({rows} orders)", show_lines=True)
+        table.add_column("Screen", style="bold")
+        table.add_column("Page size", justify="right")
+        table.add_column("ORM ms", justify="right")
+        table.add_column("Rows ms", justify="right", style="green")
+        table.add_column("ORM KiB", justify="right")
+        table.add_column("Rows KiB", justify="right", style="green")
+        table.add_column("Speedup", justify="right", style="cyan")
+
+        for name, model, row_type, row_select in cases:
+            for page_size in PAGE_SIZES:
+                orm_statement = select(model).order_by(model.id).limit(page_size)
+                row_statement = row_select.order_by(model.id).limit(page_size)
+
+                orm_ms, orm_peak = _measure(engine, lambda session: session.exec(orm_statement).all(), repeat)
+                row_ms, row_peak = _measure(engine, lambda session: as_rows(session.exec(row_statement).all(), row_type), repeat)
+
+                table.add_row(
+                    name, str(page_size),
+                    f"{orm_ms:.2f}", f"{row_ms:.2f}",
+                    f"{orm_peak / 1024:.0f}", f"{row_peak / 1024:.0f}",
+                    f"{orm_ms / row_ms:.1f}x" if row_ms else "-"
+                )
+
+        engine.dispose()
+
+    console.print(table)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list-screen row hydration.")
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic orders to create.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (best is reported).")
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
+
+if __name__ == "__main__":
+    main()
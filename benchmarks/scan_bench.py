@@ -0,0 +1,79 @@
+"""
+benchmarks/scan_bench.py
+------------------------
+Speedup of the parallel table scan (app.scan) over worker counts, on a large
+synthetic order table:
+
+    checksum   CRC32 of every full row (Python work per row, app.scan checksum)
+    analytics  the analytics column load (np.fromiter per chunk, arrays joined)
+
+Each is run with 1 worker (in this process, the serial baseline) and then with
+each worker count, reporting seconds, rows/s and speedup. Worker start-up (a
+spawned interpreter importing the app) is included, so small tables show the
+fixed cost rather than the scaling.
+
+The scratch database is seeded like benchmarks/analytics_bench.py in a
+temporary directory; SMS_DATABASE points the app (and the workers) at it, so the
+real database is never touched.
+
+Run from the project root:
+    uv run -m benchmarks.scan_bench [--rows 2000000] [--workers 1,2,4,8]
+"""
+
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+def run(rows: int, worker_levels: list[int]):
+    with tempfile.TemporaryDirectory() as scratch:
+        file_name = str(Path(scratch) / "scan.db")
+        # Before anything imports app.database, so this process and its workers open the scratch file
+        os.environ["SMS_DATABASE"] = file_name
+        os.environ.pop("SMS_DATABASE_TEMPLATE", None)
+        from benchmarks.analytics_bench import _seed
+        from app import analytics
+        from app.scan import parallel_scan, checksum_chunks, add_checksums
+
+        with console.status(f"Seeding {rows:,} orders..."):
+            _seed(file_name, rows)
+        # Measure the scan at every size, not the small-table shortcut
+        analytics.PARALLEL_MIN_ORDERS = 0
+
+        table = Table(title=f"Parallel scan of {rows:,} orders ({os.cpu_count()} core(s))", show_lines=False)
+        table.add_column("Workload", style="bold")
+        table.add_column("Workers", justify="right")
+        table.add_column("Seconds", justify="right")
+        table.add_column("Rows/s", justify="right", style="green")
+        table.add_column("Speedup", justify="right", style="yellow")
+
+        workloads = {
+            "checksum": lambda workers: parallel_scan(
+                "servicerequest", ["*"], checksum_chunks, add_checksums, initial=(0, 0), workers=workers
+            ).seconds,
+            "analytics": lambda workers: analytics.load_order_columns(include_archive=False, workers=workers).load_seconds,
+        }
+        for name, workload in workloads.items():
+            baseline = None
+            for workers in [1] + [level for level in worker_levels if level > 1]:
+                with console.status(f"{name}, {workers} worker(s)..."):
+                    seconds = workload(workers)
+                baseline = baseline or seconds
+                table.add_row(name, str(workers), f"{seconds:.2f}", f"{rows / seconds:,.0f}", f"{baseline / seconds:.2f}x")
+            table.add_section()
+        console.print(table)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel range-partitioned table scan.")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Synthetic orders to create.")
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker counts.")
+    args = parser.parse_args()
+    run(args.rows, [int(workers) for workers in args.workers.split(",")])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+benchmarks/snapshot_bench.py
+----------------------------
+Reading the analytics columns from the column snapshot (app.column_snapshot)
+against loading them from the tables, on a large synthetic order table:
+
+    tables             load_order_columns(): every row decoded through SQLite
+    snapshot rebuild   the full rebuild (what a drifted or missing shard costs)
+    snapshot read      load_snapshot_columns() with nothing new: the refresh
+                       check plus mapping the column files
+    refresh            applying --changes new bookings and as many status
+                       changes, logged like the app logs them
+
+The orders are seeded like benchmarks/analytics_bench.py into a scratch file
+in a temporary directory; SMS_DATABASE points the app at it, so the real
+database (and its snapshot) is never touched.
+
+Run from the project root:
+    uv run -m benchmarks.snapshot_bench [--rows 2000000] [--changes 10000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+def _log_changes(file_name: str, first_id: int, changes: int):
+    """Inserts `changes` orders and moves as many existing ones to another status, with their events."""
+    conn = sqlite3.connect(file_name)
+    conn.executemany(
+        "INSERT INTO servicerequest (id, customer_id, service_name, status, date_slot, address, vendor_name, amount, created_at) "
+        "VALUES (?, ?, 0, 0, '', '', 0, 150, datetime('now'))",
+        ((first_id + i, 1_000_000 + i) for i in range(changes))
+    )
+    changed = random.sample(range(first_id), min(changes, first_id))
+    conn.executemany("UPDATE servicerequest SET status = 2 WHERE id = ?", ((order_id,) for order_id in changed))
+    conn.executemany(
+        "INSERT INTO orderevent (order_id, customer_id, event_type, payload, created_at) VALUES (?, 0, ?, '{}', datetime('now'))",
+        [(first_id + i, "created") for i in range(changes)] + [(order_id, "status_changed") for order_id in changed]
+    )
+    conn.commit()
+    conn.close()
+
+def run(rows: int, changes: int):
+    with tempfile.TemporaryDirectory() as scratch:
+        file_name = str(Path(scratch) / "snapshot.db")
+        # Before anything imports app.database, so the app and its snapshot use the scratch file
+        os.environ["SMS_DATABASE"] = file_name
+        os.environ.pop("SMS_DATABASE_TEMPLATE", None)
+        from benchmarks.analytics_bench import _seed
+        from app.database import create_db_and_tables
+        from app import analytics
+        from app.column_snapshot import shard_snapshots, refresh_snapshots
+
+        create_db_and_tables()
+        with console.status(f"Seeding {rows:,} orders..."):
+            _seed(file_name, rows)
+
+        timings = []
+        with console.status("Loading from the tables..."):
+            columns = analytics.load_order_columns()
+        timings.append(("tables", columns.load_seconds, len(columns)))
+
+        with console.status("Rebuilding the snapshot..."):
+            rebuilt = sum(snapshot.rebuild().seconds for snapshot in shard_snapshots())
+        timings.append(("snapshot rebuild", rebuilt, rows))
+
+        columns = analytics.load_snapshot_columns()
+        timings.append(("snapshot read", columns.load_seconds, len(columns)))
+
+        _log_changes(file_name, rows, changes)
+        started = time.perf_counter()
+        results = refresh_snapshots()
+        timings.append((f"refresh ({sum(result.events for result in results):,} events)", time.perf_counter() - started, rows + changes))
+
+        columns = analytics.load_snapshot_columns()
+        timings.append(("snapshot read", columns.load_seconds, len(columns)))
+
+        table = Table(title=f"Analytics columns of {rows:,} orders", show_lines=False)
+        table.add_column("Step", style="bold")
+        table.add_column("Seconds", justify="right")
+        table.add_column("Orders", justify="right")
+        table.add_column("vs tables", justify="right", style="green")
+        for name, seconds, orders in timings:
+            table.add_row(name, f"{seconds:.3f}", f"{orders:,}", f"{timings[0][1] / seconds:.1f}x" if seconds else "-")
+        console.print(table)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the columnar order snapshot against table loads.")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Synthetic orders to create.")
+    parser.add_argument("--changes", type=int, default=10_000, help="New orders (and status changes) before the refresh.")
+    args = parser.parse_args()
+    run(args.rows, args.changes)
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,156 @@
+CREATE TABLE backfillcheckpoint (
+	name VARCHAR(100) NOT NULL, 
+	last_key INTEGER NOT NULL, 
+	rows_done INTEGER NOT NULL, 
+	updated_at DATETIME NOT NULL, 
+	PRIMARY KEY (name)
+);
+CREATE TABLE customersummary (
+	customer_id INTEGER NOT NULL, 
+	pending_count INTEGER NOT NULL, 
+	in_progress_count INTEGER NOT NULL, 
+	completed_count INTEGER NOT NULL, 
+	cancelled_count INTEGER NOT NULL, 
+	total_amount INTEGER NOT NULL, 
+	first_order_at DATETIME, 
+	last_order_at DATETIME, 
+	vendor_counts VARCHAR NOT NULL, 
+	preferred_vendor VARCHAR, 
+	updated_at DATETIME NOT NULL, 
+	PRIMARY KEY (customer_id)
+);
+CREATE TABLE deadletterjob (
+	id INTEGER NOT NULL, 
+	job_id INTEGER NOT NULL, 
+	queue VARCHAR(50) NOT NULL, 
+	payload VARCHAR NOT NULL, 
+	attempts INTEGER NOT NULL, 
+	last_error VARCHAR, 
+	created_at DATETIME NOT NULL, 
+	failed_at DATETIME NOT NULL, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_deadletterjob_queue ON deadletterjob (queue);
+CREATE TABLE eventoffset (
+	consumer VARCHAR(50) NOT NULL, 
+	last_event_id INTEGER NOT NULL, 
+	updated_at DATETIME NOT NULL, 
+	PRIMARY KEY (consumer)
+);
+CREATE TABLE job (
+	id INTEGER NOT NULL, 
+	queue VARCHAR(50) NOT NULL, 
+	payload VARCHAR NOT NULL, 
+	dedupe_key VARCHAR(100), 
+	attempts INTEGER NOT NULL, 
+	max_attempts INTEGER NOT NULL, 
+	visible_at DATETIME NOT NULL, 
+	claimed_by VARCHAR, 
+	last_error VARCHAR, 
+	created_at DATETIME NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (dedupe_key)
+);
+CREATE INDEX ix_job_queue ON job (queue);
+CREATE INDEX ix_job_visible_at ON job (visible_at);
+CREATE TABLE orderdirectory (
+	order_id INTEGER NOT NULL, 
+	customer_id INTEGER NOT NULL, 
+	PRIMARY KEY (order_id)
+);
+CREATE INDEX ix_orderdirectory_customer_id ON orderdirectory (customer_id);
+CREATE TABLE orderevent (
+	id INTEGER NOT NULL, 
+	order_id INTEGER NOT NULL, 
+	customer_id INTEGER NOT NULL, 
+	event_type VARCHAR NOT NULL, 
+	old_status VARCHAR, 
+	new_status VARCHAR, 
+	payload VARCHAR NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	PRIMARY KEY (id)
+);
+CREATE TABLE orderstatus (
+	id INTEGER NOT NULL, 
+	name VARCHAR(50) NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (name)
+);
+CREATE TABLE schemaversion (
+	version INTEGER NOT NULL, 
+	name VARCHAR NOT NULL, 
+	applied_at DATETIME NOT NULL, 
+	duration_seconds FLOAT NOT NULL, 
+	PRIMARY KEY (version)
+);
+CREATE TABLE servicetype (
+	id INTEGER NOT NULL, 
+	name VARCHAR(50) NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (name)
+);
 CREATE TABLE user (
 	id INTEGER NOT NULL, 
 	user_name VARCHAR(50) NOT NULL, 
 	email VARCHAR(255) NOT NULL, 
-	password VARCHAR(30) NOT NULL, 
+	password VARCHAR(255) NOT NULL, 
 	address VARCHAR(100) NOT NULL, 
 	contact_number VARCHAR(10) NOT NULL, 
 	PRIMARY KEY (id)
 );
 CREATE UNIQUE INDEX ix_user_user_name ON user (user_name);
+CREATE TABLE userdirectory (
+	user_name VARCHAR(50) NOT NULL, 
+	customer_id INTEGER NOT NULL, 
+	PRIMARY KEY (user_name)
+);
+CREATE INDEX ix_userdirectory_customer_id ON userdirectory (customer_id);
+CREATE TABLE vendor (
+	id INTEGER NOT NULL, 
+	name VARCHAR(50) NOT NULL, 
+	PRIMARY KEY (id), 
+	UNIQUE (name)
+);
 CREATE TABLE servicerequest (
 	id INTEGER NOT NULL, 
 	customer_id INTEGER NOT NULL, 
-	service_name VARCHAR NOT NULL, 
-	status VARCHAR NOT NULL, 
+	service_name SMALLINT NOT NULL, 
+	status SMALLINT NOT NULL, 
 	date_slot VARCHAR NOT NULL, 
 	address VARCHAR NOT NULL, 
-	vendor_name VARCHAR NOT NULL, 
+	vendor_name SMALLINT NOT NULL, 
 	amount INTEGER NOT NULL, 
 	created_at DATETIME NOT NULL, 
+	city VARCHAR(50), 
+	area VARCHAR(50), 
+	scheduled_date DATE, 
 	PRIMARY KEY (id), 
-	FOREIGN KEY(customer_id) REFERENCES user (id)
+	FOREIGN KEY(customer_id) REFERENCES user (id), 
+	FOREIGN KEY(service_name) REFERENCES servicetype (id), 
+	FOREIGN KEY(status) REFERENCES orderstatus (id), 
+	FOREIGN KEY(vendor_name) REFERENCES vendor (id)
 );
 CREATE INDEX ix_servicerequest_customer_id ON servicerequest (customer_id);
+CREATE INDEX ix_servicerequest_route ON servicerequest (status, scheduled_date, city, area, service_name, amount);
+CREATE INDEX ix_servicerequest_status ON servicerequest (status);
+CREATE TABLE servicerequestarchive (
+	id INTEGER NOT NULL, 
+	customer_id INTEGER NOT NULL, 
+	service_name SMALLINT NOT NULL, 
+	status SMALLINT NOT NULL, 
+	date_slot VARCHAR NOT NULL, 
+	address VARCHAR NOT NULL, 
+	vendor_name SMALLINT NOT NULL, 
+	amount INTEGER NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	city VARCHAR(50), 
+	area VARCHAR(50), 
+	scheduled_date DATE, 
+	archived_at DATETIME NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(customer_id) REFERENCES user (id), 
+	FOREIGN KEY(service_name) REFERENCES servicetype (id), 
+	FOREIGN KEY(status) REFERENCES orderstatus (id), 
+	FOREIGN KEY(vendor_name) REFERENCES vendor (id)
+);
+CREATE INDEX ix_servicerequestarchive_customer_id ON servicerequestarchive (customer_id);
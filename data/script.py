@@ -7,8 +7,11 @@ from rich.panel import Panel
 
 # Import from the application logic
 # Note: These imports work because we run the script from the Project Root
-from app.database import engine
-from app.models import User, ServiceRequest
+from app.database import engine_for_customer, is_sharded
+from app.models import User, ServiceRequest, UserDirectory, OrderDirectory
+from app.summary import rebuild_summaries
+from app.passwords import password_pool
+from app.addresses import route_keys
 
 console = Console()
 
@@ -31,59 +34,80 @@ def load_data():
     user_count = 0
     request_count = 0
 
+    # One session per shard; rows are routed by customer ID (see app.database)
+    sessions = {}
+    def session_for(customer_id: int) -> Session:
+        shard_engine = engine_for_customer(customer_id)
+        if shard_engine not in sessions:
+            sessions[shard_engine] = Session(shard_engine)
+        return sessions[shard_engine]
+
     try:
-        with Session(engine) as session:
-            # --- STEP A: Load Users ---
-            console.print("[yellow]Seeding Users...[/yellow]")
-            with open(users_csv, mode='r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # We explicitely set the ID to match the CSV, overriding the random generator
-                    user = User(
-                        id=int(row["id"]), 
-                        user_name=row["user_name"],
-                        email=row["email"],
-                        password=row["password"],
-                        address=row["address"],
-                        contact_number=row["contact_number"]
-                    )
-                    # Merge checks if it exists (updates) or adds if new. 
-                    # For seeding, 'add' is usually fine, but 'merge' is safer for re-runs.
-                    session.merge(user)
-                    user_count += 1
+        # --- STEP A: Load Users ---
+        console.print("[yellow]Seeding Users...[/yellow]")
+        with open(users_csv, mode='r', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+            # Passwords are stored as scrypt hashes, computed on every core at once
+            password_hashes = password_pool.hash_many([row["password"] for row in rows])
+            for row, password_hash in zip(rows, password_hashes):
+                # We explicitely set the ID to match the CSV, overriding the random generator
+                user = User(
+                    id=int(row["id"]), 
+                    user_name=row["user_name"],
+                    email=row["email"],
+                    password=password_hash,
+                    address=row["address"],
+                    contact_number=row["contact_number"]
+                )
+                # Merge checks if it exists (updates) or adds if new. 
+                # For seeding, 'add' is usually fine, but 'merge' is safer for re-runs.
+                session_for(user.id).merge(user)
+                if is_sharded():
+                    # The username directory always lives on shard 0
+                    session_for(0).merge(UserDirectory(user_name=user.user_name, customer_id=user.id))
+                user_count += 1
 
-            # --- STEP B: Load Service Requests ---
-            console.print("[yellow]Seeding Service Requests...[/yellow]")
-            with open(requests_csv, mode='r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    request = ServiceRequest(
-                        id=int(row["id"]),
-                        customer_id=int(row["customer_id"]), # Must match a User ID from Step A
-                        service_name=row["service_name"],
-                        status=row["status"],
-                        date_slot=row["date_slot"],
-                        address=row["address"],
-                        vendor_name=row["vendor_name"],
-                        amount=int(row["amount"])
-                    )
-                    session.merge(request)
-                    request_count += 1
+        # --- STEP B: Load Service Requests ---
+        console.print("[yellow]Seeding Service Requests...[/yellow]")
+        with open(requests_csv, mode='r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                request = ServiceRequest(
+                    id=int(row["id"]),
+                    customer_id=int(row["customer_id"]), # Must match a User ID from Step A
+                    service_name=row["service_name"],
+                    status=row["status"],
+                    date_slot=row["date_slot"],
+                    address=row["address"],
+                    vendor_name=row["vendor_name"],
+                    amount=int(row["amount"]),
+                    **route_keys(row["address"], row["date_slot"])
+                )
+                session_for(request.customer_id).merge(request)
+                if is_sharded():
+                    # So is the order directory, which keeps order IDs unique across shards
+                    session_for(0).merge(OrderDirectory(order_id=request.id, customer_id=request.customer_id))
+                request_count += 1
 
-            # --- STEP C: Commit Transaction ---
+        # --- STEP C: Commit Transaction (one per shard) ---
+        for session in sessions.values():
             session.commit()
-            
-            # Feedback
-            console.print(Panel(
-                f"[bold green]Database Seeding Successful![/bold green]\n"
-                f"• Users Loaded: {user_count}\n"
-                f"• Requests Loaded: {request_count}",
-                title="System Initialization",
-                style="green"
-            ))
+
+        # Seeded orders bypass the booking flow, so recompute the per-customer rollups
+        rebuild_summaries()
+        
+        # Feedback
+        console.print(Panel(
+            f"[bold green]Database Seeding Successful![/bold green]\n"
+            f"• Users Loaded: {user_count}\n"
+            f"• Requests Loaded: {request_count}",
+            title="System Initialization",
+            style="green"
+        ))
 
     except IntegrityError as e:
-        session.rollback()
+        for session in sessions.values():
+            session.rollback()
         console.print(Panel(
             f"[bold red]Integrity Error:[/bold red]\n"
             f"This usually means a User ID or Order ID already exists.\n"
@@ -91,8 +115,12 @@ def load_data():
             style="red"
         ))
     except Exception as e:
-        session.rollback()
+        for session in sessions.values():
+            session.rollback()
         console.print(f"[bold red]Unexpected Error:[/bold red] {e}")
+    finally:
+        for session in sessions.values():
+            session.close()
 
 if __name__ == "__main__":
     load_data()
\ No newline at end of file
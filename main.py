@@ -1,6 +1,6 @@
 import sys
 import questionary
-from rich.console import Console
+from rich.console import Console, Group
 from rich.panel import Panel
 from rich.align import Align
 
@@ -9,15 +9,44 @@ from app.database import create_db_and_tables
 from app.auth import login_user, register_user
 from app.service_mgr import create_service_request_ui, view_order_history_ui, update_profile_ui
 from app.admin_mgr import show_admin_dashboard
+from app.maintenance import scheduler as maintenance_scheduler
+from app.username_filter import username_filter
+from app.summary import ensure_summaries
+from app.migrations import run_pending_migrations
+from app.metrics import start_exporters
 from app.utils import validate_email, validate_contact, validate_password_complexity
+from app.screen import screen, Static
 
 
 
 console = Console()
 
+banner_art = r"""
+========================================
+      SERVICE MANAGEMENT SYSTEM
+========================================
+"""
+
+# We use Align.center to make it look professional on any terminal width
+# Built once; app.screen keeps its rendered lines, so the menu redraws without rebuilding it
+BANNER = Static(Group(
+    Align.center(Panel(banner_art, style="bold cyan", border_style="blue", padding=(1, 2))),
+    "\n",  # Add some breathing room
+))
+
 def main():
     # 1. Initialize the Database (creates tables if they don't exist)
     create_db_and_tables()
+    # Brings existing tables up to the current schema version (app.migrations)
+    run_pending_migrations()
+    # Background housekeeping: reclaims space after deletes without blocking the UI
+    maintenance_scheduler.start()
+    # Loads the saved username filter, or rebuilds it if the database changed since
+    username_filter.load()
+    # Fills the order summaries once for databases created before they existed
+    ensure_summaries()
+    # Prometheus endpoint and/or metrics file, if SMS_METRICS_PORT / SMS_METRICS_FILE are set
+    start_exporters()
 
     # 2. State Variable: Tracks who is currently logged in
     current_user = None
@@ -26,20 +55,7 @@ def main():
     while True:
         # --- STATE A: User is NOT Logged In ---
         if current_user is None:
-            console.clear()
-            banner_art = r"""
-========================================
-      SERVICE MANAGEMENT SYSTEM
-========================================
-"""
-
-            # We use Align.center to make it look professional on any terminal width
-            styled_banner = Align.center(
-            Panel(banner_art, style="bold cyan", border_style="blue", padding=(1, 2))
-            )
-
-            console.print(styled_banner)
-            console.print("\n") # Add some breathing room
+            screen.draw("welcome", BANNER)
             choice = questionary.select(
                 "Welcome! Please select an option:",
                 choices=["Login", "Register New Customer", "Exit"]
@@ -64,8 +80,8 @@ def main():
         # --- STATE C: Customer Dashboard (Existing Logic) ---
         elif isinstance(current_user, object):
             # We use 'elif' here to be explicit, or just 'else' acts as catch-all for Customers
-            console.clear()
-            console.print(
+            screen.draw(
+                "dashboard",
                 Panel(
                     f"Dashboard\nLogged in as: [bold yellow]{current_user.user_name}[/bold yellow] (ID: {current_user.id})",
                     style="bold cyan",